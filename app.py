@@ -1,56 +1,168 @@
-from flask import Flask, request, jsonify
-import pandas as pd
+from flask import Flask, request, jsonify, send_file, abort
 import numpy as np
 import pickle
 import os
-import shap
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
 import base64
 import io
 import json
+import threading
+import time
 from datetime import datetime
 
+import http_cache
+import profiling
+import traffic
+from cluster_index import trier_par_cluster
+from thresholds import decision_cluster, niveau_risque
+from calibrators import calibrer
+from features import RAW_FEATURES
+from drift import MoniteurDerive
+from reason_codes import charger_tables, table_valide, contributions, top_contributions
+
+# pandas, shap et matplotlib sont importés à la demande (démarrage à froid rapide) :
+# pandas au chargement des artefacts, shap/matplotlib à la première explication.
+
 app = Flask(__name__)
 
 # ============================================
-# CHARGEMENT DES MODÈLES ET DONNÉES
+# CHARGEMENT DES MODÈLES ET DONNÉES (différé)
 # ============================================
 BASE_DIR     = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATA_PATH    = os.path.join(BASE_DIR, 'data', 'cleaned_data_with_clusters.csv')
 MODELS_PATH  = os.path.join(BASE_DIR, 'results', 'models.pkl')
 HISTORY_PATH = os.path.join(BASE_DIR, 'results', 'prediction_history.json')
 
-with open(MODELS_PATH, 'rb') as f:
-    models = pickle.load(f)
+# Backend des probabilités : 'sklearn' (models.pkl) ou 'onnx' (ONNX Runtime CPU,
+# export de onnx_scoring.py). SHAP utilise toujours les modèles sklearn.
+BACKEND      = os.environ.get('SCORING_BACKEND', 'sklearn')
+
+# Explication par défaut : 'fast' (tables de codes raisons de shap_analysis.py) ou
+# 'exact' (TreeSHAP par requête). Surchargeable par requête via le champ 'explain'.
+EXPLICATION  = os.environ.get('EXPLANATION_MODE', 'fast')
 
-df = pd.read_csv(DATA_PATH)
-df = df.fillna(df.median(numeric_only=True))
+# Le waterfall est renvoyé en données structurées et dessiné par le dashboard ; le PNG
+# matplotlib (≈100 Ko en base64) n'est rendu que sur demande ('waterfall_png') ou si
+# WATERFALL_PNG=1.
+WATERFALL_PNG = os.environ.get('WATERFALL_PNG', '0') == '1'
+MAX_WATERFALL = 8   # barres affichées, dont « autres features »
+
+# Warm-up : tentatives avant l'abandon (/ready reste alors en 503) et attente initiale
+WARMUP_ESSAIS   = int(os.environ.get('WARMUP_ATTEMPTS', '3'))
+WARMUP_ATTENTE  = float(os.environ.get('WARMUP_BACKOFF_S', '5'))
+ENVIRON_WARMUP  = 'app.warmup'   # clé WSGI posée par le warm-up, inaccessible aux clients HTTP
 
 CLUSTER_COL  = 'Cluster'
 TARGET       = 'DEFAULT'
 EXCLUDE_COLS = [CLUSTER_COL, TARGET]
-features     = df.drop(columns=EXCLUDE_COLS).columns.tolist()
-
-# Centroïdes
-centroids = {}
-for cid in sorted(df[CLUSTER_COL].unique()):
-    centroids[cid] = df[df[CLUSTER_COL] == cid][features].mean().values
-
-# Stats globales
-cluster_stats = {}
-for cid in sorted(df[CLUSTER_COL].unique()):
-    df_c = df[df[CLUSTER_COL] == cid]
-    cluster_stats[int(cid)] = {
-        'size':          int(len(df_c)),
-        'default_rate':  round(float(df_c[TARGET].mean()) * 100, 1),
-        'avg_limit':     round(float(df_c['LIMIT_BAL'].mean()), 0),
-        'avg_age':       round(float(df_c['AGE'].mean()), 1),
-        'avg_pay_delay': round(float(df_c['AVG_PAY_DELAY'].mean()), 2),
-    }
 
-print("✅ App Flask prête — http://localhost:5000")
+models        = None
+df            = None
+features      = None
+centroids     = None
+cluster_stats = None
+offsets       = None
+decisions     = None   # {cluster_id: (seuil, bandes)} issus de l'entraînement
+backend_onnx  = None   # BackendONNX si BACKEND == 'onnx'
+moniteur      = None   # MoniteurDerive si les références d'entraînement existent
+appartenance  = None   # modèle d'appartenance souple enregistré par hdbscan.py
+tables_raisons = {}    # {cluster_id: table de codes raisons} à jour avec le modèle servi
+_explainers    = {}    # {cluster_id: shap.TreeExplainer}, construits une fois
+
+COULEURS_RISQUE = {'ÉLEVÉ': 'red', 'MODÉRÉ': 'orange', 'FAIBLE': 'yellow', 'TRÈS FAIBLE': 'green'}
+
+# Durées de chargement (s), exposées par /ready
+TIMINGS = {}
+
+_verrou_artefacts = threading.Lock()
+
+
+def charger_artefacts():
+    """Charge modèles, données, centroïdes et stats au premier appel (thread-safe)."""
+    global models, df, features, centroids, cluster_stats, offsets, decisions, backend_onnx
+    global moniteur, appartenance, tables_raisons
+    if models is not None:
+        return
+    with _verrou_artefacts:
+        if models is not None:
+            return
+        t0 = time.perf_counter()
+        import pandas as pd
+        from schema import lire_csv
+        TIMINGS['import_pandas_s'] = round(time.perf_counter() - t0, 3)
+
+        t1 = time.perf_counter()
+        with open(MODELS_PATH, 'rb') as f:
+            _models = pickle.load(f)
+        _decisions = {int(cid): decision_cluster(b) for cid, b in _models.items()}
+        TIMINGS['load_models_s'] = round(time.perf_counter() - t1, 3)
+
+        if BACKEND == 'onnx':
+            t1 = time.perf_counter()
+            from onnx_scoring import BackendONNX
+            backend_onnx = BackendONNX()
+            TIMINGS['load_onnx_s'] = round(time.perf_counter() - t1, 3)
+
+        t1 = time.perf_counter()
+        _df = lire_csv(DATA_PATH, fillna_median=True)
+        _df, _offsets = trier_par_cluster(_df, CLUSTER_COL)
+        TIMINGS['load_data_s'] = round(time.perf_counter() - t1, 3)
+
+        t1 = time.perf_counter()
+        _features = _df.drop(columns=EXCLUDE_COLS).columns.tolist()
+        groupes   = _df.groupby(CLUSTER_COL, sort=True)
+
+        # Centroïdes
+        moyennes   = groupes[_features].mean()
+        _centroids = dict(zip(moyennes.index, moyennes.to_numpy()))
+
+        # Stats globales (une seule passe groupby)
+        stats = groupes.agg(
+            size=(TARGET, 'size'),
+            default_rate=(TARGET, 'mean'),
+            avg_limit=('LIMIT_BAL', 'mean'),
+            avg_age=('AGE', 'mean'),
+            avg_pay_delay=('AVG_PAY_DELAY', 'mean'),
+        )
+        _cluster_stats = {}
+        for cid, row in stats.iterrows():
+            _cluster_stats[int(cid)] = {
+                'size':          int(row['size']),
+                'default_rate':  round(float(row['default_rate']) * 100, 1),
+                'avg_limit':     round(float(row['avg_limit']), 0),
+                'avg_age':       round(float(row['avg_age']), 1),
+                'avg_pay_delay': round(float(row['avg_pay_delay']), 2),
+            }
+        TIMINGS['cluster_stats_s'] = round(time.perf_counter() - t1, 3)
+
+        # Références de dérive enregistrées par train_model0.py
+        moniteur = MoniteurDerive.charger(_features)
+
+        # Modèle d'appartenance souple (import différé : clustering importe sklearn)
+        from clustering import charger_appartenance
+        appartenance = charger_appartenance()
+
+        # Tables de codes raisons : ignorées si construites pour un autre entraînement
+        _tables = charger_tables() or {}
+        tables_raisons = {cid: t for cid, t in _tables.items()
+                          if cid in _models and table_valide(t, _models[cid], _features)}
+
+        df, features, centroids, cluster_stats = _df, _features, _centroids, _cluster_stats
+        offsets, decisions = _offsets, _decisions
+        models = _models   # en dernier : models non nul ⇔ artefacts complets
+        TIMINGS['artefacts_total_s'] = round(time.perf_counter() - t0, 3)
+        print(f"✅ Artefacts chargés en {TIMINGS['artefacts_total_s']} s")
+
+
+def charger_shap():
+    """Importe shap et matplotlib (backend Agg) à la première explication."""
+    t0 = time.perf_counter()
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    import shap
+    TIMINGS.setdefault('import_shap_s', round(time.perf_counter() - t0, 3))
+    return shap, plt
+
 
 # ============================================
 # HISTORIQUE
@@ -77,9 +189,64 @@ def assigner_cluster(client_array):
         distances[int(cid)] = float(np.linalg.norm(client_array - centroid))
     return min(distances, key=distances.get), distances
 
+def probas_cluster(cluster_id, client_df, client_dict):
+    """(proba_gb calibrée, proba_nb) du modèle d'un cluster, via ONNX Runtime ou sklearn."""
+    if backend_onnx is not None:
+        brut = np.array([[client_dict[c] for c in RAW_FEATURES]], dtype=np.float32)
+        p_gb, p_nb = backend_onnx.predire(cluster_id, brut)
+        p_gb, p_nb = float(p_gb[0]), float(p_nb[0])
+    else:
+        p_gb = float(models[cluster_id]['gradient_boosting'].predict_proba(client_df)[0][1])
+        p_nb = float(models[cluster_id]['naive_bayes'].predict_proba(client_df)[0][1])
+    return calibrer(models[cluster_id].get('calibrator'), p_gb), p_nb
+
+def appartenance_client(client_dict):
+    """
+    {cluster_id: probabilité d'appartenance} du client sur les clusters servis
+    (renormalisée), ou None sans modèle d'appartenance.
+    """
+    if appartenance is None:
+        return None
+    from clustering import FEATURES_CLUSTERING, appartenances_brutes
+    p = appartenances_brutes([[client_dict[c] for c in FEATURES_CLUSTERING]], appartenance)[0]
+    membership = {int(c): float(v) for c, v in zip(appartenance['cluster_ids'], p)
+                  if int(c) in models}
+    total = sum(membership.values())
+    if not membership or total <= 0:
+        return None
+    return {cid: v / total for cid, v in membership.items()}
+
+def melanger_clusters(membership, client_df, client_dict):
+    """
+    Σ w_k · proba_k avec les poids de clustering.poids_melange (tout sur l'argmax
+    hors frontière). Retourne (gb, nb, {cluster_id: (gb, nb)} des modèles utilisés).
+    """
+    from clustering import poids_melange
+    ids   = list(membership)
+    poids = poids_melange([[membership[cid] for cid in ids]])[0]
+    gb = nb = 0.0
+    probas = {}
+    for cid, w in zip(ids, poids):
+        if w <= 0:
+            continue
+        p_gb, p_nb = probas[cid] = probas_cluster(cid, client_df, client_dict)
+        gb += float(w) * p_gb
+        nb += float(w) * p_nb
+    return gb, nb, probas
+
+def explainer_cluster(cluster_id):
+    """TreeExplainer du GB d'un cluster, construit au premier usage puis réutilisé."""
+    explainer = _explainers.get(cluster_id)
+    if explainer is None:
+        shap, _ = charger_shap()
+        explainer = _explainers[cluster_id] = shap.TreeExplainer(
+            models[cluster_id]['gradient_boosting'])
+    return explainer
+
 def generer_shap_waterfall(client_df, cluster_id):
-    gb_model    = models[cluster_id]['gradient_boosting']
-    explainer   = shap.TreeExplainer(gb_model)
+    """Waterfall SHAP rendu en PNG base64 par matplotlib (repli optionnel côté serveur)."""
+    shap, plt   = charger_shap()
+    explainer   = explainer_cluster(cluster_id)
     shap_values = explainer.shap_values(client_df)
     
     fig, ax = plt.subplots(figsize=(10, 5))
@@ -101,25 +268,143 @@ def generer_shap_waterfall(client_df, cluster_id):
     buf.seek(0)
     return base64.b64encode(buf.read()).decode('utf-8')
 
-def generer_shap_contributions(client_df, cluster_id):
-    gb_model    = models[cluster_id]['gradient_boosting']
-    explainer   = shap.TreeExplainer(gb_model)
-    shap_values = explainer.shap_values(client_df)
-    contribs    = pd.Series(shap_values[0], index=features).sort_values(key=abs, ascending=False).head(6)
-    result = []
-    for feat, val in contribs.items():
-        result.append({
-            'feature':    feat,
-            'value':      float(round(val, 4)),
-            'direction':  'defaut' if val > 0 else 'safe',
-            'client_val': float(client_df[feat].values[0])
-        })
-    return result
+def valeurs_shap(client_df, cluster_id, mode=None):
+    """
+    (contributions (F,), valeur de base, mode) : tables de codes raisons ('fast'), ou
+    TreeSHAP exact si demandé ou si le cluster n'a pas de table à jour.
+    """
+    table = tables_raisons.get(int(cluster_id))
+    if (mode or EXPLICATION) == 'fast' and table is not None:
+        return contributions(table, client_df.values[0]), table['base_value'], 'fast'
+    explainer = explainer_cluster(cluster_id)
+    return (np.ravel(explainer.shap_values(client_df)[0]),
+            float(np.ravel(explainer.expected_value)[0]), 'exact')
+
+def donnees_waterfall(valeurs, base, sortie, x):
+    """
+    Waterfall en log-odds : valeur de base, MAX_WATERFALL - 1 contributions triées par
+    amplitude, puis le reste jusqu'à la sortie du modèle (somme des autres features en
+    mode exact, résidu de l'approximation en mode rapide). La sortie est le log-odds
+    brut du GB du cluster, avant calibration et mélange : elle ne correspond pas à la
+    probabilité affichée, d'où output_space / output_label.
+    """
+    top = np.argsort(-np.abs(valeurs), kind='stable')[:MAX_WATERFALL - 1]
+    return {
+        'base_value':    round(base, 4),
+        'output_value':  round(sortie, 4),
+        'output_space':  'raw_log_odds',
+        'output_label':  'raw model log-odds (before calibration/blend)',
+        'output_proba_raw': round(float(1 / (1 + np.exp(-sortie))), 4),
+        'contributions': [{'feature': features[j], 'value': round(float(valeurs[j]), 4),
+                           'client_val': float(x[j])} for j in top],
+        'others':        round(sortie - base - float(valeurs[top].sum()), 4),
+        'others_count':  int(len(valeurs) - len(top)),
+    }
+
+def expliquer(client_df, cluster_id, mode=None):
+    """(top contributions, waterfall structuré, mode effectivement utilisé) du client."""
+    valeurs, base, mode = valeurs_shap(client_df, cluster_id, mode)
+    x      = client_df.values[0]
+    sortie = float(models[cluster_id]['gradient_boosting'].decision_function(client_df)[0])
+    return (top_contributions(valeurs, x, features), donnees_waterfall(valeurs, base, sortie, x),
+            mode)
+
+# ============================================
+# WARM-UP
+# ============================================
+# Le premier appel de chaque cluster paie le premier predict_proba (sklearn ou session
+# ONNX), la calibration, le mélange, l'explication (tables ou TreeExplainer), la dérive
+# et, si activé, la première figure matplotlib : on les paie ici, en passant par
+# /predict lui-même, pour qu'aucun chemin servi ne reste froid. Le routage se fait par
+# l'appartenance souple (espace PCA) : un centroïde peut être routé vers un autre
+# cluster, dont le modèle et l'explication sont alors chauffés directement.
+WARMUP = {'status': 'pending', 'attempts': 0, 'clusters': {}}
+
+_warmup_termine = threading.Event()
+
+
+def rechauffer_cluster(cluster_id):
+    """Probabilités, explication et (si activé) PNG d'un cluster, appelés directement."""
+    import pandas as pd
+    client_df   = pd.DataFrame([centroids[cluster_id]], columns=features)
+    client_dict = {c: float(v) for c, v in zip(features, centroids[cluster_id])}
+    probas_cluster(cluster_id, client_df, client_dict)
+    expliquer(client_df, cluster_id)
+    if WATERFALL_PNG:
+        generer_shap_waterfall(client_df, cluster_id)
+
+
+def warmup():
+    """
+    Envoie le centroïde de chaque cluster à /predict via le client de test (même code
+    que le trafic réel), sans écrire l'historique, le trafic ni la dérive ; un cluster
+    vers lequel son centroïde n'est pas routé est chauffé par rechauffer_cluster.
+    Retourne True si toutes les requêtes ont réussi.
+    """
+    WARMUP['status'] = 'running'
+    WARMUP['attempts'] += 1
+    t0 = time.perf_counter()
+    try:
+        charger_artefacts()
+        with app.test_client() as client:
+            client.get('/')   # dashboard précompressé
+            for cid in sorted(centroids):
+                payload = {c.lower(): float(v) for c, v in zip(features, centroids[cid])
+                           if c in RAW_FEATURES}
+                t_c = time.perf_counter()
+                reponse = client.post('/predict', json=payload,
+                                      environ_overrides={ENVIRON_WARMUP: True})
+                corps = reponse.get_json(silent=True) or {}
+                if not corps.get('success'):
+                    raise RuntimeError(f"cluster {int(cid)} : "
+                                       f"{corps.get('error', reponse.status)}")
+                direct = corps['cluster'] != int(cid)
+                if direct:
+                    rechauffer_cluster(cid)
+                WARMUP['clusters'][str(int(cid))] = {
+                    'predict_ms':  round((time.perf_counter() - t_c) * 1000, 1),
+                    'cluster':     corps['cluster'],
+                    'direct':      direct,
+                    'blended':     corps['blended'],
+                    'explanation': corps['explanation'],
+                }
+        WARMUP['status'] = 'done'
+        WARMUP.pop('error', None)
+        _warmup_termine.set()
+    except Exception as e:
+        WARMUP['status'] = 'failed'
+        WARMUP['error']  = str(e)
+    WARMUP['total_s'] = round(time.perf_counter() - t0, 3)
+    print(f"{'✅' if est_pret() else '❌'} Warm-up {WARMUP['status']} en {WARMUP['total_s']} s"
+          + (f" : {WARMUP['error']}" if 'error' in WARMUP else ""))
+    return est_pret()
+
+
+def _warmup_avec_reprises():
+    # Reprises à attente doublée (artefacts en cours d'écriture, disque lent...). Après
+    # WARMUP_ESSAIS échecs, le service reste non prêt (/ready en 503, erreur exposée) :
+    # un worker qui ne sait pas scorer ne doit pas recevoir de trafic ; l'orchestrateur
+    # le redémarre.
+    for essai in range(WARMUP_ESSAIS):
+        if essai:
+            time.sleep(WARMUP_ATTENTE * 2 ** (essai - 1))
+        if warmup():
+            return
+
+
+def demarrer_warmup():
+    """Lance le warm-up (avec reprises) en arrière-plan ; /ready reste en 503 jusqu'à sa réussite."""
+    threading.Thread(target=_warmup_avec_reprises, name='warmup', daemon=True).start()
+
+
+def est_pret():
+    return _warmup_termine.is_set()
 
 # ============================================
 # HTML INTÉGRÉ - VERSION CLAIRE ET PRO
 # ============================================
-CLUSTER_STATS_JSON = json.dumps(cluster_stats)
+# Les stats de clusters sont injectées au premier rendu (cf. index())
+CLUSTER_STATS_PLACEHOLDER = '__CLUSTER_STATS_JSON__'
 
 HTML = """<!DOCTYPE html>
 <html lang="fr">
@@ -555,6 +840,51 @@ HTML = """<!DOCTYPE html>
     border: 1px solid var(--border);
     background: white;
     padding: 0.5rem;
+    display: none;
+  }
+
+  .waterfall {
+    display: flex;
+    flex-direction: column;
+    gap: 0.35rem;
+  }
+
+  .wf-row {
+    display: grid;
+    grid-template-columns: 180px 1fr 70px;
+    gap: 0.75rem;
+    align-items: center;
+  }
+
+  .wf-row.wf-total .shap-feat,
+  .wf-row.wf-total .shap-val {
+    font-weight: 700;
+    color: var(--text);
+  }
+
+  .wf-track {
+    position: relative;
+    height: 20px;
+    background: var(--surface-2);
+    border-radius: 4px;
+  }
+
+  .wf-bar {
+    position: absolute;
+    top: 0;
+    bottom: 0;
+    border-radius: 3px;
+    min-width: 2px;
+  }
+
+  .wf-bar.defaut { background: #f87171; }
+  .wf-bar.safe   { background: #34d399; }
+  .wf-bar.base   { background: var(--text-light); }
+
+  .wf-note {
+    font-size: 0.75rem;
+    color: var(--text-light);
+    margin-top: 0.35rem;
   }
 
   /* ===== HISTORIQUE ===== */
@@ -775,6 +1105,7 @@ HTML = """<!DOCTYPE html>
 
       <div class="shap-section">
         <div class="shap-title">Visualisation SHAP</div>
+        <div class="waterfall" id="shap-waterfall"></div>
         <img id="shap-img" class="shap-img" src="" alt="SHAP Waterfall Plot"/>
       </div>
     </div>
@@ -796,7 +1127,7 @@ HTML = """<!DOCTYPE html>
 </div>
 
 <script>
-const clusterStats = """ + CLUSTER_STATS_JSON + """;
+const clusterStats = """ + CLUSTER_STATS_PLACEHOLDER + """;
 const clusterNames = {0:'🔴 Segment Risque Élevé',1:'🟢 Segment Sain',2:'🟠 Segment Fragile'};
 const colorClass = {'TRÈS FAIBLE':'val-green','FAIBLE':'val-yellow','MODÉRÉ':'val-orange','ÉLEVÉ':'val-red'};
 
@@ -833,6 +1164,10 @@ function initDashboard() {
           <span class="cluster-stat-label">Délai paiement</span>
           <span class="cluster-stat-val">${stats.avg_pay_delay} mois</span>
         </div>
+        <div class="cluster-stat">
+          <span class="cluster-stat-label">Trafic live</span>
+          <span class="cluster-stat-val" id="traffic-${cid}">—</span>
+        </div>
         <span class="risk-badge ${rClass}">${rLabel}</span>
       </div>
     `;
@@ -840,6 +1175,21 @@ function initDashboard() {
 }
 initDashboard();
 
+// Part du trafic /predict par cluster (compteurs agrégés sur les workers)
+async function refreshTraffic() {
+  try {
+    const res = await fetch('/monitoring/traffic');
+    const t = await res.json();
+    Object.keys(clusterStats).forEach(cid => {
+      const el = document.getElementById('traffic-' + cid);
+      const c = t.clusters[cid];
+      if (el) el.textContent = c ? `${c.share}% (${c.count})` : '0%';
+    });
+  } catch (e) {}
+}
+refreshTraffic();
+setInterval(refreshTraffic, 10000);
+
 function showPage(name, btn) {
   document.querySelectorAll('.page').forEach(p => p.classList.remove('active'));
   document.querySelectorAll('.nav-tab').forEach(t => t.classList.remove('active'));
@@ -849,6 +1199,53 @@ function showPage(name, btn) {
 
 function getVal(id) { return document.getElementById(id).value; }
 
+// Waterfall SHAP (log-odds) dessiné à partir des données structurées de /predict
+function renderWaterfall(wf) {
+  const div = document.getElementById('shap-waterfall');
+  div.innerHTML = '';
+  if (!wf) return;
+
+  const etapes = wf.contributions.map(c => ({
+    label: `${c.feature} = ${Number(c.client_val).toLocaleString('fr-FR')}`, value: c.value
+  }));
+  if (wf.others_count > 0) {
+    etapes.push({ label: `${wf.others_count} autres features`, value: wf.others });
+  }
+
+  let cumul = wf.base_value;
+  const points = [cumul];
+  etapes.forEach(e => { e.start = cumul; cumul += e.value; e.end = cumul; points.push(cumul); });
+  const min = Math.min(...points), max = Math.max(...points);
+  const echelle = v => ((v - min) / ((max - min) || 1)) * 100;
+
+  const ligne = (label, gauche, droite, classe, texte, total) => `
+    <div class="wf-row${total ? ' wf-total' : ''}">
+      <div class="shap-feat" title="${label}">${label}</div>
+      <div class="wf-track">
+        <div class="wf-bar ${classe}" style="left: ${gauche}%; width: ${droite - gauche}%"></div>
+      </div>
+      <div class="shap-val">${texte}</div>
+    </div>`;
+
+  let html = ligne('Valeur de base', echelle(wf.base_value), echelle(wf.base_value), 'base',
+                   wf.base_value.toFixed(3), true);
+  etapes.forEach(e => {
+    const g = echelle(Math.min(e.start, e.end)), d = echelle(Math.max(e.start, e.end));
+    html += ligne(e.label, g, d, e.value > 0 ? 'defaut' : 'safe',
+                  (e.value > 0 ? '+' : '') + e.value.toFixed(3), false);
+  });
+  html += ligne('Log-odds brut du modèle', echelle(wf.output_value), echelle(wf.output_value),
+                'base', wf.output_value.toFixed(3), true);
+  // La sortie est avant calibration et mélange : elle diffère de la probabilité affichée
+  html += `<div class="wf-note">Échelle log-odds brute du modèle du cluster ${wf.cluster}
+    (avant calibration${wf.blended ? ' et mélange' : ''}) : sortie ≈
+    ${(wf.output_proba_raw * 100).toFixed(1)} % non calibrés.`
+    + (wf.blended ? ' Client frontalier : la probabilité affichée mélange plusieurs clusters ;'
+                    + " ce waterfall n'explique que le modèle du cluster retenu." : '')
+    + '</div>';
+  div.innerHTML = html;
+}
+
 async function predict() {
   const btn = document.getElementById('btn-predict');
   const loader = document.getElementById('loader');
@@ -919,7 +1316,10 @@ async function predict() {
       `;
     });
 
-    document.getElementById('shap-img').src = 'data:image/png;base64,' + data.shap_img;
+    renderWaterfall(data.waterfall);
+    const img = document.getElementById('shap-img');
+    img.style.display = data.shap_img ? 'block' : 'none';
+    img.src = data.shap_img ? 'data:image/png;base64,' + data.shap_img : '';
     panel.classList.add('visible');
     panel.scrollIntoView({ behavior: 'smooth', block: 'start' });
 
@@ -989,16 +1389,42 @@ async function loadHistory() {
 </html>"""
 
 # ============================================
-# ROUTES (inchangées)
+# DASHBOARD PRÉCOMPRESSÉ
 # ============================================
+_dashboard = None   # actif http_cache : HTML rendu, variantes gzip / br, ETag
+
+def construire_dashboard():
+    """Rend le HTML (stats des clusters incluses) et le précompresse, une fois par processus."""
+    global _dashboard
+    if _dashboard is None:
+        charger_artefacts()
+        contenu = HTML.replace(CLUSTER_STATS_PLACEHOLDER, json.dumps(cluster_stats)).encode('utf-8')
+        # Date des sources du contenu : identique dans tous les workers
+        modifie = max(os.path.getmtime(p) for p in (MODELS_PATH, DATA_PATH, __file__))
+        _dashboard = http_cache.precompresser(contenu, 'text/html', modifie)
+        TIMINGS['dashboard_bytes'] = _dashboard['tailles']
+    return _dashboard
+
+# ============================================
+# ROUTES
+# ============================================
+@app.after_request
+def compresser_reponses(response):
+    # /predict et les autres réponses JSON volumineuses ; / et /history sont déjà traitées
+    return http_cache.compresser_reponse(response)
+
 @app.route('/')
 def index():
-    return HTML
+    return http_cache.servir_actif(construire_dashboard())
 
 @app.route('/predict', methods=['POST'])
+@profiling.profiler_requete
 def predict():
     try:
+        import pandas as pd
+        charger_artefacts()
         data = request.json
+        essai = request.environ.get(ENVIRON_WARMUP, False)   # warm-up : rien n'est enregistré
         client_dict = {
             'LIMIT_BAL' : float(data['limit_bal']),
             'SEX'       : int(data['sex']),
@@ -1038,23 +1464,35 @@ def predict():
         client_df    = pd.DataFrame([client_dict])[features]
         client_array = client_df.values[0]
 
+        # Cluster : argmax de l'appartenance souple (espace PCA du clustering) si le
+        # modèle existe, sinon centroïde le plus proche. Les distances sont affichées.
         cluster_id, distances = assigner_cluster(client_array)
-        gb_model = models[cluster_id]['gradient_boosting']
-        nb_model = models[cluster_id]['naive_bayes']
-        proba_gb = float(gb_model.predict_proba(client_df)[0][1])
-        proba_nb = float(nb_model.predict_proba(client_df)[0][1])
-
-        if proba_gb >= 0.7:
-            risk_level, risk_color = "ÉLEVÉ", "red"
-        elif proba_gb >= 0.35:
-            risk_level, risk_color = "MODÉRÉ", "orange"
-        elif proba_gb >= 0.2:
-            risk_level, risk_color = "FAIBLE", "yellow"
+        membership = appartenance_client(client_dict)
+        if membership is not None:
+            cluster_id = max(membership, key=membership.get)
+        if moniteur is not None:
+            moniteur.observer(cluster_id, client_array, enregistrer=not essai)
+
+        # Client frontalier : mélange des modèles pondéré par l'appartenance souple
+        if membership is None:
+            proba_gb, proba_nb = probas_cluster(cluster_id, client_df, client_dict)
+            blended, proba_gb_cluster = False, proba_gb
         else:
-            risk_level, risk_color = "TRÈS FAIBLE", "green"
-
-        shap_img           = generer_shap_waterfall(client_df, cluster_id)
-        shap_contributions = generer_shap_contributions(client_df, cluster_id)
+            proba_gb, proba_nb, probas = melanger_clusters(membership, client_df, client_dict)
+            blended, proba_gb_cluster  = len(probas) > 1, probas[cluster_id][0]
+
+        # Seuil et bandes du cluster de plus fort poids (optimisés à l'entraînement)
+        seuil, bandes = decisions[int(cluster_id)]
+        risk_level    = niveau_risque(proba_gb, bandes)
+        risk_color    = COULEURS_RISQUE[risk_level]
+
+        shap_contributions, waterfall, explication = expliquer(client_df, cluster_id,
+                                                               data.get('explain'))
+        shap_img = (generer_shap_waterfall(client_df, cluster_id)
+                    if data.get('waterfall_png', WATERFALL_PNG) else None)
+        if waterfall is not None:
+            # Le waterfall explique le seul modèle du cluster retenu, jamais le mélange
+            waterfall.update(cluster=int(cluster_id), blended=blended)
 
         record = {
             'timestamp':  datetime.now().strftime('%d/%m/%Y %H:%M'),
@@ -1066,7 +1504,9 @@ def predict():
             'age':        client_dict['AGE'],
             'limit_bal':  client_dict['LIMIT_BAL'],
         }
-        save_history(record)
+        if not essai:
+            save_history(record)
+            traffic.enregistrer(cluster_id, risk_level, proba_gb)
 
         return jsonify({
             'success':            True,
@@ -1076,8 +1516,16 @@ def predict():
             'proba_nb':           round(proba_nb * 100, 1),
             'risk_level':         risk_level,
             'risk_color':         risk_color,
+            'threshold':          round(seuil * 100, 1),
+            'decision':           bool(proba_gb >= seuil),
+            'membership':         None if membership is None else
+                                  {str(k): round(v * 100, 1) for k, v in membership.items()},
+            'blended':            blended,
+            'proba_gb_cluster':   round(proba_gb_cluster * 100, 1),
             'shap_img':           shap_img,
             'shap_contributions': shap_contributions,
+            'waterfall':          waterfall,
+            'explanation':        explication,
             'cluster_info':       cluster_stats[int(cluster_id)],
         })
 
@@ -1086,8 +1534,69 @@ def predict():
 
 @app.route('/history')
 def history():
-    return jsonify(load_history())
+    # Le fichier est déjà du JSON : servi tel quel, et pas relu si le client est à jour.
+    # Réécrit à chaque prédiction : validé par ETag seul (pas de Last-Modified).
+    if not os.path.exists(HISTORY_PATH):
+        return http_cache.servir_conditionnel('W/"vide"', None, lambda: b'[]')
+    stat = os.stat(HISTORY_PATH)
+
+    def lire():
+        with open(HISTORY_PATH, 'rb') as f:
+            return f.read()
+    return http_cache.servir_conditionnel(http_cache.etag_fichier(stat), None, lire)
+
+@app.route('/monitoring/drift')
+def monitoring_drift():
+    charger_artefacts()
+    if moniteur is None:
+        return jsonify({'available': False,
+                        'error': "références de dérive absentes (relancer train_model0.py)"}), 404
+    return jsonify({'available': True, **moniteur.rapport()})
+
+@app.route('/monitoring/traffic')
+def monitoring_traffic():
+    return jsonify(traffic.rapport())
+
+@app.route('/ready')
+def ready():
+    statut = 200 if est_pret() else 503
+    return jsonify({'ready': est_pret(), 'backend': BACKEND, 'explanation': EXPLICATION,
+                    'reason_code_clusters': sorted(tables_raisons), 'warmup': WARMUP,
+                    'timings': TIMINGS}), statut
+
+# ============================================
+# ADMIN — PROFILS DE REQUÊTES
+# ============================================
+def verifier_admin():
+    # Refus par défaut : sans ADMIN_TOKEN configuré, les routes d'admin sont fermées
+    if not profiling.jeton_admin_valide():
+        abort(403)
+
+@app.route('/admin/profiles')
+def admin_profiles():
+    verifier_admin()
+    return jsonify(profiling.lister_profils())
+
+@app.route('/admin/profiles/<name>')
+def admin_profile(name):
+    verifier_admin()
+    path = profiling.chemin_profil(name)
+    if path is None:
+        abort(404)
+    if request.args.get('format') == 'txt':
+        tri = request.args.get('sort', 'cumulative')
+        if tri not in profiling.TRIS:
+            return jsonify({'error': f"tri inconnu : {tri}", 'valid_sorts': profiling.TRIS}), 400
+        return profiling.resume_profil(path, tri), 200, \
+            {'Content-Type': 'text/plain; charset=utf-8'}
+    return send_file(path, as_attachment=True, download_name=name)
+
+# Serveur WSGI (gunicorn…) : APP_WARMUP=1 lance le warm-up dès l'import
+if os.environ.get('APP_WARMUP') == '1':
+    demarrer_warmup()
 
 if __name__ == '__main__':
+    demarrer_warmup()
+    print("✅ App Flask prête — http://localhost:5000")
     app.run(debug=True, port=5000) 
     
\ No newline at end of file
@@ -0,0 +1,223 @@
+"""
+Moteur de scoring par lot multi-cœurs, partitionné par cluster.
+
+    python batch_scoring.py --input clients.csv --output scored.csv --workers 8
+    python batch_scoring.py --input clients.parquet --chunksize 20000 --compare
+
+Le fichier est lu par blocs (--block lignes). Dans chaque bloc, les lignes sont
+assignées à leur cluster (predict_new.poids_clusters : argmax de l'appartenance
+souple si le modèle existe), regroupées par cluster puis découpées en shards de
+--chunksize lignes envoyés à un pool de processus. Un client frontalier est
+envoyé à chaque cluster de poids non nul et ses probabilités sont mélangées
+comme dans l'API. Chaque worker ne charge que les modèles des clusters qu'il
+reçoit (un pickle par cluster, extrait une fois de models.pkl). Les
+probabilités sont replacées dans l'ordre d'entrée.
+
+--compare rejoue chaque bloc avec le chemin séquentiel (predict_proba par
+cluster dans le processus principal) et rapporte l'accélération.
+"""
+import argparse
+import multiprocessing
+import os
+import pickle
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from calibrators import calibrer
+
+BASE_DIR    = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODELS_PATH = os.path.join(BASE_DIR, 'results', 'models.pkl')
+CACHE_PATH  = os.path.join(BASE_DIR, 'results', 'models_par_cluster')
+
+# ============================================
+# 1. MODÈLES PAR CLUSTER
+# ============================================
+def exporter_modeles_par_cluster(models_path=MODELS_PATH, cache_dir=CACHE_PATH):
+    """
+    Extrait chaque cluster de models.pkl dans son propre pickle (refait seulement
+    si models.pkl est plus récent). Retourne {cluster_id: chemin}.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    ref = os.path.getmtime(models_path)
+    index_path = os.path.join(cache_dir, 'index.pkl')
+    if os.path.exists(index_path) and os.path.getmtime(index_path) >= ref:
+        with open(index_path, 'rb') as f:
+            chemins = pickle.load(f)
+        if all(os.path.exists(p) for p in chemins.values()):
+            return chemins
+
+    with open(models_path, 'rb') as f:
+        models = pickle.load(f)
+    chemins = {}
+    for cid, bundle in models.items():
+        path = os.path.join(cache_dir, f'cluster_{int(cid)}.pkl')
+        with open(path, 'wb') as f:
+            pickle.dump(bundle, f, protocol=pickle.HIGHEST_PROTOCOL)
+        chemins[cid] = path
+    with open(index_path, 'wb') as f:
+        pickle.dump(chemins, f)
+    return chemins
+
+
+# Cache propre à chaque processus worker : {chemin: bundle}
+_bundles = {}
+
+
+def charger_bundle(path):
+    bundle = _bundles.get(path)
+    if bundle is None:
+        with open(path, 'rb') as f:
+            bundle = _bundles[path] = pickle.load(f)
+    return bundle
+
+# ============================================
+# 2. SCORING D'UN SHARD (WORKER)
+# ============================================
+def scorer_shard(path, X, feature_names):
+    """Probabilités GB (calibrées) et NB d'un shard de lignes d'un même cluster."""
+    bundle = charger_bundle(path)
+    X_df   = pd.DataFrame(X, columns=feature_names)
+    return (calibrer(bundle.get('calibrator'),
+                     bundle['gradient_boosting'].predict_proba(X_df)[:, 1]),
+            bundle['naive_bayes'].predict_proba(X_df)[:, 1])
+
+# ============================================
+# 3. PARTITIONNEMENT ET FUSION
+# ============================================
+def partitionner(ids, poids, chunksize):
+    """
+    Positions de poids non nul de chaque cluster, découpées en shards.
+    Retourne [(colonne k, cluster_id, positions)].
+    """
+    shards = []
+    for k, cid in enumerate(ids):
+        positions = np.flatnonzero(poids[:, k] > 0)
+        for i in range(0, len(positions), chunksize):
+            shards.append((k, cid, positions[i:i + chunksize]))
+    return shards
+
+
+def scorer_parallele(pool, X, ids, poids, chemins, feature_names, chunksize):
+    """Soumet les shards au pool et cumule les résultats pondérés dans l'ordre d'entrée."""
+    proba_gb = np.zeros(len(X))
+    proba_nb = np.zeros(len(X))
+    futures  = [(k, positions, pool.submit(scorer_shard, chemins[cid], X[positions], feature_names))
+                for k, cid, positions in partitionner(ids, poids, chunksize)]
+    for k, positions, fut in futures:
+        gb, nb = fut.result()
+        proba_gb[positions] += poids[positions, k] * gb
+        proba_nb[positions] += poids[positions, k] * nb
+    return proba_gb, proba_nb
+
+
+def scorer_sequentiel(X, ids, poids, models, feature_names):
+    """Chemin de référence : predict_proba par cluster dans le processus courant."""
+    proba_gb = np.zeros(len(X))
+    proba_nb = np.zeros(len(X))
+    X_df = pd.DataFrame(X, columns=feature_names)
+    for k, cid in enumerate(ids):
+        masque = poids[:, k] > 0
+        if not masque.any():
+            continue
+        gb = calibrer(models[cid].get('calibrator'),
+                      models[cid]['gradient_boosting'].predict_proba(X_df[masque])[:, 1])
+        proba_gb[masque] += poids[masque, k] * gb
+        proba_nb[masque] += poids[masque, k] * models[cid]['naive_bayes'].predict_proba(X_df[masque])[:, 1]
+    return proba_gb, proba_nb
+
+# ============================================
+# 4. MOTEUR
+# ============================================
+def scorer_fichier(input_path, output_path, workers=None, chunksize=20000, block=500000,
+                   seuil=None, id_col='ID', compare=False):
+    # Import différé : predict_new charge modèles et centroïdes dans le processus
+    # principal seulement ; les workers (spawn) n'importent que ce module.
+    import predict_new as pn
+
+    workers = workers or os.cpu_count()
+    chemins = exporter_modeles_par_cluster()
+    ecrivain = pn.EcrivainSortie(output_path)
+    rapport  = {'rows': 0, 'workers': workers, 'chunksize': chunksize,
+                'parallel_s': 0.0, 'sequential_s': 0.0 if compare else None}
+    t0 = time.perf_counter()
+
+    ctx = multiprocessing.get_context('spawn')
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+            for chunk in pn.lire_par_morceaux(input_path, block):
+                X_df     = pn.preparer_lot(chunk)
+                X        = X_df.to_numpy(dtype=float)
+                clusters, ids, poids = pn.poids_clusters(X_df)
+
+                t_par = time.perf_counter()
+                proba_gb, proba_nb = scorer_parallele(pool, X, ids, poids, chemins,
+                                                      pn.features, chunksize)
+                rapport['parallel_s'] += time.perf_counter() - t_par
+
+                if compare:
+                    t_seq = time.perf_counter()
+                    ref_gb, _ = scorer_sequentiel(X, ids, poids, pn.models, pn.features)
+                    rapport['sequential_s'] += time.perf_counter() - t_seq
+                    if not np.allclose(ref_gb, proba_gb):
+                        raise RuntimeError("Écart entre scoring parallèle et séquentiel")
+
+                sortie = pd.DataFrame(index=chunk.index)
+                if id_col in chunk.columns:
+                    sortie[id_col] = chunk[id_col].to_numpy()
+                sortie['cluster']    = clusters
+                sortie['blended']    = (poids > 0).sum(axis=1) > 1
+                sortie['proba_gb']   = proba_gb.round(6)
+                sortie['proba_nb']   = proba_nb.round(6)
+                sortie['decision'], sortie['risk_level'] = pn.decider_lot(proba_gb, clusters, seuil)
+                ecrivain.ecrire(sortie)
+
+                rapport['rows'] += len(chunk)
+                duree = time.perf_counter() - t0
+                print(f"   {rapport['rows']:>10,} lignes | {rapport['rows'] / duree:>10,.0f} lignes/s",
+                      flush=True)
+    finally:
+        ecrivain.fermer()
+
+    rapport['duration_s'] = round(time.perf_counter() - t0, 3)
+    rapport['parallel_s'] = round(rapport['parallel_s'], 3)
+    if compare:
+        rapport['sequential_s'] = round(rapport['sequential_s'], 3)
+        rapport['speedup'] = round(rapport['sequential_s'] / rapport['parallel_s'], 2) \
+            if rapport['parallel_s'] else None
+    return rapport
+
+# ============================================
+# 5. MAIN
+# ============================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scoring par lot multi-cœurs partitionné par cluster")
+    parser.add_argument('--input', required=True, help="fichier CSV ou Parquet")
+    parser.add_argument('--output', help="fichier de sortie (.csv ou .parquet)")
+    parser.add_argument('--workers', type=int, help="processus (défaut : nombre de cœurs)")
+    parser.add_argument('--chunksize', type=int, default=20000, help="lignes par shard")
+    parser.add_argument('--block', type=int, default=500000, help="lignes lues par bloc")
+    parser.add_argument('--seuil', type=float, help="seuil de décision (défaut : celui du cluster)")
+    parser.add_argument('--id-col', default='ID')
+    parser.add_argument('--compare', action='store_true',
+                        help="mesurer aussi le chemin séquentiel et l'accélération")
+    args = parser.parse_args(argv)
+
+    output  = args.output or os.path.splitext(args.input)[0] + '_scored.csv'
+    rapport = scorer_fichier(args.input, output, args.workers, args.chunksize, args.block,
+                             args.seuil, args.id_col, args.compare)
+
+    print(f"\n✅ {rapport['rows']:,} lignes scorées en {rapport['duration_s']} s → {output}")
+    print(f"   Scoring parallèle  : {rapport['parallel_s']} s "
+          f"({rapport['workers']} processus, shards de {rapport['chunksize']})")
+    if args.compare:
+        print(f"   Scoring séquentiel : {rapport['sequential_s']} s")
+        print(f"   Accélération       : ×{rapport['speedup']}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,656 @@
+"""
+Banc d'essai reproductible du service de scoring et du pipeline.
+
+    python benchmark.py                                   # toutes les sections
+    python benchmark.py --sections predict shap
+    python benchmark.py --baseline ../results/benchmarks/bench_xxx.json
+
+Les résultats sont écrits en JSON dans results/benchmarks/ ; avec --baseline,
+chaque métrique est comparée au run de référence.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import pickle
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from importlib import metadata
+
+import numpy as np
+import pandas as pd
+
+from cluster_index import trier_par_cluster, tranche_cluster
+from schema import lire_csv, octets_par_ligne
+from features import RAW_FEATURES, BILL_COLS, PAY_AMT_COLS, deriver_features, nettoyer_categories
+
+# ============================================
+# CHEMINS
+# ============================================
+PROJECT_DIR    = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR       = os.path.dirname(PROJECT_DIR)
+RAW_PATH       = os.path.join(BASE_DIR, 'data', 'UCI_Credit_Card.csv')
+CLEAN_PATH     = os.path.join(BASE_DIR, 'data', 'cleaned_data.csv')
+CLUSTERED_PATH = os.path.join(BASE_DIR, 'data', 'cleaned_data_with_clusters.csv')
+MODELS_PATH    = os.path.join(BASE_DIR, 'results', 'models.pkl')
+BENCH_PATH     = os.path.join(BASE_DIR, 'results', 'benchmarks')
+
+SECTIONS      = ['startup', 'predict', 'training', 'imbalance', 'clustering', 'shap',
+                 'cluster_index', 'dtypes', 'onnx', 'reasons', 'http']
+MONETARY_COLS = ['LIMIT_BAL'] + BILL_COLS + PAY_AMT_COLS
+
+# ============================================
+# 1. GÉNÉRATEUR DE CLIENTS SYNTHÉTIQUES
+# ============================================
+def generer_clients(n, seed=42, source=None):
+    """
+    Génère n clients bruts suivant les distributions de UCI_Credit_Card.csv :
+    tirage de lignes réelles avec remise, puis bruit multiplicatif (±5 %)
+    sur les montants pour obtenir des clients inédits. Déterministe via seed.
+    """
+    if source is None:
+        source = RAW_PATH if os.path.exists(RAW_PATH) else os.path.join(PROJECT_DIR, 'UCI_Credit_Card.csv')
+    raw = pd.read_csv(source, usecols=RAW_FEATURES)[RAW_FEATURES]
+
+    rng = np.random.default_rng(seed)
+    df  = raw.iloc[rng.integers(0, len(raw), n)].reset_index(drop=True)
+
+    bruit = rng.lognormal(mean=0.0, sigma=0.05, size=(n, len(MONETARY_COLS)))
+    df[MONETARY_COLS] = np.round(df[MONETARY_COLS].to_numpy(dtype=float) * bruit)
+
+    # Même nettoyage que clean_data.py
+    return nettoyer_categories(df)
+
+
+def vers_payload(client):
+    """Convertit une ligne brute (Series ou dict) en payload JSON de /predict."""
+    return {k.lower(): float(v) for k, v in dict(client).items()}
+
+
+def generer_payloads(n, seed=42, source=None):
+    return [vers_payload(row) for _, row in generer_clients(n, seed, source).iterrows()]
+
+# ============================================
+# 2. UTILITAIRES DE MESURE
+# ============================================
+def percentiles(latences_ms):
+    lat = np.asarray(latences_ms, dtype=float)
+    if lat.size == 0:
+        return {}
+    return {
+        'n':       int(lat.size),
+        'mean_ms': round(float(lat.mean()), 3),
+        'p50_ms':  round(float(np.percentile(lat, 50)), 3),
+        'p90_ms':  round(float(np.percentile(lat, 90)), 3),
+        'p95_ms':  round(float(np.percentile(lat, 95)), 3),
+        'p99_ms':  round(float(np.percentile(lat, 99)), 3),
+        'max_ms':  round(float(lat.max()), 3),
+    }
+
+
+def chrono(fn, *args, **kwargs):
+    """Exécute fn et retourne (résultat, durée en secondes)."""
+    t0 = time.perf_counter()
+    res = fn(*args, **kwargs)
+    return res, time.perf_counter() - t0
+
+
+@contextlib.contextmanager
+def silence():
+    """Coupe les print() des scripts du pipeline pendant la mesure."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+# ============================================
+# 3. SECTIONS
+# ============================================
+# Variantes de réponse /predict : waterfall structuré (défaut) ou PNG matplotlib,
+# explication par tables de codes raisons ou TreeSHAP exact
+VARIANTES_PREDICT = {
+    'structured_fast':  {},
+    'structured_exact': {'explain': 'exact'},
+    'png_exact':        {'explain': 'exact', 'waterfall_png': True},
+}
+
+
+def bench_predict(n_requests=200, batch_sizes=(1, 32, 256, 1024), repeats=20, seed=42,
+                  n_variant=50):
+    """
+    Latence /predict unitaire (test client Flask), taille et latence par variante de
+    réponse, et scoring par lot sans SHAP.
+    """
+    import app as service
+
+    service.charger_artefacts()
+    client   = service.app.test_client()
+    payloads = generer_payloads(n_requests, seed)
+    result   = {}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Ne pas polluer l'historique réel
+        service.HISTORY_PATH = os.path.join(tmp, 'prediction_history.json')
+
+        latences, erreurs = [], 0
+        t_total = time.perf_counter()
+        for i, payload in enumerate(payloads):
+            t0   = time.perf_counter()
+            resp = client.post('/predict', json=payload)
+            latences.append((time.perf_counter() - t0) * 1000)
+            if resp.status_code != 200 or not resp.get_json().get('success'):
+                erreurs += 1
+        t_total = time.perf_counter() - t_total
+
+        variantes = {}
+        for nom, options in VARIANTES_PREDICT.items():
+            lat, octets = [], []
+            for payload in payloads[:n_variant]:
+                t0   = time.perf_counter()
+                resp = client.post('/predict', json={**payload, **options})
+                lat.append((time.perf_counter() - t0) * 1000)
+                octets.append(len(resp.get_data()))
+            variantes[nom] = {**percentiles(lat[1:]),
+                              'mean_bytes': round(float(np.mean(octets)), 0)}
+        reference = variantes['png_exact']
+        for v in variantes.values():
+            v['bytes_ratio_vs_png'] = round(v['mean_bytes'] / reference['mean_bytes'], 4)
+            v['p50_ratio_vs_png']   = round(v['p50_ms'] / reference['p50_ms'], 4)
+        result['predict_variants'] = variantes
+
+    result['predict_single'] = {
+        **percentiles(latences[5:]),
+        'first_ms':       round(latences[0], 3),
+        'errors':         erreurs,
+        'throughput_per_s': round(len(latences) / t_total, 2),
+    }
+
+    # Scoring par lot : assignation + predict_proba, même chemin que /predict sans SHAP
+    clients = deriver_features(generer_clients(max(batch_sizes), seed + 1))[service.features]
+    centres = np.array([service.centroids[c] for c in sorted(service.centroids)])
+    ids     = np.array(sorted(service.centroids))
+
+    def scorer_lot(X):
+        d = ((X.to_numpy(dtype=float)[:, None, :] - centres[None, :, :]) ** 2).sum(axis=2)
+        assign = ids[d.argmin(axis=1)]
+        proba  = np.empty(len(X))
+        for cid in np.unique(assign):
+            m = assign == cid
+            proba[m] = service.models[cid]['gradient_boosting'].predict_proba(X[m])[:, 1]
+        return proba
+
+    batch = {}
+    for size in batch_sizes:
+        X = clients.iloc[:size]
+        lat = [chrono(scorer_lot, X)[1] * 1000 for _ in range(repeats)]
+        batch[str(size)] = {
+            **percentiles(lat),
+            'rows_per_s': round(size / (np.median(lat) / 1000), 1),
+        }
+    result['predict_batch'] = batch
+    return result
+
+
+_SCRIPT_STARTUP = """
+import json, time
+t0 = time.perf_counter()
+import app
+t_import = time.perf_counter() - t0
+t1 = time.perf_counter()
+app.charger_artefacts()
+t_art = time.perf_counter() - t1
+t1 = time.perf_counter()
+app.charger_shap()
+t_shap = time.perf_counter() - t1
+t1 = time.perf_counter()
+app.warmup()
+t_warm = time.perf_counter() - t1
+print(json.dumps({'import_app_s': t_import, 'artefacts_s': t_art, 'shap_import_s': t_shap,
+                  'warmup_s': t_warm, 'timings': app.TIMINGS, 'warmup': app.WARMUP}))
+"""
+
+
+def importtime(module, top=15):
+    """Temps d'import cumulé par module (python -X importtime), les `top` plus lents."""
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                          cwd=PROJECT_DIR, capture_output=True, text=True)
+    racines = {}
+    for ligne in proc.stderr.splitlines():
+        if not ligne.startswith('import time:') or ligne.count('|') != 2:
+            continue
+        _, cumulatif, nom = ligne[len('import time:'):].split('|')
+        # Seuls les imports de premier niveau (un seul espace d'indentation) sont gardés
+        if not cumulatif.strip().isdigit() or len(nom) - len(nom.lstrip()) != 1:
+            continue
+        racines[nom.strip()] = int(cumulatif) / 1000
+    return {k: round(v, 1) for k, v in sorted(racines.items(), key=lambda kv: -kv[1])[:top]}
+
+
+def bench_startup(repeats=3):
+    """Démarrage à froid de app.py dans un processus neuf : import, artefacts, shap."""
+    runs = []
+    for _ in range(repeats):
+        proc = subprocess.run([sys.executable, '-c', _SCRIPT_STARTUP], cwd=PROJECT_DIR,
+                              capture_output=True, text=True, check=True)
+        runs.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+    med = lambda k: round(float(np.median([r[k] for r in runs])), 4)
+    return {'startup': {
+        'import_app_s':   med('import_app_s'),
+        'artefacts_s':    med('artefacts_s'),
+        'shap_import_s':  med('shap_import_s'),
+        'warmup_s':       med('warmup_s'),
+        'timings':        runs[-1]['timings'],
+        'warmup':         runs[-1]['warmup']['clusters'],
+        'importtime_app_ms': importtime('app'),
+    }}
+
+
+def bench_training(seed=42):
+    """Temps d'entraînement par cluster (split + SMOTE + GB + NB), sans les figures."""
+    import train_model0
+
+    with silence():
+        df = train_model0.charger_donnees()
+    result = {}
+    for cid in sorted(df[train_model0.CLUSTER_COL].unique()):
+        with silence():
+            _, duree = chrono(train_model0.train_cluster, df, cid, plots=False)
+        result[str(int(cid))] = {
+            'rows':      int((df[train_model0.CLUSTER_COL] == cid).sum()),
+            'fit_s':     round(duree, 3),
+        }
+    return {'training': result}
+
+
+def bench_imbalance(seed=42):
+    """
+    Par cluster : SMOTE recalculé, SMOTE relu du cache et poids de classes.
+    Temps de rééquilibrage + fit et AUC GB sur le même split de test.
+    """
+    import shutil
+    from sklearn.metrics import roc_auc_score
+    import train_model0
+    import resampling
+
+    with silence():
+        df = train_model0.charger_donnees()
+    cache_tmp = tempfile.mkdtemp()
+    cache_ref = resampling.SMOTE_CACHE_PATH
+    resampling.SMOTE_CACHE_PATH = cache_tmp   # cache vide : premier passage = calcul
+    try:
+        result = {}
+        for cid in sorted(df[train_model0.CLUSTER_COL].unique()):
+            entry = {}
+            for nom, mode in [('smote_cold', 'smote'), ('smote_cached', 'smote'),
+                              ('class_weight', 'class_weight')]:
+                with silence():
+                    res, duree = chrono(train_model0.train_cluster, df, cid, plots=False, mode=mode)
+                holdout = res['holdout']
+                entry[nom] = {
+                    'resample_s': res['timings']['resample_s'],
+                    'total_s':    round(duree, 3),
+                    'auc_gb':     round(float(roc_auc_score(holdout['y'], holdout['proba_gb'])), 4),
+                }
+            result[str(int(cid))] = entry
+    finally:
+        resampling.SMOTE_CACHE_PATH = cache_ref
+        shutil.rmtree(cache_tmp, ignore_errors=True)
+    return {'imbalance': result}
+
+
+def bench_clustering(sizes=(2000, 5000, 10000, 20000, 30000), seed=42):
+    """Temps standardisation+PCA, HDBSCAN et réassignation des outliers selon le nombre de lignes."""
+    from clustering import FEATURES_CLUSTERING, projeter_pca, clusteriser, reassigner_outliers
+
+    df = pd.read_csv(CLEAN_PATH, usecols=FEATURES_CLUSTERING)
+    result = {}
+    for n in sizes:
+        n   = min(n, len(df))
+        X   = df.sample(n, random_state=seed)[FEATURES_CLUSTERING]
+        (_, _, X_pca), t_pca = chrono(projeter_pca, X)
+        labels, t_hdb        = chrono(clusteriser, X_pca)
+        _, t_out             = chrono(reassigner_outliers, X_pca, labels)
+        result[str(n)] = {
+            'pca_s':      round(t_pca, 3),
+            'hdbscan_s':  round(t_hdb, 3),
+            'outliers_s': round(t_out, 3),
+            'clusters':   int(len(set(labels)) - (1 if -1 in labels else 0)),
+        }
+    return {'clustering': result}
+
+
+def bench_shap(rows=(1, 100), seed=42):
+    """Construction du TreeExplainer et temps SHAP par ligne, par cluster."""
+    import shap
+
+    with open(MODELS_PATH, 'rb') as f:
+        models = pickle.load(f)
+    df = pd.read_csv(CLUSTERED_PATH)
+    df = df.fillna(df.median(numeric_only=True))
+    df, _ = trier_par_cluster(df)
+
+    result = {}
+    for cid, bundle in sorted(models.items()):
+        X = tranche_cluster(df, cid)[bundle['feature_names']]
+        explainer, t_build = chrono(shap.TreeExplainer, bundle['gradient_boosting'])
+        entry = {'explainer_build_ms': round(t_build * 1000, 3)}
+        for n in rows:
+            X_s = X.sample(min(n, len(X)), random_state=seed)
+            _, t = chrono(explainer.shap_values, X_s)
+            entry[f'per_row_ms_{n}'] = round(t * 1000 / len(X_s), 4)
+        result[str(int(cid))] = entry
+    return {'shap': result}
+
+def bench_cluster_index(n_clusters=(3, 10, 30, 100), repeats=5, seed=42):
+    """
+    Accès aux lignes de chaque cluster : masque booléen par cluster (une passe complète
+    par cluster) contre tri par cluster + tranches, et stats par boucle contre groupby.
+    """
+    base = pd.read_csv(CLEAN_PATH)
+    rng  = np.random.default_rng(seed)
+    result = {}
+    for k in n_clusters:
+        df = base.copy()
+        df['Cluster'] = rng.integers(0, k, len(df))
+        ids = sorted(df['Cluster'].unique())
+
+        def par_masque():
+            return [df[df['Cluster'] == c]['LIMIT_BAL'].mean() for c in ids]
+
+        def par_tranche():
+            df_tri, offsets = trier_par_cluster(df)
+            return [df_tri['LIMIT_BAL'].iloc[d:f].mean() for d, f in offsets.values()]
+
+        def par_groupby():
+            return df.groupby('Cluster', sort=True)['LIMIT_BAL'].mean()
+
+        t_masque  = min(chrono(par_masque)[1] for _ in range(repeats))
+        t_tranche = min(chrono(par_tranche)[1] for _ in range(repeats))
+        t_groupby = min(chrono(par_groupby)[1] for _ in range(repeats))
+        result[str(k)] = {
+            'mask_ms':    round(t_masque * 1000, 3),
+            'sorted_slice_ms': round(t_tranche * 1000, 3),
+            'groupby_ms': round(t_groupby * 1000, 3),
+            'speedup_slice': round(t_masque / t_tranche, 2),
+        }
+    return {'cluster_index': result}
+
+def bench_dtypes(repeats=5):
+    """Mémoire par ligne et passes vectorisées : types pandas par défaut contre schema.py."""
+    def passe(df):
+        deriver_features(df)
+        return df.groupby('Cluster', sort=True).mean()
+
+    result = {}
+    for nom, lire in [('default', pd.read_csv), ('compact', lire_csv)]:
+        df, t_lecture = chrono(lire, CLUSTERED_PATH)
+        if nom == 'default':
+            df = df.fillna(df.median(numeric_only=True))
+        t_passe = min(chrono(passe, df.copy())[1] for _ in range(repeats))
+        result[nom] = {
+            'bytes_per_row': round(float(octets_par_ligne(df)), 1),
+            'read_s':        round(t_lecture, 3),
+            'vector_pass_ms': round(t_passe * 1000, 3),
+        }
+    result['memory_ratio'] = round(result['compact']['bytes_per_row']
+                                   / result['default']['bytes_per_row'], 3)
+    return {'dtypes': result}
+
+
+def bench_onnx(batch_sizes=(1, 32, 1024), repeats=20, rows=2000, seed=42):
+    """Parité puis latence GB + NB par cluster : predict_proba sklearn contre ONNX Runtime CPU."""
+    import shutil
+    from onnx_scoring import BackendONNX, exporter_onnx, verifier_parite
+
+    with open(MODELS_PATH, 'rb') as f:
+        models = pickle.load(f)
+    onnx_dir = tempfile.mkdtemp()
+    try:
+        with silence():
+            # La parité est mesurée et rapportée ci-dessous, pas imposée
+            exporter_onnx(models, onnx_dir, verifier=False)
+        backend = BackendONNX(onnx_dir)
+        result  = {'parity': verifier_parite(models, backend, rows, seed)}
+
+        clients = generer_clients(max(batch_sizes), seed + 2)
+        derives = deriver_features(clients.copy())
+        latence = {}
+        for size in batch_sizes:
+            brut = clients.iloc[:size][RAW_FEATURES].to_numpy(dtype=np.float32)
+            lat_skl, lat_onnx = [], []
+            for cid, bundle in models.items():
+                X = derives.iloc[:size][bundle['feature_names']]
+                for _ in range(repeats):
+                    lat_skl.append(chrono(lambda: (bundle['gradient_boosting'].predict_proba(X),
+                                                   bundle['naive_bayes'].predict_proba(X)))[1] * 1000)
+                    lat_onnx.append(chrono(backend.predire, cid, brut)[1] * 1000)
+            latence[str(size)] = {
+                'sklearn': percentiles(lat_skl),
+                'onnx':    percentiles(lat_onnx),
+                'speedup': round(float(np.median(lat_skl) / np.median(lat_onnx)), 2),
+            }
+        result['latency'] = latence
+    finally:
+        shutil.rmtree(onnx_dir, ignore_errors=True)
+    return {'onnx': result}
+
+
+def bench_reasons(table_rows=2000, eval_rows=500, repeats=200, seed=42):
+    """
+    Codes raisons approchés contre TreeSHAP exact, par cluster : fidélité sur des lignes
+    hors de l'échantillon de construction, puis latence d'une explication d'un client.
+    """
+    import shap
+    from reason_codes import construire_table, fidelite, raisons
+
+    with open(MODELS_PATH, 'rb') as f:
+        models = pickle.load(f)
+    df = lire_csv(CLUSTERED_PATH, fillna_median=True)
+    df, _ = trier_par_cluster(df)
+
+    result = {}
+    for cid, bundle in sorted(models.items()):
+        X       = tranche_cluster(df, cid)[bundle['feature_names']]
+        X_eval  = X.sample(min(eval_rows, len(X) // 2), random_state=seed)
+        restant = X.drop(index=X_eval.index)
+        X_table = restant.sample(min(table_rows, len(restant)), random_state=seed)
+
+        explainer = shap.TreeExplainer(bundle['gradient_boosting'])
+        table = construire_table(explainer.shap_values(X_table), X_table, explainer.expected_value)
+        entry = fidelite(table, explainer, X_eval)
+
+        client = X_eval.iloc[:1]
+        x      = client.to_numpy(dtype=np.float64)[0]
+        entry['fast_latency']  = percentiles([chrono(raisons, table, x)[1] * 1000
+                                              for _ in range(repeats)])
+        entry['exact_latency'] = percentiles([chrono(explainer.shap_values, client)[1] * 1000
+                                              for _ in range(max(repeats // 10, 1))])
+        entry['speedup'] = round(entry['exact_latency']['p50_ms']
+                                 / max(entry['fast_latency']['p50_ms'], 1e-6), 1)
+        result[str(int(cid))] = entry
+    return {'reasons': result}
+
+
+def bench_http(repeats=50, n_predict=20, seed=42):
+    """
+    Octets transférés et latence de /, /history et /predict (test client Flask) : sans
+    compression, gzip, brotli, puis revalidation conditionnelle (304) pour / et /history.
+    """
+    import app as service
+
+    service.charger_artefacts()
+    client = service.app.test_client()
+    encodages = {'identity': {}, 'gzip': {'Accept-Encoding': 'gzip'},
+                 'br': {'Accept-Encoding': 'br, gzip'}}
+
+    def mesurer(envoyer):
+        lat, octets, statuts = [], [], set()
+        for _ in range(repeats):
+            resp, t = chrono(envoyer)
+            lat.append(t * 1000)
+            octets.append(len(resp.get_data()))
+            statuts.add(resp.status_code)
+        return {**percentiles(lat[1:]), 'bytes': int(np.median(octets)),
+                'status': sorted(statuts)}
+
+    result = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        service.HISTORY_PATH = os.path.join(tmp, 'prediction_history.json')
+        for payload in generer_payloads(n_predict, seed):
+            client.post('/predict', json=payload)
+
+        for route in ['/', '/history']:
+            entree = {enc: mesurer(lambda: client.get(route, headers=h))
+                      for enc, h in encodages.items()}
+            validateur = client.get(route).headers['ETag']
+            entree['not_modified'] = mesurer(
+                lambda: client.get(route, headers={'If-None-Match': validateur}))
+            result[route] = entree
+
+        payload = generer_payloads(1, seed + 3)[0]
+        result['/predict'] = {enc: mesurer(lambda: client.post('/predict', json=payload, headers=h))
+                              for enc, h in encodages.items()}
+
+    for entree in result.values():
+        for enc in ('gzip', 'br', 'not_modified'):
+            if enc in entree:
+                entree[enc]['bytes_ratio'] = round(entree[enc]['bytes']
+                                                   / max(entree['identity']['bytes'], 1), 4)
+    return {'http': result}
+
+# ============================================
+# 4. MÉTADONNÉES, SAUVEGARDE ET COMPARAISON
+# ============================================
+def meta(args):
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    versions = {}
+    for dist in ['numpy', 'pandas', 'scikit-learn', 'shap', 'flask', 'hdbscan',
+                 'onnxruntime', 'skl2onnx', 'brotli']:
+        try:
+            versions[dist] = metadata.version(dist)
+        except metadata.PackageNotFoundError:
+            versions[dist] = None
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'commit':    commit,
+        'python':    platform.python_version(),
+        'platform':  platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'versions':  versions,
+        'seed':      args.seed,
+        'sections':  args.sections,
+    }
+
+
+def aplatir(d, prefix=''):
+    """{'a': {'b': 1}} → {'a.b': 1} (métriques numériques uniquement)."""
+    out = {}
+    for k, v in d.items():
+        key = f'{prefix}{k}'
+        if isinstance(v, dict):
+            out.update(aplatir(v, key + '.'))
+        elif isinstance(v, (int, float)) and not isinstance(v, bool):
+            out[key] = v
+    return out
+
+
+def comparer(resultats, baseline, tolerance=0.10):
+    """
+    Compare deux runs métrique par métrique. Une durée (*_ms, *_s) qui augmente
+    ou un débit (*_per_s) qui baisse de plus de `tolerance` est une régression.
+    """
+    cur, ref = aplatir(resultats), aplatir(baseline)
+    lignes = []
+    for key in sorted(set(cur) & set(ref)):
+        if ref[key] == 0:
+            continue
+        delta = (cur[key] - ref[key]) / abs(ref[key])
+        if key.endswith('_per_s'):
+            regression = delta < -tolerance
+        elif key.endswith('_ms') or key.endswith('_s'):
+            regression = delta > tolerance
+        else:
+            regression = False
+        lignes.append({'metric': key, 'baseline': ref[key], 'current': cur[key],
+                       'delta_pct': round(delta * 100, 1), 'regression': regression})
+    return lignes
+
+
+def afficher_comparaison(lignes):
+    print(f"\n  {'Métrique':<45} {'Référence':>12} {'Actuel':>12} {'Δ %':>8}")
+    print(f"  {'-'*80}")
+    for l in lignes:
+        flag = "  ⚠️" if l['regression'] else ""
+        print(f"  {l['metric']:<45} {l['baseline']:>12} {l['current']:>12} {l['delta_pct']:>+8.1f}{flag}")
+    n_reg = sum(l['regression'] for l in lignes)
+    print(f"\n  {n_reg} régression(s) détectée(s)")
+
+# ============================================
+# 5. MAIN
+# ============================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark du scoring et du pipeline")
+    parser.add_argument('--sections', nargs='+', choices=SECTIONS, default=SECTIONS)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--requests', type=int, default=200, help="nombre d'appels /predict")
+    parser.add_argument('--output', help="fichier JSON de sortie")
+    parser.add_argument('--baseline', help="run JSON de référence à comparer")
+    parser.add_argument('--tolerance', type=float, default=0.10)
+    args = parser.parse_args(argv)
+
+    np.random.seed(args.seed)
+    resultats = {}
+    for section in args.sections:
+        print(f"⏱️  Section {section}...")
+        if section == 'startup':
+            resultats.update(bench_startup())
+        elif section == 'predict':
+            resultats.update(bench_predict(n_requests=args.requests, seed=args.seed))
+        elif section == 'training':
+            resultats.update(bench_training(seed=args.seed))
+        elif section == 'imbalance':
+            resultats.update(bench_imbalance(seed=args.seed))
+        elif section == 'clustering':
+            resultats.update(bench_clustering(seed=args.seed))
+        elif section == 'shap':
+            resultats.update(bench_shap(seed=args.seed))
+        elif section == 'cluster_index':
+            resultats.update(bench_cluster_index(seed=args.seed))
+        elif section == 'dtypes':
+            resultats.update(bench_dtypes())
+        elif section == 'onnx':
+            resultats.update(bench_onnx(seed=args.seed))
+        elif section == 'reasons':
+            resultats.update(bench_reasons(seed=args.seed))
+        elif section == 'http':
+            resultats.update(bench_http(seed=args.seed))
+
+    run = {'meta': meta(args), 'results': resultats}
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        run['comparison'] = comparer(resultats, baseline['results'], args.tolerance)
+        afficher_comparaison(run['comparison'])
+
+    output = args.output or os.path.join(
+        BENCH_PATH, f"bench_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(run, f, indent=2)
+    print(f"\n✅ Résultats sauvegardés → {output}")
+
+    if args.baseline and any(l['regression'] for l in run['comparison']):
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
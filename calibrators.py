@@ -0,0 +1,122 @@
+"""
+Calibration des probabilités Gradient Boosting par cluster.
+
+Le GB est entraîné sur des données rééquilibrées (SMOTE ou poids de classes) :
+ses probabilités surestiment le taux de défaut, et pas de la même façon d'un
+cluster à l'autre. Un calibrateur isotonique ou de Platt est ajusté sur le
+held-out du cluster puis stocké comme une table de points de rupture
+(x croissants, y) : l'application est une interpolation linéaire par
+searchsorted, vectorisée, sans objet sklearn au scoring.
+
+Le held-out sert aussi à choisir le seuil et à mesurer la calibration : ces deux
+usages reçoivent des probabilités calibrées hors pli (cross-fitting, N_PLIS plis
+stratifiés), chaque ligne étant calibrée par un calibrateur qui ne l'a pas vue.
+Le calibrateur servi est ajusté sur tout le held-out.
+"""
+import numpy as np
+
+METHODES = ['auto', 'isotonic', 'platt', 'none']
+
+N_MIN_ISOTONIQUE = 1000   # held-out plus petit : Platt (2 paramètres, moins de variance)
+N_POINTS_PLATT   = 101    # sigmoïde tabulée aux quantiles du held-out
+N_PLIS           = 2      # cross-fitting des probabilités calibrées d'évaluation
+EPS              = 1e-6
+
+# ============================================
+# 1. AJUSTEMENT (ENTRAÎNEMENT)
+# ============================================
+def _logit(p):
+    p = np.clip(p, EPS, 1 - EPS)
+    return np.log(p / (1 - p))
+
+
+def ajuster_isotonique(y, proba):
+    from sklearn.isotonic import IsotonicRegression
+    iso = IsotonicRegression(y_min=0.0, y_max=1.0, out_of_bounds='clip').fit(proba, y)
+    return iso.X_thresholds_, iso.y_thresholds_
+
+
+def ajuster_platt(y, proba):
+    from sklearn.linear_model import LogisticRegression
+    lr = LogisticRegression(C=1e6).fit(_logit(proba)[:, None], y)
+    a, b = float(lr.coef_[0, 0]), float(lr.intercept_[0])
+    x = np.unique(np.concatenate([[0.0, 1.0],
+                                  np.quantile(proba, np.linspace(0, 1, N_POINTS_PLATT))]))
+    return x, 1 / (1 + np.exp(-(a * _logit(x) + b)))
+
+
+def ajuster_calibrateur(y, proba, methode='auto'):
+    """
+    {'method', 'x', 'y', 'n'} ajusté sur (y, proba) held-out, ou None si methode vaut
+    'none' ou si le held-out ne contient qu'une classe. 'auto' : isotonique à partir
+    de N_MIN_ISOTONIQUE lignes, Platt en dessous.
+    """
+    y     = np.asarray(y).astype(np.int64)
+    proba = np.asarray(proba, dtype=np.float64)
+    if methode not in METHODES:
+        raise ValueError(f"Méthode de calibration inconnue : {methode} (attendu : {METHODES})")
+    if methode == 'none' or len(np.unique(y)) < 2:
+        return None
+    if methode == 'auto':
+        methode = 'isotonic' if len(y) >= N_MIN_ISOTONIQUE else 'platt'
+    x, v = (ajuster_isotonique if methode == 'isotonic' else ajuster_platt)(y, proba)
+    return {'method': methode,
+            'x': np.asarray(x, dtype=np.float64),
+            'y': np.asarray(v, dtype=np.float64),
+            'n': int(len(y))}
+
+def calibrer_hors_pli(y, proba, methode='auto', n_plis=N_PLIS, seed=42):
+    """
+    (calibrateur servi, probabilités calibrées hors pli). Le calibrateur servi est
+    ajusté sur tout le held-out ; chaque pli est calibré par un calibrateur ajusté sur
+    les autres plis, avec la même méthode. Sans assez de défauts pour n_plis plis
+    stratifiés, les probabilités sont calibrées en échantillon (calibrateur['evaluation']
+    vaut alors 'in_sample').
+    """
+    from sklearn.model_selection import StratifiedKFold
+    y     = np.asarray(y).astype(np.int64)
+    proba = np.asarray(proba, dtype=np.float64)
+    final = ajuster_calibrateur(y, proba, methode)
+    if final is None:
+        return None, proba.copy()
+    if np.bincount(y, minlength=2).min() < n_plis:
+        final['evaluation'] = 'in_sample'
+        return final, calibrer(final, proba)
+
+    hors_pli = np.empty(len(y))
+    plis = StratifiedKFold(n_plis, shuffle=True, random_state=seed).split(proba, y)
+    for ajustement, evaluation in plis:
+        cal = ajuster_calibrateur(y[ajustement], proba[ajustement], final['method'])
+        hors_pli[evaluation] = calibrer(cal, proba[evaluation])
+    final['evaluation'] = 'cross_fit'
+    return final, hors_pli
+
+# ============================================
+# 2. APPLICATION (SCORING)
+# ============================================
+def calibrer(calibrateur, proba):
+    """
+    Probabilité calibrée : interpolation linéaire entre les deux points de rupture
+    encadrants (searchsorted), constante hors de [x_min, x_max]. Scalaire ou tableau ;
+    sans calibrateur, proba est renvoyée telle quelle.
+    """
+    if calibrateur is None:
+        return proba
+    x, v = calibrateur['x'], calibrateur['y']
+    p = np.asarray(proba, dtype=np.float64)
+    if len(x) == 1:
+        sortie = np.full(p.shape, v[0])
+    else:
+        i  = np.clip(np.searchsorted(x, p, side='right'), 1, len(x) - 1)
+        x0, x1 = x[i - 1], x[i]
+        t  = np.clip((p - x0) / (x1 - x0), 0.0, 1.0)
+        sortie = v[i - 1] + t * (v[i] - v[i - 1])
+    return float(sortie) if np.ndim(proba) == 0 else sortie
+
+
+def resume(calibrateur):
+    """Description JSON d'un calibrateur (manifeste, rapport)."""
+    if calibrateur is None:
+        return None
+    return {'method': calibrateur['method'], 'breakpoints': int(len(calibrateur['x'])),
+            'n': calibrateur['n'], 'evaluation': calibrateur.get('evaluation')}
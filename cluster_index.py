@@ -0,0 +1,34 @@
+"""
+Index des lignes par cluster sur un dataset trié par `Cluster`.
+
+Une fois le DataFrame trié (tri stable), les lignes d'un cluster forment une
+plage contiguë : tranche_cluster() la retrouve par recherche dichotomique et
+renvoie une tranche iloc, au lieu d'un masque booléen sur toutes les lignes
+(df[df['Cluster'] == cid]) à chaque étape et pour chaque cluster.
+"""
+import numpy as np
+
+CLUSTER_COL = 'Cluster'
+
+
+def trier_par_cluster(df, cluster_col=CLUSTER_COL):
+    """Trie df par cluster si besoin (ordre relatif conservé). Retourne (df_tri, offsets)."""
+    if not df[cluster_col].is_monotonic_increasing:
+        df = df.sort_values(cluster_col, kind='stable')
+    return df, offsets_clusters(df, cluster_col)
+
+
+def offsets_clusters(df_tri, cluster_col=CLUSTER_COL):
+    """{cluster_id: (début, fin)} en positions, en une passe sur la colonne triée."""
+    ids = df_tri[cluster_col].to_numpy()
+    uniques, debuts = np.unique(ids, return_index=True)
+    fins = np.append(debuts[1:], len(ids))
+    return {c: (int(d), int(f)) for c, d, f in zip(uniques.tolist(), debuts, fins)}
+
+
+def tranche_cluster(df_tri, cluster_id, cluster_col=CLUSTER_COL):
+    """Lignes d'un cluster d'un df trié : O(log n) + tranche, sans masque booléen."""
+    ids   = df_tri[cluster_col].to_numpy()
+    debut = np.searchsorted(ids, cluster_id, side='left')
+    fin   = np.searchsorted(ids, cluster_id, side='right')
+    return df_tri.iloc[debut:fin]
@@ -0,0 +1,202 @@
+import importlib
+import os
+import pickle
+import sys
+
+import numpy as np
+from sklearn.preprocessing import StandardScaler
+from sklearn.decomposition import PCA
+
+# ============================================
+# CONFIGURATION DU CLUSTERING
+# ============================================
+FEATURES_CLUSTERING = [
+    "LIMIT_BAL",
+    "AGE",
+    "PAY_0", "PAY_2", "PAY_3", "PAY_4", "PAY_5", "PAY_6",
+    "BILL_AMT1", "BILL_AMT2", "BILL_AMT3",
+    "PAY_AMT1", "PAY_AMT2", "PAY_AMT3",
+]
+
+BASE_DIR       = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TRANSFORM_PATH = os.path.join(BASE_DIR, 'results', 'clustering_transform.pkl')
+# Appartenances souples, dans l'ordre des lignes de cleaned_data_with_clusters.csv
+MEMBERSHIP_PATH = os.path.join(BASE_DIR, 'data', 'cluster_membership.csv')
+
+CHUNKSIZE = 50000   # lignes par bloc pour les calculs de distances aux centroïdes
+
+# Client frontalier : appartenance max sous ce seuil → mélange des modèles de cluster
+SEUIL_FRONTALIER = 0.8
+P_MIN_MELANGE    = 0.05   # clusters ignorés dans le mélange sous cette appartenance
+
+PARAMS_HDBSCAN = {
+    'min_cluster_size':          300,
+    'min_samples':               15,
+    'metric':                    'euclidean',
+    'cluster_selection_method':  'eom',
+    'cluster_selection_epsilon': 0.2,
+}
+
+# ============================================
+# IMPORT DE LA LIBRAIRIE HDBSCAN
+# ============================================
+def charger_hdbscan():
+    """
+    Importe la librairie hdbscan. Le script hdbscan.py du projet porte le
+    même nom : on retire son dossier du sys.path le temps de l'import.
+    """
+    module = sys.modules.get('hdbscan')
+    if module is not None and hasattr(module, 'HDBSCAN'):
+        return module
+
+    projet = os.path.dirname(os.path.abspath(__file__))
+    chemins = sys.path[:]
+    sys.path[:] = [p for p in sys.path if os.path.abspath(p or os.getcwd()) != projet]
+    sys.modules.pop('hdbscan', None)
+    try:
+        return importlib.import_module('hdbscan')
+    finally:
+        sys.path[:] = chemins
+
+# ============================================
+# ÉTAPES DU PIPELINE
+# ============================================
+def projeter_pca(X, n_components=3):
+    """Standardisation puis réduction PCA. Retourne (scaler, pca, X_pca)."""
+    scaler   = StandardScaler()
+    X_scaled = scaler.fit_transform(X)
+    pca      = PCA(n_components=n_components, random_state=42)
+    X_pca    = pca.fit_transform(X_scaled)
+    return scaler, pca, X_pca
+
+
+def sauvegarder_transformation(scaler, pca, appartenance=None, path=TRANSFORM_PATH):
+    """
+    Conserve le scaler et la PCA ajustés par hdbscan.py (réutilisés sans réajustement),
+    et le modèle d'appartenance souple s'il est fourni.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        pickle.dump({'features': FEATURES_CLUSTERING, 'scaler': scaler, 'pca': pca,
+                     'params_hdbscan': PARAMS_HDBSCAN, 'appartenance': appartenance}, f)
+    return path
+
+
+def charger_transformation(path=TRANSFORM_PATH):
+    """(scaler, pca) enregistrés par hdbscan.py, ou None s'ils n'existent pas."""
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        transformation = pickle.load(f)
+    if transformation['features'] != FEATURES_CLUSTERING:
+        raise ValueError(f"Transformation incompatible avec FEATURES_CLUSTERING : {path}")
+    return transformation['scaler'], transformation['pca']
+
+
+def charger_appartenance(path=TRANSFORM_PATH):
+    """Modèle d'appartenance souple enregistré par hdbscan.py, ou None."""
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        return pickle.load(f).get('appartenance')
+
+
+def clusteriser(X_pca, **params):
+    """Lance HDBSCAN avec PARAMS_HDBSCAN (surchargeables). Retourne les labels (-1 = outlier)."""
+    hdbscan = charger_hdbscan()
+    clusterer = hdbscan.HDBSCAN(**{**PARAMS_HDBSCAN, **params})
+    return clusterer.fit_predict(X_pca)
+
+
+def centroides(X_pca, labels):
+    """(ids, centres, effectifs) des clusters hors outliers, en une passe (bincount par axe)."""
+    coeur = labels != -1
+    ids, codes = np.unique(labels[coeur], return_inverse=True)
+    effectifs  = np.bincount(codes, minlength=len(ids))
+    centres    = np.column_stack([np.bincount(codes, weights=X_pca[coeur, j], minlength=len(ids))
+                                  for j in range(X_pca.shape[1])]) / effectifs[:, None]
+    return ids, centres, effectifs
+
+
+def distances_carre(X, centres):
+    """||x - c||² pour chaque ligne et chaque centre : ||x||² - 2 x·c + ||c||²."""
+    d2 = ((X ** 2).sum(axis=1)[:, None]
+          - 2 * X @ centres.T
+          + (centres ** 2).sum(axis=1)[None, :])
+    return np.maximum(d2, 0)
+
+
+def reassigner_outliers(X_pca, cluster_labels, chunksize=CHUNKSIZE):
+    """Réassigne chaque outlier (-1) au centroïde de cluster le plus proche (par blocs)."""
+    cluster_labels = cluster_labels.copy()
+    outliers = np.flatnonzero(cluster_labels == -1)
+    if outliers.size == 0 or outliers.size == len(cluster_labels):
+        return cluster_labels
+    ids, centres, _ = centroides(X_pca, cluster_labels)
+    for debut in range(0, len(outliers), chunksize):
+        bloc = outliers[debut:debut + chunksize]
+        cluster_labels[bloc] = ids[distances_carre(X_pca[bloc], centres).argmin(axis=1)]
+    return cluster_labels
+
+# ============================================
+# APPARTENANCE SOUPLE
+# ============================================
+def modele_appartenance(X_pca, labels, scaler=None, pca=None):
+    """
+    Gaussienne isotrope par cluster (centre et variance des membres HDBSCAN, hors
+    outliers), a priori = part des membres. Avec scaler et pca, la projection depuis
+    les colonnes brutes FEATURES_CLUSTERING est conservée sous forme affine (W, b).
+    """
+    ids, centres, effectifs = centroides(X_pca, labels)
+    coeur = labels != -1
+    codes = np.searchsorted(ids, labels[coeur])
+    d2    = ((X_pca[coeur] - centres[codes]) ** 2).sum(axis=1)
+    modele = {
+        'cluster_ids': ids,
+        'centres':     centres,
+        'variances':   np.bincount(codes, weights=d2, minlength=len(ids))
+                       / (effectifs * X_pca.shape[1]),
+        'log_priors':  np.log(effectifs / effectifs.sum()),
+    }
+    if scaler is not None and pca is not None:
+        # z = ((x - μ) / s - m) · Cᵀ = x · (C / s)ᵀ - (μ / s + m) · Cᵀ   (PCA sans whitening)
+        modele['W'] = (pca.components_ / scaler.scale_[None, :]).T
+        modele['b'] = -(scaler.mean_ / scaler.scale_ + pca.mean_) @ pca.components_.T
+    return modele
+
+
+def appartenances(X_pca, modele, chunksize=CHUNKSIZE):
+    """Probabilités a posteriori (n, K) d'appartenance à chaque cluster, calculées par blocs."""
+    sortie = np.empty((len(X_pca), len(modele['cluster_ids'])))
+    const  = modele['log_priors'] - 0.5 * X_pca.shape[1] * np.log(modele['variances'])
+    for debut in range(0, len(X_pca), chunksize):
+        bloc  = X_pca[debut:debut + chunksize]
+        log_p = const[None, :] - 0.5 * distances_carre(bloc, modele['centres']) \
+            / modele['variances'][None, :]
+        log_p -= log_p.max(axis=1, keepdims=True)
+        p = np.exp(log_p)
+        sortie[debut:debut + chunksize] = p / p.sum(axis=1, keepdims=True)
+    return sortie
+
+
+def appartenances_brutes(X_brut, modele):
+    """Idem à partir des colonnes brutes FEATURES_CLUSTERING (projection affine scaler + PCA)."""
+    return appartenances(np.asarray(X_brut, dtype=np.float64) @ modele['W'] + modele['b'], modele)
+
+
+def poids_melange(membership, seuil=SEUIL_FRONTALIER, p_min=P_MIN_MELANGE):
+    """
+    Poids (n, K) des modèles de cluster pour chaque ligne : tout sur l'argmax si
+    l'appartenance max atteint `seuil`, sinon les clusters d'appartenance ≥ p_min
+    (argmax toujours inclus), poids renormalisés. Partagé par l'API et le scoring
+    par lot pour que les deux mélangent à l'identique.
+    """
+    membership = np.asarray(membership, dtype=np.float64)
+    lignes = np.arange(len(membership))
+    arg    = membership.argmax(axis=1)
+    poids  = np.where(membership >= p_min, membership, 0.0)
+    poids[lignes, arg] = np.maximum(membership[lignes, arg], 1e-12)
+    net = membership[lignes, arg] >= seuil
+    poids[net] = 0.0
+    poids[lignes[net], arg[net]] = 1.0
+    return poids / poids.sum(axis=1, keepdims=True)
@@ -0,0 +1,248 @@
+"""
+Balayage des hyperparamètres HDBSCAN (mêmes features, même PCA que hdbscan.py).
+
+    python clustering_sweep.py
+    python clustering_sweep.py --min-samples 5 15 30 --min-cluster-size 100 300 1000 \\
+                               --epsilon 0 0.2 0.5 --workers 8
+
+La standardisation et la PCA sont faites une seule fois. Pour chaque
+min_samples, seul l'arbre single-linkage de la distance de mutual
+reachability (MST Borůvka sur kd-tree, comme HDBSCAN.fit) est construit, sans
+condensation ni sélection ; chaque min_cluster_size ne fait ensuite que
+condenser cet arbre, et chaque epsilon qu'en extraire les clusters, avec
+toutes les autres options de PARAMS_HDBSCAN. Les deux étapes sont réparties
+sur un pool de processus. La ligne `current` est recoupée avec
+clustering.clusteriser (labels identiques exigés).
+
+Score de chaque réglage :
+  - validity            : indice DBCV (hdbscan.validity) sur un sous-échantillon
+                          des points non outliers (coût quadratique)
+  - outlier_share       : part des points -1 avant réassignation
+  - default_rate_spread : écart max − min des taux de défaut par cluster après
+                          réassignation des outliers, comme dans hdbscan.py
+                          (les segments réellement utilisés par train_model0.py)
+
+hdbscan.py s'exécute dès son import : le balayage a son propre point d'entrée
+pour que les workers du pool ne relancent pas le script.
+"""
+import argparse
+import importlib
+import itertools
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from clustering import (FEATURES_CLUSTERING, PARAMS_HDBSCAN, charger_hdbscan,
+                        clusteriser, projeter_pca, reassigner_outliers)
+from schema import lire_csv
+
+BASE_DIR   = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_PATH  = os.path.join(BASE_DIR, 'data', 'cleaned_data.csv')
+SWEEP_PATH = os.path.join(BASE_DIR, 'results', 'hdbscan_sweep.csv')
+
+GRILLE = {
+    'min_samples':               [5, 10, 15, 30],
+    'min_cluster_size':          [100, 200, 300, 500, 1000],
+    'cluster_selection_epsilon': [0.0, 0.1, 0.2, 0.5],
+}
+VALIDITY_SAMPLE = 3000
+SEED            = 42
+
+# Options de PARAMS_HDBSCAN transmises telles quelles à l'extraction (get_clusters)
+OPTIONS_EXTRACTION = ['cluster_selection_method', 'allow_single_cluster',
+                      'match_reference_implementation', 'max_cluster_size',
+                      'cluster_selection_epsilon_max']
+
+# ============================================
+# 1. ÉTAPES (WORKERS)
+# ============================================
+# Projection PCA et cible, copiées une fois par worker (initializer du pool)
+_donnees = {}
+
+
+def _init_worker(X_pca, y):
+    _donnees.update(X_pca=X_pca, y=y)
+
+
+def _arbre(min_samples):
+    """
+    Arbre single-linkage de mutual reachability : la partie coûteuse, une fois par
+    min_samples. Même routine et mêmes options que HDBSCAN.fit (données euclidiennes
+    de faible dimension → Borůvka kd-tree), sans condensation ni sélection.
+    """
+    charger_hdbscan()
+    module = importlib.import_module('hdbscan.hdbscan_')
+    t0 = time.perf_counter()
+    arbre, _ = module._hdbscan_boruvka_kdtree(
+        _donnees['X_pca'], min_samples=min_samples,
+        alpha=PARAMS_HDBSCAN.get('alpha', 1.0),
+        metric=PARAMS_HDBSCAN.get('metric', 'euclidean'),
+        p=PARAMS_HDBSCAN.get('p'),
+        leaf_size=PARAMS_HDBSCAN.get('leaf_size', 40),
+        approx_min_span_tree=PARAMS_HDBSCAN.get('approx_min_span_tree', True),
+        gen_min_span_tree=False, core_dist_n_jobs=1)
+    return min_samples, arbre, time.perf_counter() - t0
+
+
+def _fonctions_arbre():
+    charger_hdbscan()
+    return importlib.import_module('hdbscan._hdbscan_tree')
+
+
+def extraire(condense, stabilite, epsilon):
+    """Labels pour un epsilon, avec les autres options d'extraction de PARAMS_HDBSCAN."""
+    options = {k: PARAMS_HDBSCAN[k] for k in OPTIONS_EXTRACTION if k in PARAMS_HDBSCAN}
+    labels, _, _ = _fonctions_arbre().get_clusters(
+        condense, stabilite, cluster_selection_epsilon=epsilon, **options)
+    return labels
+
+
+def labels_reglage(arbre, min_cluster_size, epsilon):
+    fonctions = _fonctions_arbre()
+    condense  = fonctions.condense_tree(arbre, min_cluster_size)
+    return extraire(condense, fonctions.compute_stability(condense), epsilon)
+
+
+def scorer(labels, X_pca, y, seed=SEED):
+    outliers   = labels == -1
+    n_clusters = len(set(labels.tolist()) - {-1})
+    ligne = {'n_clusters': n_clusters, 'outlier_share': round(float(outliers.mean()), 4),
+             'validity': None, 'default_rate_spread': None, 'default_rate_std': None,
+             'smallest_cluster_share': None}
+    if n_clusters < 2:
+        return ligne
+
+    # DBCV sur un sous-échantillon des points rattachés à un cluster
+    rng = np.random.default_rng(seed)
+    idx = np.flatnonzero(~outliers)
+    idx = rng.choice(idx, min(VALIDITY_SAMPLE, len(idx)), replace=False)
+    try:
+        validity = charger_hdbscan().validity_index(X_pca[idx], labels[idx])
+        ligne['validity'] = round(float(validity), 4)
+    except (ValueError, ZeroDivisionError, IndexError):
+        pass
+
+    # Segments finaux : outliers réassignés au centroïde le plus proche
+    finaux      = reassigner_outliers(X_pca, labels)
+    _, inverse  = np.unique(finaux, return_inverse=True)
+    effectifs   = np.bincount(inverse)
+    taux        = np.bincount(inverse, weights=y) / effectifs
+    parts       = effectifs / len(y)
+    ligne['default_rate_spread']    = round(float(taux.max() - taux.min()), 4)
+    ligne['default_rate_std']       = round(float(np.sqrt(np.dot(parts, (taux - y.mean()) ** 2))), 4)
+    ligne['smallest_cluster_share'] = round(float(parts.min()), 4)
+    return ligne
+
+
+def _evaluer(args):
+    """Un min_cluster_size : condensation une fois, puis une extraction par epsilon."""
+    min_samples, arbre, min_cluster_size, epsilons = args
+    fonctions = _fonctions_arbre()
+    t0 = time.perf_counter()
+    condense  = fonctions.condense_tree(arbre, min_cluster_size)
+    stabilite = fonctions.compute_stability(condense)
+    t_condense = time.perf_counter() - t0
+
+    lignes = []
+    for epsilon in epsilons:
+        t0 = time.perf_counter()
+        labels = extraire(condense, stabilite, epsilon)
+        t_extraction = t_condense + time.perf_counter() - t0
+        lignes.append({'min_samples': min_samples, 'min_cluster_size': min_cluster_size,
+                       'cluster_selection_epsilon': epsilon,
+                       **scorer(labels, _donnees['X_pca'], _donnees['y']),
+                       'extract_s': round(t_extraction, 3)})
+    return lignes
+
+# ============================================
+# 2. BALAYAGE
+# ============================================
+def balayer(X_pca, y, grille=None, workers=None):
+    """
+    Table des réglages. table.attrs['current_matches'] : labels du réglage courant
+    identiques à clusteriser (None si ce réglage n'est pas dans la grille).
+    """
+    grille  = {**GRILLE, **(grille or {})}
+    workers = workers or os.cpu_count()
+    y       = np.asarray(y, dtype=np.float64)
+    courant_dans_grille = (PARAMS_HDBSCAN['min_samples'] in grille['min_samples']
+                           and PARAMS_HDBSCAN['min_cluster_size'] in grille['min_cluster_size']
+                           and np.isclose(grille['cluster_selection_epsilon'],
+                                          PARAMS_HDBSCAN['cluster_selection_epsilon']).any())
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(X_pca, y)) as pool:
+        # Référence : HDBSCAN.fit complet, en parallèle des arbres
+        reference = pool.submit(clusteriser, X_pca) if courant_dans_grille else None
+        arbres = list(pool.map(_arbre, grille['min_samples']))
+        for min_samples, _, duree in arbres:
+            print(f"  🌳 min_samples={min_samples:<4} arbre MST en {duree:.1f} s")
+
+        taches = [(ms, arbre, mcs, grille['cluster_selection_epsilon'])
+                  for (ms, arbre, _), mcs in itertools.product(arbres, grille['min_cluster_size'])]
+        lignes = [l for lot in pool.map(_evaluer, taches) for l in lot]
+        labels_reference = reference.result() if reference is not None else None
+
+    table = pd.DataFrame(lignes)
+    table.attrs['current_matches'] = None
+    if labels_reference is not None:
+        arbre = next(a for ms, a, _ in arbres if ms == PARAMS_HDBSCAN['min_samples'])
+        labels = labels_reglage(arbre, PARAMS_HDBSCAN['min_cluster_size'],
+                                PARAMS_HDBSCAN['cluster_selection_epsilon'])
+        table.attrs['current_matches'] = bool(np.array_equal(labels, labels_reference))
+    table['tree_s'] = table['min_samples'].map({ms: round(d, 3) for ms, _, d in arbres})
+    table['current'] = ((table['min_samples'] == PARAMS_HDBSCAN['min_samples'])
+                        & (table['min_cluster_size'] == PARAMS_HDBSCAN['min_cluster_size'])
+                        & np.isclose(table['cluster_selection_epsilon'],
+                                     PARAMS_HDBSCAN['cluster_selection_epsilon']))
+    return table.sort_values(['validity', 'default_rate_spread'], ascending=False,
+                             na_position='last').reset_index(drop=True)
+
+# ============================================
+# 3. MAIN
+# ============================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Balayage des hyperparamètres HDBSCAN")
+    parser.add_argument('--min-samples', type=int, nargs='+', default=GRILLE['min_samples'])
+    parser.add_argument('--min-cluster-size', type=int, nargs='+',
+                        default=GRILLE['min_cluster_size'])
+    parser.add_argument('--epsilon', type=float, nargs='+',
+                        default=GRILLE['cluster_selection_epsilon'])
+    parser.add_argument('--workers', type=int, help="processus (défaut : nombre de cœurs)")
+    parser.add_argument('--output', default=SWEEP_PATH)
+    args = parser.parse_args(argv)
+
+    df = lire_csv(DATA_PATH)
+    X  = df[FEATURES_CLUSTERING].astype(np.float64)
+    _, pca, X_pca = projeter_pca(X)
+    print(f"✅ PCA : {pca.explained_variance_ratio_.sum():.2%} de variance ({len(X)} clients)")
+
+    grille = {'min_samples': args.min_samples, 'min_cluster_size': args.min_cluster_size,
+              'cluster_selection_epsilon': args.epsilon}
+    n = len(args.min_samples) * len(args.min_cluster_size) * len(args.epsilon)
+    print(f"🚀 {n} réglages, {len(args.min_samples)} arbre(s) MST")
+    t0 = time.perf_counter()
+    table = balayer(X_pca, df['DEFAULT'].to_numpy(), grille, args.workers)
+
+    print(f"\n{table.to_string(index=False)}")
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    table.to_csv(args.output, index=False)
+    print(f"\n✅ Balayage terminé en {time.perf_counter() - t0:.1f} s → {args.output}")
+
+    coherent = table.attrs['current_matches']
+    if coherent is None:
+        print("ℹ️  Réglage courant hors de la grille : pas de recoupement avec clusteriser")
+    elif coherent:
+        print("✅ Ligne current identique à clusteriser (PARAMS_HDBSCAN)")
+    else:
+        print("❌ Ligne current différente de clusteriser : le balayage ne reproduit pas hdbscan.py")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,233 @@
+"""
+Surveillance en continu de la dérive des clients scorés.
+
+À l'entraînement, construire_references() enregistre pour chaque cluster et
+chaque feature les bornes de N_BINS intervalles (déciles du jeu
+d'entraînement), les proportions de référence et quelques quantiles. En
+service, MoniteurDerive.observer() met à jour en O(1) l'histogramme du
+cluster assigné (une comparaison vectorisée par requête) et alimente un
+t-digest par feature (tampon fusionné par blocs, coût amorti constant).
+
+rapport() calcule à la demande, par cluster et par feature, le PSI et un KS
+sur les histogrammes, ainsi que les quantiles courants (t-digest) face à
+ceux de l'entraînement. Les compteurs sont propres au processus.
+"""
+import math
+import os
+import pickle
+import threading
+
+import numpy as np
+
+BASE_DIR      = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(BASE_DIR, 'results', 'drift_baseline.pkl')
+
+N_BINS        = 10
+QUANTILES     = (0.05, 0.25, 0.5, 0.75, 0.95)
+COMPRESSION   = 100     # t-digest : ~COMPRESSION centroïdes par feature
+TAILLE_TAMPON = 256     # requêtes accumulées avant fusion dans les t-digests
+EPS           = 1e-4    # lissage des proportions nulles (PSI)
+MIN_OBS       = 100     # en dessous, les indicateurs sont marqués non significatifs
+
+# Seuils usuels du PSI
+SEUILS_PSI = [(0.25, 'significative'), (0.1, 'modérée')]
+
+# ============================================
+# 1. RÉFÉRENCES D'ENTRAÎNEMENT
+# ============================================
+def bornes_feature(valeurs, n_bins=N_BINS):
+    """Bornes internes (n_bins − 1) issues des quantiles ; complétées par +inf si valeurs discrètes."""
+    qs     = np.quantile(valeurs, np.linspace(0, 1, n_bins + 1)[1:-1])
+    bornes = np.unique(qs)
+    return np.concatenate([bornes, np.full(n_bins - 1 - len(bornes), np.inf)])
+
+
+def indices_bins(X, bornes):
+    """Intervalle de chaque valeur : X (n, F), bornes (F, n_bins − 1) → (n, F)."""
+    return (bornes[None, :, :] <= X[:, :, None]).sum(axis=2)
+
+
+def construire_references(df, features, cluster_col='Cluster', n_bins=N_BINS):
+    references = {'features': list(features), 'n_bins': n_bins, 'clusters': {}}
+    for cid, groupe in df.groupby(cluster_col, sort=True):
+        X      = groupe[features].to_numpy(dtype=np.float64)
+        bornes = np.vstack([bornes_feature(X[:, j], n_bins) for j in range(X.shape[1])])
+        idx    = indices_bins(X, bornes)
+        comptes = np.stack([np.bincount(idx[:, j], minlength=n_bins) for j in range(X.shape[1])])
+        references['clusters'][int(cid)] = {
+            'n':           len(X),
+            'bornes':      bornes,
+            'proportions': comptes / len(X),
+            'quantiles':   np.quantile(X, QUANTILES, axis=0).T,   # (F, len(QUANTILES))
+        }
+    return references
+
+
+def sauvegarder_references(references, path=BASELINE_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        pickle.dump(references, f, protocol=pickle.HIGHEST_PROTOCOL)
+    return path
+
+# ============================================
+# 2. T-DIGEST (FUSION PAR BLOCS)
+# ============================================
+class TDigest:
+    """t-digest « merging » (fonction d'échelle k1) d'une variable."""
+
+    def __init__(self, compression=COMPRESSION):
+        self.compression = compression
+        self.moyennes = np.empty(0)
+        self.poids    = np.empty(0)
+        self.min, self.max = math.inf, -math.inf
+
+    @property
+    def n(self):
+        return float(self.poids.sum())
+
+    def _k(self, q):
+        return self.compression / (2 * math.pi) * math.asin(2 * min(max(q, 0.0), 1.0) - 1)
+
+    def fusionner(self, valeurs):
+        valeurs = np.asarray(valeurs, dtype=np.float64)
+        if valeurs.size == 0:
+            return
+        self.min = min(self.min, float(valeurs.min()))
+        self.max = max(self.max, float(valeurs.max()))
+        m = np.concatenate([self.moyennes, valeurs])
+        w = np.concatenate([self.poids, np.ones(len(valeurs))])
+        ordre = np.argsort(m, kind='mergesort')
+        m, w  = m[ordre], w[ordre]
+
+        total, cumul = w.sum(), 0.0
+        k_gauche = self._k(0.0)
+        moyennes, poids = [], []
+        cm, cw = m[0], w[0]
+        for mi, wi in zip(m[1:], w[1:]):
+            if self._k((cumul + cw + wi) / total) - k_gauche <= 1:
+                cm  = (cm * cw + mi * wi) / (cw + wi)
+                cw += wi
+            else:
+                moyennes.append(cm)
+                poids.append(cw)
+                cumul   += cw
+                k_gauche = self._k(cumul / total)
+                cm, cw   = mi, wi
+        moyennes.append(cm)
+        poids.append(cw)
+        self.moyennes, self.poids = np.array(moyennes), np.array(poids)
+
+    def quantile(self, q):
+        if self.poids.size == 0:
+            return None
+        centres = np.cumsum(self.poids) - self.poids / 2
+        x = np.concatenate([[0.0], centres, [self.n]])
+        y = np.concatenate([[self.min], self.moyennes, [self.max]])
+        return float(np.interp(q * self.n, x, y))
+
+# ============================================
+# 3. MONITEUR EN LIGNE
+# ============================================
+def psi(p_live, p_ref):
+    """PSI par ligne : Σ (p − q) · ln(p / q), proportions lissées par EPS."""
+    p = np.clip(p_live, EPS, None)
+    q = np.clip(p_ref, EPS, None)
+    return ((p - q) * np.log(p / q)).sum(axis=-1)
+
+
+def niveau_derive(valeur):
+    for seuil, niveau in SEUILS_PSI:
+        if valeur >= seuil:
+            return niveau
+    return 'stable'
+
+
+class MoniteurDerive:
+    """Histogrammes et t-digests par cluster et par feature, mis à jour à chaque requête."""
+
+    def __init__(self, references, features=None):
+        self.references = references
+        self.features   = references['features']
+        # Position des features de référence dans le vecteur reçu par observer()
+        self.ordre = (np.array([features.index(f) for f in self.features])
+                      if features is not None and list(features) != self.features else None)
+        n_feat, n_bins = len(self.features), references['n_bins']
+        self.comptes  = {cid: np.zeros((n_feat, n_bins), dtype=np.int64)
+                         for cid in references['clusters']}
+        self.digests  = {cid: [TDigest() for _ in range(n_feat)] for cid in references['clusters']}
+        self.tampons  = {cid: [] for cid in references['clusters']}
+        self._lignes  = np.arange(n_feat)
+        self._verrou  = threading.Lock()
+
+    @classmethod
+    def charger(cls, features=None, path=BASELINE_PATH):
+        """Moniteur sur les références d'entraînement, ou None si elles n'existent pas."""
+        if not os.path.exists(path):
+            return None
+        with open(path, 'rb') as f:
+            return cls(pickle.load(f), features)
+
+    def observer(self, cluster_id, x, enregistrer=True):
+        """
+        x : vecteur de features d'un client (ordre des features du service).
+        enregistrer=False calcule les bins sans rien compter (warm-up).
+        """
+        cid = int(cluster_id)
+        ref = self.references['clusters'].get(cid)
+        if ref is None:
+            return
+        x   = np.asarray(x, dtype=np.float64)
+        x   = x[self.ordre] if self.ordre is not None else x
+        idx = (ref['bornes'] <= x[:, None]).sum(axis=1)
+        if not enregistrer:
+            return
+        with self._verrou:
+            self.comptes[cid][self._lignes, idx] += 1
+            tampon = self.tampons[cid]
+            tampon.append(x)
+            if len(tampon) >= TAILLE_TAMPON:
+                self._vider(cid)
+
+    def _vider(self, cid):
+        tampon = np.vstack(self.tampons[cid])
+        self.tampons[cid] = []
+        for j, digest in enumerate(self.digests[cid]):
+            digest.fusionner(tampon[:, j])
+
+    def rapport(self):
+        with self._verrou:
+            for cid in self.tampons:
+                if self.tampons[cid]:
+                    self._vider(cid)
+            comptes = {cid: c.copy() for cid, c in self.comptes.items()}
+
+        clusters = {}
+        for cid, ref in self.references['clusters'].items():
+            n = int(comptes[cid][0].sum())
+            if n == 0:
+                clusters[str(cid)] = {'n': 0}
+                continue
+            p_live = comptes[cid] / n
+            valeurs_psi = psi(p_live, ref['proportions'])
+            valeurs_ks  = np.abs(np.cumsum(p_live, axis=1)
+                                 - np.cumsum(ref['proportions'], axis=1)).max(axis=1)
+            par_feature = {}
+            for j, f in enumerate(self.features):
+                digest = self.digests[cid][j]
+                par_feature[f] = {
+                    'psi':   round(float(valeurs_psi[j]), 4),
+                    'ks':    round(float(valeurs_ks[j]), 4),
+                    'drift': niveau_derive(valeurs_psi[j]),
+                    'quantiles_live':  {str(q): digest.quantile(q) for q in QUANTILES},
+                    'quantiles_train': {str(q): round(float(v), 4)
+                                        for q, v in zip(QUANTILES, ref['quantiles'][j])},
+                }
+            pire = max(par_feature, key=lambda f: par_feature[f]['psi'])
+            clusters[str(cid)] = {
+                'n':           n,
+                'sufficient':  n >= MIN_OBS,
+                'max_psi':     par_feature[pire]['psi'],
+                'max_psi_feature': pire,
+                'features':    par_feature,
+            }
+        return {'n_bins': self.references['n_bins'], 'min_obs': MIN_OBS, 'clusters': clusters}
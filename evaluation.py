@@ -0,0 +1,179 @@
+"""
+Rapport d'évaluation de l'entraînement, construit à partir des probabilités
+held-out conservées par cluster (aucun re-scoring).
+
+Par cluster : AUC-ROC, PR-AUC, Brier, courbes de fiabilité et ECE avant / après
+calibration (probabilités brutes du GB, suffixe _raw, et probabilités calibrées
+hors pli), précision / rappel au seuil 0.5 et au seuil optimisé, durées
+d'entraînement. Agrégats : moyenne pondérée par la taille du jeu de test et
+métriques « poolées » sur l'ensemble des clients de test (chaque client jugé au
+seuil de son cluster).
+"""
+import numpy as np
+
+from calibrators import resume
+from thresholds import auc_pr, auc_roc, courbes
+
+N_BINS_CALIBRATION = 10
+CLES_BRUTES        = ('auc_roc_raw', 'auc_pr_raw', 'brier_raw')
+
+# ============================================
+# 1. MÉTRIQUES ÉLÉMENTAIRES
+# ============================================
+def au_seuil(y, proba, seuil):
+    """Précision, rappel et taux d'alerte de la règle « défaut si proba >= seuil »."""
+    pred = proba >= seuil
+    tp   = int(np.sum(pred & (y == 1)))
+    n_pred, n_pos = int(pred.sum()), int(np.sum(y == 1))
+    return {
+        'threshold':  round(float(seuil), 6),
+        'precision':  round(tp / n_pred, 4) if n_pred else None,
+        'recall':     round(tp / n_pos, 4) if n_pos else None,
+        'alert_rate': round(n_pred / len(y), 4) if len(y) else None,
+    }
+
+
+def calibration(y, proba, n_bins=N_BINS_CALIBRATION):
+    """Courbe de fiabilité sur n_bins intervalles réguliers de [0, 1] et ECE."""
+    idx      = np.minimum((proba * n_bins).astype(int), n_bins - 1)
+    effectifs = np.bincount(idx, minlength=n_bins)
+    somme_p  = np.bincount(idx, weights=proba, minlength=n_bins)
+    somme_y  = np.bincount(idx, weights=y, minlength=n_bins)
+    non_vide = effectifs > 0
+    moy_p = np.divide(somme_p, effectifs, out=np.zeros(n_bins), where=non_vide)
+    moy_y = np.divide(somme_y, effectifs, out=np.zeros(n_bins), where=non_vide)
+    ece   = float(np.sum(effectifs * np.abs(moy_y - moy_p)) / max(len(y), 1))
+    return {
+        'ece': round(ece, 4),
+        'bins': [{'lower': i / n_bins, 'upper': (i + 1) / n_bins, 'count': int(effectifs[i]),
+                  'mean_predicted': round(float(moy_p[i]), 4),
+                  'observed_rate': round(float(moy_y[i]), 4)}
+                 for i in range(n_bins) if non_vide[i]],
+    }
+
+
+def metriques_modele(y, proba):
+    c = courbes(y, proba)
+    return {
+        'auc_roc': round(auc_roc(c), 4),
+        'auc_pr':  round(auc_pr(c), 4),
+        'brier':   round(float(np.mean((proba - y) ** 2)), 4),
+    }
+
+
+def metriques_brutes(y, brut):
+    """
+    Métriques des sorties brutes du GB, avant calibration (suffixe _raw) : les
+    comparer à auc_roc / auc_pr montre que la calibration conserve le classement.
+    """
+    return {f'{cle}_raw': v for cle, v in metriques_modele(y, brut).items()}
+
+# ============================================
+# 2. RAPPORT PAR CLUSTER ET AGRÉGATS
+# ============================================
+def evaluer_cluster(holdout, decision, timings=None):
+    """
+    holdout = {'y', 'proba_gb', 'proba_nb'} (tableaux du jeu de test du cluster), plus
+    'proba_gb_raw' si proba_gb est calibrée. proba_gb est calibrée hors pli
+    (calibrators.calibrer_hors_pli) : aucune ligne n'a servi à ajuster son calibrateur.
+    """
+    y  = np.asarray(holdout['y']).astype(np.int64)
+    gb = np.asarray(holdout['proba_gb'], dtype=np.float64)
+    nb = np.asarray(holdout['proba_nb'], dtype=np.float64)
+    rapport_gb = {
+        **metriques_modele(y, gb),
+        'at_0.5':       au_seuil(y, gb, 0.5),
+        'at_threshold': au_seuil(y, gb, decision['threshold']),
+        'calibration':  calibration(y, gb),
+    }
+    if 'proba_gb_raw' in holdout:
+        brut = np.asarray(holdout['proba_gb_raw'], dtype=np.float64)
+        rapport_gb.update(metriques_brutes(y, brut))
+        rapport_gb['calibration_raw'] = calibration(y, brut)
+    return {
+        'n_test':        int(len(y)),
+        'default_rate':  round(float(y.mean()), 4),
+        'gradient_boosting': rapport_gb,
+        'naive_bayes': {
+            **metriques_modele(y, nb),
+            'at_threshold': au_seuil(y, nb, decision['threshold']),
+        },
+        'decision': decision,
+        'timings':  timings or {},
+    }
+
+
+def agreger(rapports, holdouts, decisions):
+    """Moyennes pondérées par n_test et métriques poolées sur tous les clients de test."""
+    poids = np.array([r['n_test'] for r in rapports.values()], dtype=float)
+    poids /= poids.sum()
+
+    def moyenne(modele, cle):
+        vals = [r[modele][cle] for r in rapports.values()]
+        return round(float(np.dot(poids, vals)), 4)
+
+    y  = np.concatenate([np.asarray(holdouts[c]['y']).astype(np.int64) for c in rapports])
+    gb = np.concatenate([np.asarray(holdouts[c]['proba_gb'], dtype=np.float64) for c in rapports])
+    nb = np.concatenate([np.asarray(holdouts[c]['proba_nb'], dtype=np.float64) for c in rapports])
+    seuils = np.concatenate([np.full(len(holdouts[c]['y']), decisions[c]['threshold'])
+                             for c in rapports])
+
+    # Au seuil de chaque cluster : proba - seuil >= 0
+    pooled_seuil = au_seuil(y, gb - seuils, 0.0)
+    pooled_seuil['threshold'] = 'per_cluster'
+
+    pooled_gb = {**metriques_modele(y, gb), 'at_threshold': pooled_seuil,
+                 'calibration': calibration(y, gb)}
+    if all('proba_gb_raw' in holdouts[c] for c in rapports):
+        brut = np.concatenate([np.asarray(holdouts[c]['proba_gb_raw'], dtype=np.float64)
+                               for c in rapports])
+        pooled_gb.update(metriques_brutes(y, brut))
+        pooled_gb['calibration_raw'] = calibration(y, brut)
+
+    durees = {}
+    for r in rapports.values():
+        for cle, v in r['timings'].items():
+            durees[cle] = round(durees.get(cle, 0.0) + v, 3)
+
+    weighted = {m: {cle: moyenne(m, cle) for cle in ('auc_roc', 'auc_pr', 'brier')}
+                for m in ('gradient_boosting', 'naive_bayes')}
+    if all('auc_roc_raw' in r['gradient_boosting'] for r in rapports.values()):
+        weighted['gradient_boosting'].update(
+            {cle: moyenne('gradient_boosting', cle) for cle in CLES_BRUTES})
+
+    return {
+        'n_test':   int(len(y)),
+        'clusters': len(rapports),
+        'weighted': weighted,
+        'pooled': {
+            'gradient_boosting': pooled_gb,
+            'naive_bayes':       metriques_modele(y, nb),
+        },
+        'timings_total': durees,
+    }
+
+
+def rapport_evaluation(models):
+    """models = {cluster_id: résultat d'entraînement avec 'holdout', 'decision', 'timings'}."""
+    rapports = {cid: {**evaluer_cluster(v['holdout'], v['decision'], v.get('timings')),
+                      'calibrator': resume(v.get('calibrator'))}
+                for cid, v in models.items()}
+    holdouts  = {cid: v['holdout'] for cid, v in models.items()}
+    decisions = {cid: v['decision'] for cid, v in models.items()}
+    return {
+        'clusters':  {str(cid): r for cid, r in rapports.items()},
+        'aggregate': agreger(rapports, holdouts, decisions),
+    }
+
+
+def resume_holdout(rapport):
+    """AUC, Brier et ECE du GB d'un cluster, bruts et calibrés (manifeste)."""
+    gb = rapport['gradient_boosting']
+    return {
+        'auc_roc_raw':        gb.get('auc_roc_raw', gb['auc_roc']),
+        'auc_roc_calibrated': gb['auc_roc'],
+        'brier_raw':          gb.get('brier_raw', gb['brier']),
+        'brier_calibrated':   gb['brier'],
+        'ece_raw':            gb.get('calibration_raw', gb['calibration'])['ece'],
+        'ece_calibrated':     gb['calibration']['ece'],
+    }
@@ -0,0 +1,157 @@
+"""
+Magasin de features en mémoire partagée pour les pipelines multi-processus.
+
+Le dataset nettoyé est chargé une seule fois dans un bloc float32 contigu,
+trié par cluster, avec un index annexe {cluster: (début, fin)}. Les workers
+s'y attachent par nom : les lignes d'un cluster sont une tranche du bloc,
+lue sans copie ni pickling du DataFrame. L'index d'origine des lignes vit
+dans un second segment partagé : le descripteur reste de taille constante.
+X_df() rend les colonnes dans leurs dtypes d'origine (int8 du schéma...),
+pour que l'entraînement ne dépende pas du passage par le magasin.
+
+    with FeatureStore.creer(df, features, 'DEFAULT', 'Cluster') as store:
+        pool.map(travail, [(store.descripteur, cid) for cid in store.clusters])
+
+    def travail(args):
+        descripteur, cid = args
+        store = FeatureStore.attacher(descripteur)
+        X, y  = store.X_df(cid), store.y_serie(cid)   # dtypes d'origine
+"""
+import json
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+import pandas as pd
+
+from cluster_index import trier_par_cluster
+from schema import appliquer_schema
+
+DTYPE       = np.float32
+INDEX_DTYPE = np.int64
+
+
+def _attacher_shm(nom):
+    """Attache un segment existant sans le confier au resource_tracker du worker."""
+    try:
+        return shared_memory.SharedMemory(name=nom, track=False)
+    except TypeError:
+        # Python < 3.13 : le tracker supprimerait le segment à la sortie du worker
+        shm = shared_memory.SharedMemory(name=nom)
+        resource_tracker.unregister(shm._name, 'shared_memory')
+        return shm
+
+
+class FeatureStore:
+    """Bloc [features..., cible] float32 trié par cluster, partagé entre processus."""
+
+    def __init__(self, shm, shm_index, descripteur, proprietaire):
+        self.shm          = shm
+        self.shm_index    = shm_index
+        self.descripteur  = descripteur
+        self.proprietaire = proprietaire
+        self.columns      = descripteur['columns']
+        self.n_features   = descripteur['n_features']
+        self.dtypes       = dict(zip(self.columns, descripteur['dtypes']))
+        self.offsets      = {int(c): tuple(o) for c, o in descripteur['offsets'].items()}
+        self.data         = np.ndarray(tuple(descripteur['shape']), dtype=descripteur['dtype'],
+                                       buffer=shm.buf)
+        self.index        = np.ndarray((descripteur['shape'][0],), dtype=INDEX_DTYPE,
+                                       buffer=shm_index.buf)
+
+    # ----------------------------------------
+    # Création / attachement
+    # ----------------------------------------
+    @classmethod
+    def creer(cls, df, features, target, cluster_col, name=None):
+        """Copie df (une seule fois) dans un segment partagé, trié par cluster."""
+        df_tri, index = trier_par_cluster(df, cluster_col)
+        colonnes = list(features) + [target]
+        bloc     = df_tri[colonnes].to_numpy(dtype=DTYPE)
+        offsets  = {str(int(c)): [d, f] for c, (d, f) in index.items()}
+        # Le retour aux dtypes d'origine doit être exact (int8, montants float32...)
+        for j, col in enumerate(colonnes):
+            origine = df_tri[col].to_numpy()
+            if origine.dtype != DTYPE and not np.array_equal(
+                    bloc[:, j].astype(origine.dtype), origine, equal_nan=origine.dtype.kind == 'f'):
+                raise ValueError(f"{col} ({origine.dtype}) non représentable exactement en "
+                                 f"{np.dtype(DTYPE).name}")
+        lignes = df_tri.index.to_numpy().astype(INDEX_DTYPE)
+
+        shm = shared_memory.SharedMemory(create=True, size=max(bloc.nbytes, 1), name=name)
+        np.ndarray(bloc.shape, dtype=DTYPE, buffer=shm.buf)[:] = bloc
+        shm_index = shared_memory.SharedMemory(create=True, size=max(lignes.nbytes, 1))
+        np.ndarray(lignes.shape, dtype=INDEX_DTYPE, buffer=shm_index.buf)[:] = lignes
+        descripteur = {
+            'name':       shm.name,
+            # Index d'origine des lignes, dans l'ordre du bloc (segment annexe)
+            'index_name': shm_index.name,
+            'shape':      list(bloc.shape),
+            'dtype':      np.dtype(DTYPE).str,
+            'columns':    colonnes,
+            'dtypes':     [df_tri[c].dtype.str for c in colonnes],
+            'n_features': len(features),
+            'offsets':    offsets,
+        }
+        return cls(shm, shm_index, descripteur, proprietaire=True)
+
+    @classmethod
+    def attacher(cls, descripteur):
+        """Attache un magasin existant (descripteur dict ou chemin du JSON annexe)."""
+        if isinstance(descripteur, str):
+            with open(descripteur) as f:
+                descripteur = json.load(f)
+        return cls(_attacher_shm(descripteur['name']), _attacher_shm(descripteur['index_name']),
+                   descripteur, proprietaire=False)
+
+    def sauvegarder_index(self, path):
+        """Écrit le descripteur en JSON pour que d'autres processus s'attachent par nom."""
+        with open(path, 'w') as f:
+            json.dump(self.descripteur, f)
+
+    # ----------------------------------------
+    # Accès par cluster (vues, sans copie)
+    # ----------------------------------------
+    @property
+    def clusters(self):
+        return sorted(self.offsets)
+
+    def X(self, cluster_id):
+        debut, fin = self.offsets[int(cluster_id)]
+        return self.data[debut:fin, :self.n_features]
+
+    def y(self, cluster_id):
+        debut, fin = self.offsets[int(cluster_id)]
+        return self.data[debut:fin, self.n_features]
+
+    def X_df(self, cluster_id):
+        """Features du cluster aux dtypes et à l'index d'origine (colonnes non float32 copiées)."""
+        X = pd.DataFrame(self.X(cluster_id), columns=self.columns[:self.n_features],
+                         index=self.row_index(cluster_id), copy=False)
+        return appliquer_schema(X, {c: np.dtype(t) for c, t in self.dtypes.items() if c in X})
+
+    def y_serie(self, cluster_id):
+        """Cible du cluster en Series, au dtype d'origine."""
+        cible = self.columns[self.n_features]
+        return pd.Series(self.y(cluster_id).astype(self.dtypes[cible]),
+                         index=self.row_index(cluster_id), name=cible)
+
+    def row_index(self, cluster_id):
+        debut, fin = self.offsets[int(cluster_id)]
+        # Copie : l'index survit à fermer() (modèles et hold-out renvoyés par les workers)
+        return self.index[debut:fin].copy()
+
+    # ----------------------------------------
+    # Cycle de vie
+    # ----------------------------------------
+    def fermer(self):
+        self.data = self.index = None
+        for shm in (self.shm, self.shm_index):
+            shm.close()
+            if self.proprietaire:
+                shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fermer()
@@ -0,0 +1,48 @@
+import numpy as np
+
+# ============================================
+# COLONNES SOURCES
+# ============================================
+PAY_COLS     = ['PAY_0', 'PAY_2', 'PAY_3', 'PAY_4', 'PAY_5', 'PAY_6']
+BILL_COLS    = [f'BILL_AMT{i}' for i in range(1, 7)]
+PAY_AMT_COLS = [f'PAY_AMT{i}' for i in range(1, 7)]
+
+RAW_FEATURES = (['LIMIT_BAL', 'SEX', 'EDUCATION', 'MARRIAGE', 'AGE']
+                + PAY_COLS + BILL_COLS + PAY_AMT_COLS)
+
+DERIVED_FEATURES = ['AVG_PAY_DELAY', 'AVG_BILL_AMT', 'AVG_PAY_AMT', 'PAY_RATIO', 'LIMIT_BAL_log']
+
+# ============================================
+# NETTOYAGE DES CATÉGORIES
+# ============================================
+def nettoyer_categories(df):
+    """
+    Regroupe les modalités non documentées (mêmes règles que clean_data.py) :
+    EDUCATION 0, 5, 6 → 4 (Autre) ; MARRIAGE 0 → 3 (Autre). Modifie df en place.
+    """
+    df['EDUCATION'] = df['EDUCATION'].replace({0: 4, 5: 4, 6: 4})
+    df['MARRIAGE']  = df['MARRIAGE'].replace({0: 3})
+    return df
+
+# ============================================
+# FEATURE ENGINEERING (vectorisé)
+# ============================================
+def deriver_features(df):
+    """
+    Ajoute les features dérivées (mêmes formules que clean_data.py)
+    à un DataFrame contenant les colonnes brutes. Modifie df en place.
+    """
+    # Calculs en float64 quel que soit le type des colonnes sources (schema.py)
+    # Moyenne des retards de paiement
+    df['AVG_PAY_DELAY'] = df[PAY_COLS].astype(np.float64).mean(axis=1)
+
+    # Moyenne des montants de facture / payés
+    df['AVG_BILL_AMT']  = df[BILL_COLS].astype(np.float64).mean(axis=1)
+    df['AVG_PAY_AMT']   = df[PAY_AMT_COLS].astype(np.float64).mean(axis=1)
+
+    # Ratio paiement / facture (capacité de remboursement)
+    df['PAY_RATIO']     = df['AVG_PAY_AMT'] / (df['AVG_BILL_AMT'] + 1)
+
+    # Log du crédit limite (réduire skewness)
+    df['LIMIT_BAL_log'] = np.log1p(df['LIMIT_BAL'].astype(np.float64))
+    return df
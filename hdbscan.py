@@ -1,75 +1,63 @@
 import pandas as pd
 import numpy as np
-import hdbscan
 import matplotlib.pyplot as plt
 import seaborn as sns
-from sklearn.preprocessing import StandardScaler
 from sklearn.decomposition import PCA
-from sklearn.metrics import pairwise_distances_argmin_min
 import os
+from clustering import (FEATURES_CLUSTERING, PARAMS_HDBSCAN, MEMBERSHIP_PATH, projeter_pca,
+                        clusteriser, reassigner_outliers, sauvegarder_transformation,
+                        modele_appartenance, appartenances)
+from schema import lire_csv
 
 # -----------------------------
 # 1. Charger le dataset nettoyé
 # -----------------------------
 csv_file = os.path.join(os.path.dirname(__file__), "../data/cleaned_data.csv")
-df = pd.read_csv(csv_file)
+df = lire_csv(csv_file)
 print(f"Dataset chargé : {df.shape}")
 
 # -----------------------------
 # 2. Sélection des features pour le clustering
 # -----------------------------
-features = [
-    "LIMIT_BAL",
-    "AGE",
-    "PAY_0", "PAY_2", "PAY_3", "PAY_4", "PAY_5", "PAY_6",
-    "BILL_AMT1", "BILL_AMT2", "BILL_AMT3",
-    "PAY_AMT1", "PAY_AMT2", "PAY_AMT3",
-]
+features = FEATURES_CLUSTERING
 
-X = df[features].copy()
+# float64 pour le clustering : mêmes valeurs exactes que le CSV, mêmes segments
+X = df[features].astype(np.float64)
 
 # -----------------------------
-# 3. Standardisation
+# 3. Standardisation + 4. Réduction PCA à 3 composantes
 # -----------------------------
-scaler = StandardScaler()
-X_scaled = scaler.fit_transform(X)
+scaler, pca, X_pca = projeter_pca(X)
+X_scaled = scaler.transform(X)
 print("Standardisation terminée ✅")
-
-# -----------------------------
-# 4. Réduction PCA à 3 composantes
-# -----------------------------
-pca = PCA(n_components=3, random_state=42)
-X_pca = pca.fit_transform(X_scaled)
 print(f"Variance expliquée par PCA : {pca.explained_variance_ratio_.sum():.2%} ✅")
 
 # -----------------------------
 # 5. HDBSCAN Clustering
 # -----------------------------
 print("Lancement HDBSCAN...")
-clusterer = hdbscan.HDBSCAN(
-    min_cluster_size=300,
-    min_samples=15,
-    metric='euclidean',
-    cluster_selection_method='eom',
-    cluster_selection_epsilon=0.2
-)
-cluster_labels = clusterer.fit_predict(X_pca)
+print(f"Paramètres : {PARAMS_HDBSCAN}")
+cluster_labels = clusteriser(X_pca)
 
 n_clusters_raw = len(set(cluster_labels)) - (1 if -1 in cluster_labels else 0)
 n_outliers_raw = sum(cluster_labels == -1)
 print(f"Clusters trouvés (avant réassignation) : {n_clusters_raw}")
 print(f"Outliers détectés : {n_outliers_raw} ({n_outliers_raw/len(df)*100:.1f}%)")
 
+# Appartenance souple de chaque client (gaussiennes ajustées sur les membres, hors outliers)
+appartenance = modele_appartenance(X_pca, cluster_labels, scaler, pca)
+membership   = appartenances(X_pca, appartenance)
+print(f"Clients frontaliers (appartenance max < 0.8) : {(membership.max(axis=1) < 0.8).mean():.1%}")
+
+# Scaler, PCA et modèle d'appartenance conservés (stability.py, app.py)
+sauvegarder_transformation(scaler, pca, appartenance)
+
 # -----------------------------
 # 6. Réassigner les outliers au cluster le plus proche
 # -----------------------------
-unique_clusters = [c for c in set(cluster_labels) if c != -1]
-centroids = np.array([X_pca[cluster_labels == c].mean(axis=0) for c in unique_clusters])
-
 outlier_mask = cluster_labels == -1
+cluster_labels = reassigner_outliers(X_pca, cluster_labels)
 if outlier_mask.sum() > 0:
-    closest, _ = pairwise_distances_argmin_min(X_pca[outlier_mask], centroids)
-    cluster_labels[outlier_mask] = np.array(unique_clusters)[closest]
     print(f"✅ {outlier_mask.sum()} outliers réassignés au cluster le plus proche")
 
 df["Cluster"] = cluster_labels
@@ -92,10 +80,19 @@ print(cluster_analysis)
 # -----------------------------
 # 8. Sauvegarder
 # -----------------------------
+# Trié par cluster (tri stable) : chaque cluster est une plage contiguë de lignes
 output_path = os.path.join(os.path.dirname(__file__), "../data/cleaned_data_with_clusters.csv")
-df.to_csv(output_path, index=False)
+ordre = df.sort_values("Cluster", kind="stable").index
+df.loc[ordre].to_csv(output_path, index=False)
 print(f"\n✅ Dataset sauvegardé dans data/cleaned_data_with_clusters.csv")
 
+# Appartenances souples, mêmes lignes dans le même ordre (P_<cluster> par colonne)
+df_membership = pd.DataFrame(membership, index=df.index,
+                             columns=[f"P_{c}" for c in appartenance['cluster_ids']])
+df_membership.insert(0, "Cluster", df["Cluster"])
+df_membership.loc[ordre].round(6).to_csv(MEMBERSHIP_PATH, index=False)
+print(f"✅ Appartenances souples sauvegardées dans data/cluster_membership.csv")
+
 # -----------------------------
 # 9. Visualisations
 # -----------------------------
@@ -138,4 +135,4 @@ plt.ylabel("PC2")
 plt.tight_layout()
 plt.savefig(os.path.join(os.path.dirname(__file__), "../results/pca_clusters.png"))
 plt.show()
-print("✅ Plot PCA 2D sauvegardé")
\ No newline at end of file
+print("✅ Plot PCA 2D sauvegardé")
\ No newline at end of file
@@ -0,0 +1,144 @@
+"""
+Efficacité HTTP du service : compression, ETag / Last-Modified et réponses 304.
+
+  - Le dashboard (HTML + stats des clusters) est construit une fois par processus
+    et précompressé (gzip, et brotli si le paquet est installé) au niveau maximal ;
+    chaque requête ne fait que choisir la variante selon Accept-Encoding.
+  - /history porte un ETag dérivé de la date (ns) et de la taille du fichier : un
+    client à jour reçoit un 304 sans que l'historique soit relu. Ressource modifiable
+    plusieurs fois par seconde : validée par ETag seul, sans Last-Modified (à la
+    seconde, If-Modified-Since rendrait des 304 périmés).
+  - Les réponses dynamiques volumineuses (/predict…) sont compressées à la volée,
+    à un niveau plus bas, au-delà de MIN_OCTETS.
+
+Les ETag sont faibles (W/) : les variantes compressées d'un même contenu les partagent.
+"""
+import gzip
+import hashlib
+import math
+from email.utils import formatdate
+
+from flask import Response, request
+
+try:
+    import brotli
+except ImportError:   # brotli est optionnel : gzip seul
+    brotli = None
+
+MIN_OCTETS      = 1024   # en dessous, la compression ne vaut pas son coût
+TYPES_COMPRESSES = {'application/json', 'text/html', 'text/plain', 'text/css',
+                    'application/javascript'}
+
+# Niveaux : maximal pour les actifs précompressés (payé une fois), modéré à la volée
+NIVEAUX = {'statique': {'gzip': 9, 'br': 11}, 'dynamique': {'gzip': 5, 'br': 4}}
+
+# ============================================
+# 1. COMPRESSION
+# ============================================
+def encodages_disponibles():
+    return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+
+def compresser(contenu, encodage, mode='dynamique'):
+    niveau = NIVEAUX[mode][encodage]
+    if encodage == 'br':
+        return brotli.compress(contenu, quality=niveau)
+    # mtime=0 : sortie déterministe, identique d'un processus à l'autre
+    return gzip.compress(contenu, compresslevel=niveau, mtime=0)
+
+
+def choisir_encodage(disponibles):
+    """Premier encodage de `disponibles` (ordre de préférence) accepté par le client."""
+    for encodage in disponibles:
+        if request.accept_encodings[encodage] > 0:
+            return encodage
+    return 'identity'
+
+# ============================================
+# 2. VALIDATEURS ET REQUÊTES CONDITIONNELLES
+# ============================================
+def etag_contenu(contenu):
+    return f'W/"{hashlib.sha256(contenu).hexdigest()[:20]}"'
+
+
+def etag_fichier(stat):
+    """ETag d'un fichier sans le lire : date de modification (ns) et taille."""
+    return f'W/"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+def en_tetes_cache(etag, last_modified=None):
+    # no-cache : le navigateur garde la réponse mais revalide à chaque visite
+    entetes = {'ETag': etag, 'Cache-Control': 'no-cache', 'Vary': 'Accept-Encoding'}
+    if last_modified is not None:
+        entetes['Last-Modified'] = formatdate(int(last_modified), usegmt=True)
+    return entetes
+
+
+def non_modifie(etag, last_modified=None):
+    """
+    Le client a-t-il déjà cette version ? If-None-Match prime sur If-Modified-Since.
+    last_modified=None : validation par ETag seul. Sinon la date HTTP est à la
+    seconde : la date de modification est arrondie au-dessus, si bien qu'un
+    changement dans la seconde annoncée ne donne jamais de 304.
+    """
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match is not None:
+        valeurs = [v.strip().removeprefix('W/') for v in if_none_match.split(',')]
+        return '*' in valeurs or etag.removeprefix('W/') in valeurs
+    depuis = request.if_modified_since
+    return (last_modified is not None and depuis is not None
+            and math.ceil(last_modified) <= depuis.timestamp())
+
+# ============================================
+# 3. RÉPONSES
+# ============================================
+def precompresser(contenu, media_type, last_modified):
+    """Actif statique : toutes les variantes encodées, calculées une fois."""
+    variantes = {'identity': contenu}
+    for encodage in encodages_disponibles():
+        variantes[encodage] = compresser(contenu, encodage, 'statique')
+    return {'variantes': variantes, 'media_type': media_type,
+            'etag': etag_contenu(contenu), 'last_modified': last_modified,
+            'tailles': {k: len(v) for k, v in variantes.items()}}
+
+
+def servir_actif(actif):
+    """304 si le client est à jour, sinon la variante précompressée adaptée."""
+    entetes = en_tetes_cache(actif['etag'], actif['last_modified'])
+    if non_modifie(actif['etag'], actif['last_modified']):
+        return Response(status=304, headers=entetes)
+    encodage = choisir_encodage([e for e in encodages_disponibles() if e in actif['variantes']])
+    reponse  = Response(actif['variantes'][encodage], mimetype=actif['media_type'],
+                        headers=entetes)
+    if encodage != 'identity':
+        reponse.headers['Content-Encoding'] = encodage
+    return reponse
+
+
+def servir_conditionnel(etag, last_modified, produire, media_type='application/json'):
+    """
+    produire() (→ bytes) n'est appelée que si le client n'a pas la version courante.
+    last_modified=None pour une ressource modifiable : ETag seul.
+    """
+    entetes = en_tetes_cache(etag, last_modified)
+    if non_modifie(etag, last_modified):
+        return Response(status=304, headers=entetes)
+    return Response(produire(), mimetype=media_type, headers=entetes)
+
+
+def compresser_reponse(reponse, min_octets=MIN_OCTETS):
+    """Hook after_request : compresse à la volée les réponses textuelles volumineuses."""
+    if (reponse.status_code != 200 or reponse.direct_passthrough
+            or 'Content-Encoding' in reponse.headers
+            or reponse.mimetype not in TYPES_COMPRESSES):
+        return reponse
+    corps = reponse.get_data()
+    if len(corps) < min_octets:
+        return reponse
+    encodage = choisir_encodage(encodages_disponibles())
+    if encodage == 'identity':
+        return reponse
+    reponse.set_data(compresser(corps, encodage))
+    reponse.headers['Content-Encoding'] = encodage
+    reponse.vary.add('Accept-Encoding')
+    return reponse
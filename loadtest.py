@@ -0,0 +1,274 @@
+"""
+Générateur de charge : rejoue un journal de requêtes JSONL contre /predict.
+
+    python loadtest.py requests.jsonl --url http://localhost:5000 --mode closed --concurrency 8
+    python loadtest.py requests.jsonl --in-process --mode open --rate 50 --duration 30
+    python loadtest.py requests.jsonl --in-process --saturation 1 2 4 8 16
+
+Chaque ligne du journal est un payload /predict ({"limit_bal": ..., "age": ...}),
+éventuellement enveloppé dans {"payload": {...}} ou {"body": {...}}. Les lignes
+qui ne contiennent pas de payload valide sont ignorées ; si aucune ne l'est, des
+clients synthétiques (benchmark.generer_payloads) sont utilisés.
+
+Modes :
+  - open   : arrivées à débit fixe (--rate req/s), indépendantes des réponses
+  - closed : N clients concurrents (--concurrency), chacun enchaîne ses requêtes
+"""
+import argparse
+import json
+import os
+import queue
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from benchmark import BENCH_PATH, generer_payloads, percentiles
+
+# Champs obligatoires d'un payload /predict (cf. app.predict)
+CHAMPS_PREDICT = (['limit_bal', 'sex', 'education', 'marriage', 'age']
+                  + [f'pay_{i}' for i in [0, 2, 3, 4, 5, 6]]
+                  + [f'bill_amt{i}' for i in range(1, 7)]
+                  + [f'pay_amt{i}' for i in range(1, 7)])
+
+# ============================================
+# 1. LECTURE DU JOURNAL
+# ============================================
+def extraire_payload(ligne):
+    """Retourne le payload /predict contenu dans une ligne du journal, ou None."""
+    for cle in ('payload', 'body', 'json'):
+        if isinstance(ligne.get(cle), dict):
+            ligne = ligne[cle]
+            break
+    ligne = {k.lower(): v for k, v in ligne.items()}
+    if not all(c in ligne for c in CHAMPS_PREDICT):
+        return None
+    return {c: ligne[c] for c in CHAMPS_PREDICT}
+
+
+def charger_journal(path, limite=None, seed=42):
+    payloads, ignorees = [], 0
+    with open(path, encoding='utf-8') as f:
+        for ligne in f:
+            ligne = ligne.strip()
+            if not ligne:
+                continue
+            try:
+                payload = extraire_payload(json.loads(ligne))
+            except (json.JSONDecodeError, AttributeError):
+                payload = None
+            if payload is None:
+                ignorees += 1
+            else:
+                payloads.append(payload)
+
+    if ignorees:
+        print(f"⚠️  {ignorees} ligne(s) sans payload /predict ignorée(s)")
+    if not payloads:
+        n = limite or 200
+        print(f"⚠️  Aucun payload exploitable — {n} clients synthétiques générés")
+        payloads = generer_payloads(n, seed)
+    return payloads[:limite] if limite else payloads
+
+# ============================================
+# 2. CIBLES (HTTP OU CLIENT DE TEST)
+# ============================================
+class CibleHTTP:
+    """POST /predict sur un serveur en cours d'exécution."""
+
+    def __init__(self, url, timeout=30):
+        self.url     = url.rstrip('/') + '/predict'
+        self.timeout = timeout
+
+    def envoyer(self, payload):
+        req = urllib.request.Request(self.url, data=json.dumps(payload).encode(),
+                                     headers={'Content-Type': 'application/json'})
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+                corps = json.loads(resp.read())
+                return resp.status == 200 and bool(corps.get('success'))
+        except (urllib.error.URLError, OSError, ValueError):
+            return False
+
+
+class CibleLocale:
+    """Client de test Flask (un par thread), sans réseau."""
+
+    def __init__(self):
+        import app as service
+        # Ne pas polluer l'historique réel
+        service.HISTORY_PATH = os.path.join(tempfile.mkdtemp(), 'prediction_history.json')
+        self.app    = service.app
+        self._local = threading.local()
+
+    def envoyer(self, payload):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        resp = client.post('/predict', json=payload)
+        return resp.status_code == 200 and bool((resp.get_json() or {}).get('success'))
+
+# ============================================
+# 3. MODES DE CHARGE
+# ============================================
+def _appel(cible, payload, t_prevu=None):
+    t0 = time.perf_counter()
+    ok = cible.envoyer(payload)
+    t1 = time.perf_counter()
+    # En boucle ouverte, la latence inclut l'attente dans la file (coordinated omission)
+    debut = t_prevu if t_prevu is not None else t0
+    return (t1 - debut) * 1000, (t1 - t0) * 1000, ok
+
+
+def boucle_fermee(cible, payloads, concurrency, n_requetes):
+    """N clients concurrents, chacun envoie sa requête suivante dès la réponse reçue."""
+    file = queue.Queue()
+    for i in range(n_requetes):
+        file.put(payloads[i % len(payloads)])
+    resultats, verrou = [], threading.Lock()
+
+    def travailleur():
+        local = []
+        while True:
+            try:
+                payload = file.get_nowait()
+            except queue.Empty:
+                break
+            local.append(_appel(cible, payload))
+        with verrou:
+            resultats.extend(local)
+
+    t0 = time.perf_counter()
+    threads = [threading.Thread(target=travailleur) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return resultats, time.perf_counter() - t0
+
+
+def boucle_ouverte(cible, payloads, rate, duration, max_workers=64):
+    """Arrivées à intervalle fixe 1/rate pendant `duration` secondes."""
+    n_requetes = max(1, int(rate * duration))
+    intervalle = 1.0 / rate
+    futures    = []
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for i in range(n_requetes):
+            t_prevu = t0 + i * intervalle
+            attente = t_prevu - time.perf_counter()
+            if attente > 0:
+                time.sleep(attente)
+            futures.append(pool.submit(_appel, cible, payloads[i % len(payloads)], t_prevu))
+        resultats = [f.result() for f in futures]
+    return resultats, time.perf_counter() - t0
+
+# ============================================
+# 4. RAPPORT
+# ============================================
+def resumer(resultats, duree):
+    latences = [r[0] for r in resultats]
+    service  = [r[1] for r in resultats]
+    erreurs  = sum(1 for r in resultats if not r[2])
+    return {
+        'requests':       len(resultats),
+        'errors':         erreurs,
+        'error_rate':     round(erreurs / len(resultats), 4) if resultats else 0.0,
+        'duration_s':     round(duree, 3),
+        'throughput_per_s': round(len(resultats) / duree, 2) if duree else 0.0,
+        'latency':        percentiles(latences),
+        'service_time':   percentiles(service),
+    }
+
+
+def saturation(cible, payloads, niveaux, n_requetes):
+    """Débit en boucle fermée pour chaque niveau de concurrence ; le max = débit de saturation."""
+    paliers = {}
+    for c in niveaux:
+        res, duree = boucle_fermee(cible, payloads, c, n_requetes)
+        paliers[str(c)] = resumer(res, duree)
+        print(f"   concurrence {c:>3} : {paliers[str(c)]['throughput_per_s']:>8} req/s  "
+              f"p99 {paliers[str(c)]['latency'].get('p99_ms')} ms")
+    meilleur = max(paliers, key=lambda k: paliers[k]['throughput_per_s'])
+    return {
+        'levels':                  paliers,
+        'saturation_concurrency':  int(meilleur),
+        'saturation_throughput_per_s': paliers[meilleur]['throughput_per_s'],
+    }
+
+
+def afficher(resume):
+    lat = resume['latency']
+    print(f"\n  Requêtes  : {resume['requests']}  (erreurs : {resume['errors']}, "
+          f"{resume['error_rate']:.2%})")
+    print(f"  Débit     : {resume['throughput_per_s']} req/s sur {resume['duration_s']} s")
+    print(f"  Latence   : p50 {lat.get('p50_ms')} ms | p95 {lat.get('p95_ms')} ms | "
+          f"p99 {lat.get('p99_ms')} ms | max {lat.get('max_ms')} ms")
+
+# ============================================
+# 5. MAIN
+# ============================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rejoue un journal JSONL contre /predict")
+    parser.add_argument('journal', help="fichier JSONL de requêtes")
+    cible_grp = parser.add_mutually_exclusive_group()
+    cible_grp.add_argument('--url', default='http://localhost:5000')
+    cible_grp.add_argument('--in-process', action='store_true', help="client de test Flask")
+    parser.add_argument('--mode', choices=['open', 'closed'], default='closed')
+    parser.add_argument('--rate', type=float, default=20.0, help="req/s (mode open)")
+    parser.add_argument('--duration', type=float, default=10.0, help="secondes (mode open)")
+    parser.add_argument('--concurrency', type=int, default=4, help="clients (mode closed)")
+    parser.add_argument('--requests', type=int, help="nombre de requêtes (mode closed)")
+    parser.add_argument('--saturation', type=int, nargs='+', metavar='N',
+                        help="balayage des niveaux de concurrence")
+    parser.add_argument('--limit', type=int, help="lignes max lues dans le journal")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help="fichier JSON de sortie")
+    args = parser.parse_args(argv)
+
+    payloads = charger_journal(args.journal, args.limit, args.seed)
+    cible    = CibleLocale() if args.in_process else CibleHTTP(args.url)
+    n_req    = args.requests or len(payloads)
+    print(f"🚀 {len(payloads)} payloads — cible : {'in-process' if args.in_process else args.url}")
+
+    run = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'journal':   os.path.abspath(args.journal),
+            'target':    'in-process' if args.in_process else args.url,
+            'mode':      args.mode,
+        },
+    }
+
+    if args.saturation:
+        print("⏱️  Balayage de saturation...")
+        run['saturation'] = saturation(cible, payloads, args.saturation, n_req)
+        print(f"\n  Débit de saturation : {run['saturation']['saturation_throughput_per_s']} req/s "
+              f"(concurrence {run['saturation']['saturation_concurrency']})")
+    elif args.mode == 'closed':
+        run['meta']['concurrency'] = args.concurrency
+        res, duree = boucle_fermee(cible, payloads, args.concurrency, n_req)
+        run['summary'] = resumer(res, duree)
+        afficher(run['summary'])
+    else:
+        run['meta'].update({'rate': args.rate, 'duration': args.duration})
+        res, duree = boucle_ouverte(cible, payloads, args.rate, args.duration)
+        run['summary'] = resumer(res, duree)
+        afficher(run['summary'])
+
+    output = args.output or os.path.join(
+        BENCH_PATH, f"load_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(run, f, indent=2)
+    print(f"\n✅ Résultats sauvegardés → {output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,296 @@
+"""
+Export ONNX des modèles par cluster et backend de scoring ONNX Runtime (CPU).
+
+    python onnx_scoring.py              # exporte results/models.pkl → results/onnx/
+    python onnx_scoring.py --no-check   # sans contrôle de parité (pas de données)
+
+Chaque cluster donne deux graphes (GB et NB) dont l'entrée est la matrice des
+23 colonnes brutes (RAW_FEATURES, float32, catégories déjà nettoyées) : la
+dérivation des features (features.deriver_features) est incluse dans le
+graphe, suivie du classifieur converti par skl2onnx. onnx et skl2onnx ne
+servent qu'à l'export ; le scoring n'a besoin que d'onnxruntime.
+
+L'export est écrit dans un répertoire candidat caché de output_dir, dont la
+parité avec sklearn est vérifiée (verifier_parite) avant publication. Publier,
+c'est renommer le candidat en répertoire de version (v<horodatage>/) puis
+remplacer atomiquement index.json, que lit BackendONNX et qui pointe vers les
+graphes de cette version : un export interrompu ne mélange jamais anciens et
+nouveaux graphes. Si un cluster échoue, l'export lève ErreurParite et l'export
+précédent reste servi. Les GARDER_VERSIONS dernières versions sont conservées.
+"""
+import argparse
+import json
+import os
+import pickle
+import re
+import shutil
+import sys
+from datetime import datetime
+
+import numpy as np
+
+from features import RAW_FEATURES, DERIVED_FEATURES, PAY_COLS, BILL_COLS, PAY_AMT_COLS
+
+BASE_DIR    = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_PATH   = os.path.join(BASE_DIR, 'data', 'cleaned_data_with_clusters.csv')
+MODELS_PATH = os.path.join(BASE_DIR, 'results', 'models.pkl')
+ONNX_PATH   = os.path.join(BASE_DIR, 'results', 'onnx')
+
+OPSET    = 17
+OPSET_ML = 3
+MODELES  = {'gb': 'gradient_boosting', 'nb': 'naive_bayes'}
+
+# Parité : écart absolu toléré par ligne, et part maximale de lignes au-delà.
+# Les arbres de sklearn comparent déjà en float32 ; seules les features dérivées
+# (float32 dans le graphe, float64 côté pandas) peuvent faire basculer un split.
+TOLERANCE      = 1e-4
+MAX_HORS_TOL   = 0.001
+
+# Versions publiées conservées (dont la version servie) : un processus qui a lu
+# l'index précédent peut encore ouvrir ses graphes
+GARDER_VERSIONS = 2
+NOM_VERSION     = re.compile(r'^v\d{8}_\d{6}_\d{6}$')
+
+# ============================================
+# 1. GRAPHE DE DÉRIVATION DES FEATURES
+# ============================================
+def graphe_derivation(feature_names, opset=OPSET):
+    """Graphe ONNX : brut (N, 23) → features du modèle (N, d) dans l'ordre feature_names."""
+    from onnx import TensorProto, helper
+
+    idx    = {c: i for i, c in enumerate(RAW_FEATURES)}
+    toutes = RAW_FEATURES + DERIVED_FEATURES
+    noeuds = []
+
+    def constante(nom, valeurs, dtype=TensorProto.INT64):
+        noeuds.append(helper.make_node('Constant', [], [nom], value=helper.make_tensor(
+            nom + '_valeur', dtype, [len(valeurs)], valeurs)))
+
+    def moyenne(nom, colonnes):
+        constante(nom + '_idx', [idx[c] for c in colonnes])
+        noeuds.append(helper.make_node('Gather', ['raw', nom + '_idx'], [nom + '_cols'], axis=1))
+        noeuds.append(helper.make_node('ReduceMean', [nom + '_cols'], [nom], axes=[1], keepdims=1))
+
+    moyenne('AVG_PAY_DELAY', PAY_COLS)
+    moyenne('AVG_BILL_AMT', BILL_COLS)
+    moyenne('AVG_PAY_AMT', PAY_AMT_COLS)
+
+    constante('un', [1.0], TensorProto.FLOAT)
+    noeuds += [
+        helper.make_node('Add', ['AVG_BILL_AMT', 'un'], ['AVG_BILL_AMT_1']),
+        helper.make_node('Div', ['AVG_PAY_AMT', 'AVG_BILL_AMT_1'], ['PAY_RATIO']),
+    ]
+    constante('limit_idx', [idx['LIMIT_BAL']])
+    noeuds += [
+        helper.make_node('Gather', ['raw', 'limit_idx'], ['LIMIT_BAL'], axis=1),
+        helper.make_node('Add', ['LIMIT_BAL', 'un'], ['LIMIT_BAL_1']),
+        helper.make_node('Log', ['LIMIT_BAL_1'], ['LIMIT_BAL_log']),
+        helper.make_node('Concat', ['raw'] + DERIVED_FEATURES, ['toutes'], axis=1),
+    ]
+    constante('ordre', [toutes.index(f) for f in feature_names])
+    noeuds.append(helper.make_node('Gather', ['toutes', 'ordre'], ['features'], axis=1))
+
+    graphe = helper.make_graph(
+        noeuds, 'derivation',
+        [helper.make_tensor_value_info('raw', TensorProto.FLOAT, [None, len(RAW_FEATURES)])],
+        [helper.make_tensor_value_info('features', TensorProto.FLOAT, [None, len(feature_names)])])
+    return helper.make_model(graphe, opset_imports=[helper.make_opsetid('', opset)])
+
+# ============================================
+# 2. EXPORT
+# ============================================
+def convertir(modele, feature_names):
+    """Graphe complet d'un classifieur : dérivation puis modèle sklearn converti."""
+    from onnx import checker, compose
+    from skl2onnx import convert_sklearn
+    from skl2onnx.common.data_types import FloatTensorType
+
+    classifieur = convert_sklearn(
+        modele, initial_types=[('X', FloatTensorType([None, len(feature_names)]))],
+        options={id(modele): {'zipmap': False}},
+        target_opset={'': OPSET, 'ai.onnx.ml': OPSET_ML})
+    # skl2onnx retient le plus petit opset suffisant (≤ OPSET) : merge_models exige le même
+    opset = next(o.version for o in classifieur.opset_import if o.domain in ('', 'ai.onnx'))
+    derivation = graphe_derivation(feature_names, opset)
+    derivation.ir_version = classifieur.ir_version
+    complet = compose.merge_models(derivation, classifieur, io_map=[('features', 'X')],
+                                   prefix2='clf_')
+    checker.check_model(complet)
+    return complet
+
+
+class ErreurParite(RuntimeError):
+    """Export ONNX refusé : écart à sklearn au-delà de la tolérance."""
+
+    def __init__(self, rapport):
+        self.rapport = rapport
+        echecs = sorted(cid for cid, r in rapport.items() if not r['ok'])
+        super().__init__(f"parité ONNX/sklearn non respectée (clusters {', '.join(echecs)})")
+
+
+def exporter_onnx(models, output_dir=ONNX_PATH, verifier=True, rows=2000):
+    """
+    Écrit cluster_<id>_<gb|nb>.onnx et index.json dans un candidat, vérifie la parité
+    (verifier=True) puis publie le candidat comme nouvelle version de output_dir,
+    index.json en dernier. Retourne l'index publié (avec le rapport de parité) ; lève
+    ErreurParite sans toucher l'export servi sinon.
+    """
+    import onnx
+
+    version  = datetime.now().strftime('v%Y%m%d_%H%M%S_%f')
+    candidat = os.path.join(output_dir, '.candidat')
+    shutil.rmtree(candidat, ignore_errors=True)
+    os.makedirs(candidat)
+    index = {'opset': OPSET, 'raw_features': RAW_FEATURES, 'clusters': {}}
+    for cid, bundle in models.items():
+        fichiers = {}
+        for cle, nom in MODELES.items():
+            fichier = f'cluster_{int(cid)}_{cle}.onnx'
+            onnx.save(convertir(bundle[nom], bundle['feature_names']),
+                      os.path.join(candidat, fichier))
+            fichiers[cle] = fichier
+        index['clusters'][str(int(cid))] = fichiers
+        print(f"  💾 Cluster {cid} → {', '.join(fichiers.values())}")
+    with open(os.path.join(candidat, 'index.json'), 'w') as f:
+        json.dump(index, f, indent=2)
+
+    if verifier:
+        rapport = verifier_parite(models, BackendONNX(candidat), rows)
+        afficher_parite(rapport)
+        if not all(r['ok'] for r in rapport.values()):
+            # Le candidat reste sur disque pour analyse ; l'export servi est intact
+            raise ErreurParite(rapport)
+        index['parity'] = rapport
+
+    # Publication : le candidat devient un répertoire de version (renommage, même
+    # système de fichiers), puis index.json est remplacé atomiquement
+    os.replace(candidat, os.path.join(output_dir, version))
+    index['version']  = version
+    index['clusters'] = {cid: {cle: f'{version}/{fichier}' for cle, fichier in fichiers.items()}
+                         for cid, fichiers in index['clusters'].items()}
+    tmp = os.path.join(output_dir, 'index.json.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(index, f, indent=2)
+    os.replace(tmp, os.path.join(output_dir, 'index.json'))
+    purger_versions(output_dir)
+    return index
+
+
+def purger_versions(output_dir, garder=GARDER_VERSIONS):
+    """
+    Supprime les versions publiées au-delà des `garder` plus récentes, et les graphes
+    à la racine de output_dir (disposition sans versions, plus référencée).
+    """
+    noms     = os.listdir(output_dir)
+    versions = sorted(nom for nom in noms if NOM_VERSION.match(nom))
+    for nom in versions[:max(0, len(versions) - garder)]:
+        shutil.rmtree(os.path.join(output_dir, nom), ignore_errors=True)
+    for nom in noms:
+        if nom.endswith('.onnx'):
+            os.remove(os.path.join(output_dir, nom))
+
+# ============================================
+# 3. BACKEND ONNX RUNTIME (CPU)
+# ============================================
+class BackendONNX:
+    """Sessions ONNX Runtime par cluster : predire(cluster_id, X_brut) → (proba_gb, proba_nb)."""
+
+    def __init__(self, onnx_dir=ONNX_PATH, threads=1):
+        import onnxruntime as ort
+
+        with open(os.path.join(onnx_dir, 'index.json')) as f:
+            index = json.load(f)
+        if index['raw_features'] != RAW_FEATURES:
+            raise ValueError(f"Export ONNX incompatible (colonnes brutes différentes) : {onnx_dir}")
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+        self.sessions = {}
+        for cid, fichiers in index['clusters'].items():
+            self.sessions[int(cid)] = {
+                cle: self._session(ort, os.path.join(onnx_dir, fichier), options)
+                for cle, fichier in fichiers.items()
+            }
+
+    @staticmethod
+    def _session(ort, path, options):
+        session = ort.InferenceSession(path, sess_options=options,
+                                       providers=['CPUExecutionProvider'])
+        sortie = next(o.name for o in session.get_outputs() if o.name.endswith('probabilities'))
+        return session, session.get_inputs()[0].name, sortie
+
+    def predire(self, cluster_id, X_brut):
+        """X_brut : (n, 23) dans l'ordre RAW_FEATURES, catégories nettoyées."""
+        X = np.ascontiguousarray(X_brut, dtype=np.float32)
+        probas = []
+        for cle in ('gb', 'nb'):
+            session, entree, sortie = self.sessions[int(cluster_id)][cle]
+            probas.append(session.run([sortie], {entree: X})[0][:, 1])
+        return probas[0], probas[1]
+
+# ============================================
+# 4. PARITÉ AVEC SKLEARN
+# ============================================
+def verifier_parite(models, backend, rows=2000, seed=42, data_path=DATA_PATH):
+    """
+    Compare, cluster par cluster, predict_proba sklearn (features du CSV, float64)
+    et ONNX Runtime (colonnes brutes, dérivation dans le graphe).
+    """
+    from cluster_index import trier_par_cluster, tranche_cluster
+    from schema import lire_csv
+
+    df, offsets = trier_par_cluster(lire_csv(data_path, fillna_median=True), 'Cluster')
+    rapport = {}
+    for cid in offsets:
+        bundle = models[cid]
+        df_c   = tranche_cluster(df, cid, 'Cluster')
+        df_c   = df_c.sample(min(rows, len(df_c)), random_state=seed)
+        probas = backend.predire(cid, df_c[RAW_FEATURES].to_numpy(dtype=np.float32))
+
+        entree = {}
+        for (cle, nom), proba_onnx in zip(MODELES.items(), probas):
+            proba_skl = bundle[nom].predict_proba(df_c[bundle['feature_names']])[:, 1]
+            ecart     = np.abs(proba_skl - proba_onnx)
+            entree[cle] = {
+                'max_abs_diff':    round(float(ecart.max()), 6),
+                'mean_abs_diff':   round(float(ecart.mean()), 8),
+                'rows_over_tol':   int(np.sum(ecart > TOLERANCE)),
+            }
+        entree['rows'] = len(df_c)
+        entree['ok']   = all(entree[c]['rows_over_tol'] <= MAX_HORS_TOL * len(df_c) for c in MODELES)
+        rapport[str(int(cid))] = entree
+    return rapport
+
+
+def afficher_parite(rapport):
+    for cid, r in rapport.items():
+        statut = "✅" if r['ok'] else "❌"
+        print(f"  {statut} Cluster {cid} : écart max GB {r['gb']['max_abs_diff']:.2e} | "
+              f"NB {r['nb']['max_abs_diff']:.2e} ({r['rows']} lignes)")
+
+# ============================================
+# 5. MAIN
+# ============================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export ONNX des modèles par cluster")
+    parser.add_argument('--models', default=MODELS_PATH)
+    parser.add_argument('--output', default=ONNX_PATH)
+    parser.add_argument('--no-check', action='store_true',
+                        help="publier sans vérifier la parité avec sklearn")
+    parser.add_argument('--rows', type=int, default=2000, help="lignes par cluster (parité)")
+    args = parser.parse_args(argv)
+
+    with open(args.models, 'rb') as f:
+        models = pickle.load(f)
+    print(f"🚀 Export ONNX de {len(models)} cluster(s) → {args.output}")
+    try:
+        exporter_onnx(models, args.output, verifier=not args.no_check, rows=args.rows)
+    except ErreurParite as e:
+        print(f"❌ Export refusé : {e} — index.json non publié")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
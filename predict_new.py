@@ -2,6 +2,18 @@ import pandas as pd
 import numpy as np
 import pickle
 import os
+import argparse
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from features import RAW_FEATURES, nettoyer_categories, deriver_features
+from cluster_index import trier_par_cluster
+from schema import lire_csv
+import thresholds
+from calibrators import calibrer
+from clustering import FEATURES_CLUSTERING, appartenances_brutes, charger_appartenance, poids_melange
 
 # ============================================
 # 1. CHARGEMENT DES MODÈLES ET DONNÉES
@@ -14,15 +26,25 @@ MODELS_PATH  = os.path.join(BASE_DIR, 'results', 'models.pkl')
 with open(MODELS_PATH, 'rb') as f:
     models = pickle.load(f)
 
-# Charger les données pour calculer les centroïdes
-df = pd.read_csv(DATA_PATH)
+# Seuil de décision et bandes de risque de chaque cluster : {cluster_id: (seuil, bandes)}
+DECISIONS = {cid: thresholds.decision_cluster(b) for cid, b in models.items()}
 
 CLUSTER_COL  = 'Cluster'
 TARGET       = 'DEFAULT'
 EXCLUDE_COLS = [CLUSTER_COL, TARGET]
 
+# Charger les données pour calculer les centroïdes (triées par cluster)
+df, offsets = trier_par_cluster(lire_csv(DATA_PATH), CLUSTER_COL)
+
+# Modèle d'appartenance souple (hdbscan.py), restreint aux clusters servis ; None si absent
+APPARTENANCE = charger_appartenance()
+if APPARTENANCE is not None:
+    COLONNES_APPARTENANCE = np.flatnonzero(np.isin(APPARTENANCE['cluster_ids'], list(models)))
+    IDS_APPARTENANCE      = np.asarray(APPARTENANCE['cluster_ids'])[COLONNES_APPARTENANCE]
+
 print("✅ Modèles chargés")
-print(f"✅ Clusters disponibles : {list(models.keys())}\n")
+print(f"✅ Clusters disponibles : {list(models.keys())}")
+print(f"✅ Assignation : {'appartenance souple + mélange' if APPARTENANCE is not None else 'centroïde le plus proche'}\n")
 
 # ============================================
 # 2. CALCUL DES CENTROÏDES PAR CLUSTER
@@ -30,22 +52,23 @@ print(f"✅ Clusters disponibles : {list(models.keys())}\n")
 # Le centroïde = point moyen de chaque cluster dans l'espace des features
 features = df.drop(columns=EXCLUDE_COLS).columns.tolist()
 
-centroids = {}
-for cluster_id in sorted(df[CLUSTER_COL].unique()):
-    df_c = df[df[CLUSTER_COL] == cluster_id]
-    centroids[cluster_id] = df_c[features].mean().values
+# Un seul groupby pour tous les clusters
+moyennes  = df.groupby(CLUSTER_COL, sort=True)[features].mean()
+centroids = dict(zip(moyennes.index, moyennes.to_numpy()))
 
 print("✅ Centroïdes calculés")
-for cid, centroid in centroids.items():
-    print(f"   Cluster {cid} : {len(df[df[CLUSTER_COL]==cid])} clients")
+for cid, (debut, fin) in offsets.items():
+    print(f"   Cluster {cid} : {fin - debut} clients")
 
 # ============================================
 # 3. FONCTION D'ASSIGNATION AU CLUSTER
 # ============================================
-def assigner_cluster(client_features: np.ndarray) -> int:
+def assigner_cluster(client_features: np.ndarray, verbose: bool = True,
+                     cluster_retenu: int = None) -> int:
     """
     Assigne un nouveau client au cluster le plus proche
-    via la distance euclidienne aux centroïdes.
+    via la distance euclidienne aux centroïdes. Si cluster_retenu est donné
+    (appartenance souple), c'est lui qui est marqué dans l'affichage.
     """
     distances = {}
     for cluster_id, centroid in centroids.items():
@@ -53,10 +76,15 @@ def assigner_cluster(client_features: np.ndarray) -> int:
         distances[cluster_id] = dist
 
     cluster_assigne = min(distances, key=distances.get)
+    if not verbose:
+        return cluster_assigne
 
+    retenu = cluster_assigne if cluster_retenu is None else cluster_retenu
     print(f"\n📍 Distances aux centroïdes :")
     for cid, dist in distances.items():
-        marker = " ← assigné" if cid == cluster_assigne else ""
+        marker = " ← retenu" if cid == retenu else ""
+        if cid == cluster_assigne and cid != retenu:
+            marker = " (centroïde le plus proche, non retenu)"
         print(f"   Cluster {cid} : {dist:.4f}{marker}")
 
     return cluster_assigne
@@ -64,13 +92,13 @@ def assigner_cluster(client_features: np.ndarray) -> int:
 # ============================================
 # 4. FONCTION DE PRÉDICTION
 # ============================================
-def predire_client(client_dict: dict, seuil: float = 0.3) -> dict:
+def predire_client(client_dict: dict, seuil: float = None) -> dict:
     """
     Prédit le risque de défaut d'un nouveau client.
 
     Args:
         client_dict : dictionnaire avec les features du client
-        seuil       : seuil de décision (0.3 recommandé pour risque crédit)
+        seuil       : seuil de décision (défaut : seuil optimisé du cluster)
 
     Returns:
         dict avec cluster, probabilité, et décision
@@ -79,28 +107,37 @@ def predire_client(client_dict: dict, seuil: float = 0.3) -> dict:
     client_df      = pd.DataFrame([client_dict])[features]
     client_array   = client_df.values[0]
 
-    # Assigner au cluster
-    cluster_id     = assigner_cluster(client_array)
+    # Cluster de décision : l'appartenance souple prime si disponible ; les distances
+    # sont affichées avec le cluster effectivement retenu
+    clusters, ids, poids = poids_clusters(client_df)
+    cluster_id     = clusters[0]
+    blended        = int((poids[0] > 0).sum()) > 1
+    poids_modeles  = {int(cid): float(w) for cid, w in zip(ids, poids[0]) if w > 0}
+    assigner_cluster(client_array, cluster_retenu=cluster_id)
+    if APPARTENANCE is not None:
+        print(f"📍 Cluster retenu (appartenance max) : {cluster_id}"
+              + (" — client frontalier, modèles mélangés" if blended else ""))
 
-    # Récupérer le modèle du cluster
-    gb_model       = models[cluster_id]['gradient_boosting']
-    nb_model       = models[cluster_id]['naive_bayes']
+    # Seuil et bandes du cluster de plus fort poids
+    seuil_cluster, bandes = DECISIONS[cluster_id]
+    seuil          = seuil_cluster if seuil is None else seuil
 
-    # Prédire avec Gradient Boosting
-    proba_gb       = gb_model.predict_proba(client_df)[0][1]
+    # Probabilités GB (calibrées) et NB, mélangées pour un client frontalier
+    proba_gb, proba_nb = probas_lot(client_df, ids, poids)
+    proba_gb, proba_nb = float(proba_gb[0]), float(proba_nb[0])
     decision_gb    = "⚠️  DÉFAUT" if proba_gb >= seuil else "✅ NON-DÉFAUT"
-
-    # Prédire avec Naive Bayes
-    proba_nb       = nb_model.predict_proba(client_df)[0][1]
     decision_nb    = "⚠️  DÉFAUT" if proba_nb >= seuil else "✅ NON-DÉFAUT"
 
     return {
         'cluster':      cluster_id,
+        'blended':      blended,
+        'poids':        poids_modeles,
         'proba_gb':     proba_gb,
         'decision_gb':  decision_gb,
         'proba_nb':     proba_nb,
         'decision_nb':  decision_nb,
-        'seuil':        seuil
+        'seuil':        seuil,
+        'bandes':       bandes,
     }
 
 # ============================================
@@ -110,30 +147,220 @@ def afficher_resultat(resultat: dict):
     print(f"\n{'='*50}")
     print(f"  RÉSULTAT DE LA PRÉDICTION")
     print(f"{'='*50}")
-    print(f"  Cluster assigné      : {resultat['cluster']}")
-    print(f"  Seuil utilisé        : {resultat['seuil']}")
+    print(f"  Cluster retenu       : {resultat['cluster']}"
+          + (" (client frontalier : modèles mélangés)" if resultat['blended'] else ""))
+    if resultat['blended']:
+        print(f"  Poids du mélange     : " + " | ".join(
+            f"Cluster {cid} {w:.1%}" for cid, w in sorted(resultat['poids'].items(),
+                                                          key=lambda kv: -kv[1])))
+    print(f"  Seuil utilisé        : {resultat['seuil']:.3f}")
     print(f"\n  Gradient Boosting    : {resultat['decision_gb']}")
     print(f"  Probabilité défaut   : {resultat['proba_gb']:.2%}")
     print(f"\n  Naive Bayes          : {resultat['decision_nb']}")
     print(f"  Probabilité défaut   : {resultat['proba_nb']:.2%}")
     print(f"{'='*50}")
 
-    # Niveau de risque
-    proba = resultat['proba_gb']
-    if proba >= 0.7:
-        niveau = "🔴 RISQUE ÉLEVÉ"
-    elif proba >= 0.35:
-        niveau = "🟠 RISQUE MODÉRÉ"
-    elif proba >= 0.2:
-        niveau = "🟡 RISQUE FAIBLE"
+    # Niveau de risque (bandes du cluster)
+    niveau = thresholds.niveau_risque(resultat['proba_gb'], resultat['bandes'])
+    print(f"\n  Niveau de risque : {PASTILLES[niveau]} RISQUE {niveau}")
+    print(f"{'='*50}\n")
+
+# ============================================
+# 6. SCORING VECTORISÉ D'UN LOT DE CLIENTS
+# ============================================
+PASTILLES = {'ÉLEVÉ': '🔴', 'MODÉRÉ': '🟠', 'FAIBLE': '🟡', 'TRÈS FAIBLE': '🟢'}
+
+CLUSTER_IDS     = np.array(sorted(centroids))
+CENTROID_MATRIX = np.vstack([centroids[cid] for cid in CLUSTER_IDS])
+MEDIANES        = df[features].median()
+
+
+def assigner_clusters(X: np.ndarray) -> np.ndarray:
+    """
+    Version vectorisée de assigner_cluster pour une matrice (n, d) :
+    ||x - c||² = ||x||² - 2 x·c + ||c||², puis argmin par ligne.
+    """
+    d2 = ((X ** 2).sum(axis=1)[:, None]
+          - 2 * X @ CENTROID_MATRIX.T
+          + (CENTROID_MATRIX ** 2).sum(axis=1)[None, :])
+    return CLUSTER_IDS[d2.argmin(axis=1)]
+
+
+def poids_clusters(X: pd.DataFrame):
+    """
+    Cluster de décision et poids des modèles de chaque ligne : (clusters, ids, poids)
+    avec poids de forme (n, len(ids)). Avec le modèle d'appartenance, le cluster est
+    l'argmax de l'appartenance (espace PCA du clustering) et les clients frontaliers
+    mélangent plusieurs modèles (clustering.poids_melange, comme l'API). Sinon :
+    centroïde le plus proche, un seul modèle par ligne.
+    """
+    if APPARTENANCE is None:
+        clusters = assigner_clusters(X.to_numpy(dtype=float))
+        return clusters, CLUSTER_IDS, (clusters[:, None] == CLUSTER_IDS[None, :]).astype(float)
+    p = appartenances_brutes(X[FEATURES_CLUSTERING].to_numpy(dtype=float),
+                             APPARTENANCE)[:, COLONNES_APPARTENANCE]
+    p /= np.maximum(p.sum(axis=1, keepdims=True), 1e-300)
+    return IDS_APPARTENANCE[p.argmax(axis=1)], IDS_APPARTENANCE, poids_melange(p)
+
+
+def decider_lot(proba: np.ndarray, clusters: np.ndarray, seuil: float = None):
+    """
+    Décision (0/1) et niveau de risque par ligne, avec le seuil et les bandes du
+    cluster de chaque ligne. Un seuil explicite remplace celui des clusters.
+    """
+    decision = np.empty(len(proba), dtype=np.int8)
+    niveaux  = np.empty(len(proba), dtype=object)
+    for cid in np.unique(clusters):
+        masque = clusters == cid
+        seuil_cluster, bandes = DECISIONS[cid]
+        decision[masque] = proba[masque] >= (seuil_cluster if seuil is None else seuil)
+        niveaux[masque]  = thresholds.niveaux_risque(proba[masque], bandes)
+    return decision, niveaux
+
+
+def preparer_lot(chunk: pd.DataFrame) -> pd.DataFrame:
+    """Colonnes brutes → matrice de features du modèle (nettoyage + features dérivées)."""
+    chunk = chunk.rename(columns=str.upper)
+    nettoyer_categories(chunk)
+    deriver_features(chunk)
+    return chunk[features].fillna(MEDIANES)
+
+
+# Backend ONNX Runtime, chargé à la demande (une fois par processus)
+_backend_onnx = None
+
+
+def backend_onnx():
+    global _backend_onnx
+    if _backend_onnx is None:
+        from onnx_scoring import BackendONNX
+        _backend_onnx = BackendONNX()
+    return _backend_onnx
+
+
+def probas_lot(X: pd.DataFrame, ids: np.ndarray, poids: np.ndarray,
+               backend: str = 'sklearn'):
+    """
+    Σ_k poids[:, k] · proba du modèle du cluster ids[k] (GB calibré et NB). Chaque
+    modèle ne score que les lignes où son poids est non nul.
+    """
+    proba_gb = np.zeros(len(X))
+    proba_nb = np.zeros(len(X))
+    # Le graphe ONNX dérive lui-même les features à partir des colonnes brutes
+    X_brut = X[RAW_FEATURES].to_numpy(dtype=np.float32) if backend == 'onnx' else None
+    for k, cid in enumerate(ids):
+        masque = poids[:, k] > 0
+        if not masque.any():
+            continue
+        if backend == 'onnx':
+            gb, nb = backend_onnx().predire(cid, X_brut[masque])
+        else:
+            gb = models[cid]['gradient_boosting'].predict_proba(X[masque])[:, 1]
+            nb = models[cid]['naive_bayes'].predict_proba(X[masque])[:, 1]
+        # Calibration par cluster : interpolation vectorisée sur la table de points de rupture
+        gb = calibrer(models[cid].get('calibrator'), gb)
+        proba_gb[masque] += poids[masque, k] * gb
+        proba_nb[masque] += poids[masque, k] * nb
+    return proba_gb, proba_nb
+
+
+def scorer_lot(chunk: pd.DataFrame, seuil: float = None, id_col: str = 'ID',
+               backend: str = 'sklearn') -> pd.DataFrame:
+    """Assigne et score un lot de clients bruts (mélange des modèles pour les frontaliers)."""
+    X = preparer_lot(chunk)
+    clusters, ids, poids = poids_clusters(X)
+    proba_gb, proba_nb   = probas_lot(X, ids, poids, backend)
+
+    sortie = pd.DataFrame(index=chunk.index)
+    if id_col in chunk.columns:
+        sortie[id_col] = chunk[id_col].to_numpy()
+    sortie['cluster']    = clusters
+    sortie['blended']    = (poids > 0).sum(axis=1) > 1
+    sortie['proba_gb']   = proba_gb.round(6)
+    sortie['proba_nb']   = proba_nb.round(6)
+    sortie['decision'], sortie['risk_level'] = decider_lot(proba_gb, clusters, seuil)
+    return sortie
+
+# ============================================
+# 7. SCORING D'UN FICHIER EN STREAMING
+# ============================================
+def lire_par_morceaux(path: str, chunksize: int):
+    """Itère sur un CSV ou un Parquet par morceaux de `chunksize` lignes."""
+    if path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
     else:
-        niveau = "🟢 RISQUE TRÈS FAIBLE"
+        yield from pd.read_csv(path, chunksize=chunksize)
 
-    print(f"\n  Niveau de risque : {niveau}")
-    print(f"{'='*50}\n")
+
+class EcrivainSortie:
+    """Écrit les lots scorés en CSV (append) ou Parquet (row groups) au fil de l'eau."""
+
+    def __init__(self, path: str):
+        self.path    = path
+        self.parquet = path.endswith('.parquet')
+        self._writer = None
+        self._entete = True
+
+    def ecrire(self, lot: pd.DataFrame):
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(lot, preserve_index=False)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.path, table.schema)
+            self._writer.write_table(table)
+        else:
+            lot.to_csv(self.path, mode='w' if self._entete else 'a',
+                       header=self._entete, index=False)
+            self._entete = False
+
+    def fermer(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+def scorer_fichier(input_path: str, output_path: str, chunksize: int = 50000,
+                   seuil: float = None, workers: int = 1, id_col: str = 'ID',
+                   backend: str = 'sklearn') -> dict:
+    """
+    Score un fichier par morceaux : mémoire bornée à ~2×workers morceaux en vol,
+    ordre des lignes conservé. workers > 1 répartit les morceaux sur un pool de processus.
+    """
+    ecrivain = EcrivainSortie(output_path)
+    n_lignes, t0 = 0, time.perf_counter()
+
+    def rapporter(lot):
+        nonlocal n_lignes
+        ecrivain.ecrire(lot)
+        n_lignes += len(lot)
+        duree = time.perf_counter() - t0
+        print(f"   {n_lignes:>10,} lignes | {n_lignes / duree:>10,.0f} lignes/s", flush=True)
+
+    morceaux = lire_par_morceaux(input_path, chunksize)
+    try:
+        if workers <= 1:
+            for chunk in morceaux:
+                rapporter(scorer_lot(chunk, seuil, id_col, backend))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                en_vol = deque()
+                for chunk in morceaux:
+                    en_vol.append(pool.submit(scorer_lot, chunk, seuil, id_col, backend))
+                    if len(en_vol) >= 2 * workers:
+                        rapporter(en_vol.popleft().result())
+                while en_vol:
+                    rapporter(en_vol.popleft().result())
+    finally:
+        ecrivain.fermer()
+
+    duree = time.perf_counter() - t0
+    return {'rows': n_lignes, 'duration_s': round(duree, 3),
+            'rows_per_s': round(n_lignes / duree, 1) if duree else 0.0}
 
 # ============================================
-# 6. EXEMPLE — NOUVEAU CLIENT
+# 8. EXEMPLE — NOUVEAU CLIENT
 # ============================================
 # Remplis les valeurs de ton client ici
 nouveau_client = {
@@ -167,6 +394,37 @@ nouveau_client = {
     'LIMIT_BAL_log' : np.log(50000),  # Log de la limite
 }
 
-# Lancer la prédiction
-resultat = predire_client(nouveau_client, seuil=0.3)
-afficher_resultat(resultat)
\ No newline at end of file
+# ============================================
+# 9. MAIN
+# ============================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Scoring d'un client exemple, ou d'un fichier CSV/Parquet en streaming")
+    parser.add_argument('--input', help="fichier CSV ou Parquet de clients à scorer")
+    parser.add_argument('--output', help="fichier de sortie (.csv ou .parquet)")
+    parser.add_argument('--chunksize', type=int, default=50000)
+    parser.add_argument('--seuil', type=float, help="seuil de décision (défaut : celui du cluster)")
+    parser.add_argument('--workers', type=int, default=1, help="processus (1 = séquentiel)")
+    parser.add_argument('--id-col', default='ID', help="colonne identifiant recopiée en sortie")
+    parser.add_argument('--backend', choices=['sklearn', 'onnx'], default='sklearn',
+                        help="moteur des probabilités (onnx : export de onnx_scoring.py)")
+    args = parser.parse_args(argv)
+
+    if not args.input:
+        # Lancer la prédiction
+        resultat = predire_client(nouveau_client, seuil=args.seuil)
+        afficher_resultat(resultat)
+        return 0
+
+    output = args.output or os.path.splitext(args.input)[0] + '_scored.csv'
+    print(f"🚀 Scoring de {args.input} → {output} "
+          f"(morceaux de {args.chunksize}, {args.workers} processus)")
+    rapport = scorer_fichier(args.input, output, args.chunksize, args.seuil,
+                             args.workers, args.id_col, args.backend)
+    print(f"\n✅ {rapport['rows']:,} lignes scorées en {rapport['duration_s']} s "
+          f"({rapport['rows_per_s']:,.0f} lignes/s)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
\ No newline at end of file
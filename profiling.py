@@ -0,0 +1,130 @@
+"""
+Profilage opt-in des requêtes /predict (cProfile).
+
+Une requête est profilée si elle porte l'en-tête `X-Profile: 1` accompagné d'un
+`X-Admin-Token` valide, ou si elle est tirée au sort selon PROFILE_SAMPLE_RATE
+(0 = jamais, 1 = toujours). Sans ADMIN_TOKEN configuré, l'en-tête est ignoré. Le profil
+couvre toute la requête : construction du TreeExplainer SHAP, rendu matplotlib,
+appels pandas. Les profils sont écrits au format pstats dans un anneau borné
+sur disque (les plus anciens sont supprimés au-delà de PROFILE_MAX_FILES).
+"""
+import cProfile
+import functools
+import hmac
+import io
+import os
+import pstats
+import random
+import re
+import threading
+import time
+from datetime import datetime
+
+from flask import request
+
+BASE_DIR      = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROFILES_PATH = os.environ.get('PROFILES_PATH', os.path.join(BASE_DIR, 'results', 'profiles'))
+SAMPLE_RATE   = float(os.environ.get('PROFILE_SAMPLE_RATE', '0'))
+MAX_FILES     = int(os.environ.get('PROFILE_MAX_FILES', '50'))
+HEADER        = 'X-Profile'
+ADMIN_TOKEN   = os.environ.get('ADMIN_TOKEN')
+ADMIN_HEADER  = 'X-Admin-Token'
+
+NOM_VALIDE = re.compile(r'^[\w.-]+\.prof$')
+
+# Clés de tri acceptées par pstats.Stats.sort_stats
+TRIS = sorted(pstats.Stats.sort_arg_dict_default)
+
+# cProfile ne supporte qu'un profileur actif à la fois par processus
+_verrou = threading.Lock()
+
+# ============================================
+# 1. DÉCISION ET CAPTURE
+# ============================================
+def jeton_admin_valide():
+    """X-Admin-Token égal à ADMIN_TOKEN ; toujours faux si aucun jeton n'est configuré."""
+    jeton = request.headers.get(ADMIN_HEADER)
+    return bool(ADMIN_TOKEN) and jeton is not None and hmac.compare_digest(jeton, ADMIN_TOKEN)
+
+
+def doit_profiler():
+    if request.headers.get(HEADER, '').lower() in ('1', 'true', 'yes') and jeton_admin_valide():
+        return True
+    return SAMPLE_RATE > 0 and random.random() < SAMPLE_RATE
+
+
+def profiler_requete(vue):
+    """Décorateur de route : capture un profil cProfile si la requête est sélectionnée."""
+    @functools.wraps(vue)
+    def wrapper(*args, **kwargs):
+        if not doit_profiler() or not _verrou.acquire(blocking=False):
+            return vue(*args, **kwargs)
+        profiler = cProfile.Profile()
+        t0 = time.perf_counter()
+        try:
+            profiler.enable()
+            try:
+                return vue(*args, **kwargs)
+            finally:
+                profiler.disable()
+                duree_ms = (time.perf_counter() - t0) * 1000
+                sauvegarder_profil(profiler, request.endpoint, duree_ms)
+        finally:
+            _verrou.release()
+    return wrapper
+
+# ============================================
+# 2. ANNEAU SUR DISQUE
+# ============================================
+def sauvegarder_profil(profiler, endpoint, duree_ms):
+    os.makedirs(PROFILES_PATH, exist_ok=True)
+    horodatage = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+    nom  = f"{horodatage}_{endpoint}_{int(duree_ms)}ms.prof"
+    path = os.path.join(PROFILES_PATH, nom)
+    profiler.dump_stats(path)
+    purger_anneau()
+    return nom
+
+
+def purger_anneau(max_files=None):
+    """Supprime les profils les plus anciens au-delà de max_files."""
+    max_files = MAX_FILES if max_files is None else max_files
+    profils = sorted(f for f in os.listdir(PROFILES_PATH) if NOM_VALIDE.match(f))
+    for nom in profils[:max(0, len(profils) - max_files)]:
+        try:
+            os.remove(os.path.join(PROFILES_PATH, nom))
+        except FileNotFoundError:
+            pass
+
+
+def lister_profils():
+    if not os.path.isdir(PROFILES_PATH):
+        return []
+    profils = []
+    for nom in sorted(os.listdir(PROFILES_PATH), reverse=True):
+        if not NOM_VALIDE.match(nom):
+            continue
+        st = os.stat(os.path.join(PROFILES_PATH, nom))
+        profils.append({
+            'name':     nom,
+            'size':     st.st_size,
+            'created':  datetime.fromtimestamp(st.st_mtime).isoformat(timespec='seconds'),
+        })
+    return profils
+
+
+def chemin_profil(nom):
+    """Chemin d'un profil de l'anneau, ou None si le nom est invalide ou inconnu."""
+    if not NOM_VALIDE.match(nom):
+        return None
+    path = os.path.join(PROFILES_PATH, nom)
+    return path if os.path.isfile(path) else None
+
+
+def resume_profil(path, tri='cumulative', limite=40):
+    """Rendu texte pstats d'un profil (top `limite` fonctions). `tri` doit être dans TRIS."""
+    if tri not in TRIS:
+        raise ValueError(f"tri inconnu : {tri} (attendu : {', '.join(TRIS)})")
+    out = io.StringIO()
+    pstats.Stats(path, stream=out).sort_stats(tri).print_stats(limite)
+    return out.getvalue()
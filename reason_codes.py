@@ -0,0 +1,141 @@
+"""
+Codes raisons approchés par cluster : table de la contribution SHAP moyenne
+par intervalle de valeurs de chaque feature, construite par shap_analysis.py.
+
+Au scoring, l'explication d'un client se réduit à F recherches d'intervalle et
+F lectures de table (quelques microsecondes), au lieu d'un TreeExplainer et
+d'un calcul TreeSHAP exact par requête. La fidélité aux SHAP exacts est mesurée
+à la construction (recouvrement du top-k, accord de signe, erreur absolue) ;
+l'explication exacte reste disponible à la demande.
+
+Format d'une table (un cluster) :
+    edges   (F, N_BINS - 1)  bornes intérieures croissantes, complétées par +inf
+    contrib (F, N_BINS)      SHAP moyen de la feature dans chaque intervalle
+"""
+import os
+import pickle
+import time
+
+import numpy as np
+
+BASE_DIR          = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REASON_CODES_PATH = os.path.join(BASE_DIR, 'results', 'reason_codes.pkl')
+FIDELITY_PATH     = os.path.join(BASE_DIR, 'results', 'reason_codes_fidelity.json')
+
+N_BINS = 16    # intervalles par feature (quantiles, ou une valeur par intervalle si discrète)
+TOP_K  = 6     # contributions affichées par le dashboard
+
+# ============================================
+# 1. CONSTRUCTION (shap_analysis.py)
+# ============================================
+def bornes_feature(valeurs, n_bins=N_BINS):
+    """
+    Bornes intérieures d'une feature : milieux entre valeurs distinctes si elle en
+    compte au plus n_bins (PAY_*, catégories), sinon quantiles distincts.
+    """
+    uniques = np.unique(valeurs)
+    if len(uniques) <= n_bins:
+        return (uniques[1:] + uniques[:-1]) / 2
+    return np.unique(np.quantile(valeurs, np.linspace(0, 1, n_bins + 1)[1:-1]))
+
+
+def construire_table(shap_values, X, base_value, n_bins=N_BINS, trained_at=None):
+    """Table de codes raisons à partir des SHAP exacts d'un échantillon X (DataFrame)."""
+    A       = X.to_numpy(dtype=np.float64)
+    valeurs = np.asarray(shap_values, dtype=np.float64)
+    F       = A.shape[1]
+    edges   = np.full((F, n_bins - 1), np.inf)
+    contrib = np.zeros((F, n_bins))
+    for j in range(F):
+        bornes = bornes_feature(A[:, j], n_bins)
+        idx    = np.searchsorted(bornes, A[:, j], side='right')
+        n      = np.bincount(idx, minlength=len(bornes) + 1)
+        somme  = np.bincount(idx, weights=valeurs[:, j], minlength=len(bornes) + 1)
+        edges[j, :len(bornes)]       = bornes
+        contrib[j, :len(bornes) + 1] = np.divide(somme, n, out=np.zeros(len(n)), where=n > 0)
+    return {
+        'features':   list(X.columns),
+        'edges':      edges,
+        'contrib':    contrib,
+        'base_value': float(np.ravel(base_value)[0]),
+        'n':          int(len(A)),
+        'trained_at': trained_at,
+    }
+
+
+def fidelite(table, explainer, X, k=TOP_K):
+    """Écart aux SHAP exacts sur X (lignes hors de l'échantillon de construction)."""
+    A = X.to_numpy(dtype=np.float64)
+    t0 = time.perf_counter()
+    exact = np.asarray(explainer.shap_values(X), dtype=np.float64)
+    t_exact = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    approx = contributions_lot(table, A)
+    t_approx = time.perf_counter() - t0
+
+    top_e = np.argsort(-np.abs(exact), axis=1)[:, :k]
+    top_a = np.argsort(-np.abs(approx), axis=1)[:, :k]
+    lignes = np.arange(len(A))[:, None]
+    return {
+        'rows':            int(len(A)),
+        'top_k':           k,
+        'top_k_overlap':   round(float((top_a[:, :, None] == top_e[:, None, :]).any(axis=2).mean()), 4),
+        'top_1_agreement': round(float(np.mean(top_a[:, 0] == top_e[:, 0])), 4),
+        'sign_agreement':  round(float(np.mean(np.sign(approx[lignes, top_e])
+                                               == np.sign(exact[lignes, top_e]))), 4),
+        'mae':             round(float(np.mean(np.abs(approx - exact))), 5),
+        'correlation':     round(float(np.corrcoef(approx.ravel(), exact.ravel())[0, 1]), 4),
+        'exact_ms_per_row':  round(t_exact * 1000 / max(len(A), 1), 4),
+        'approx_us_per_row': round(t_approx * 1e6 / max(len(A), 1), 3),
+    }
+
+
+def sauvegarder_tables(tables, path=REASON_CODES_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        pickle.dump(tables, f, protocol=pickle.HIGHEST_PROTOCOL)
+    return path
+
+# ============================================
+# 2. SCORING
+# ============================================
+def charger_tables(path=REASON_CODES_PATH):
+    """{cluster_id: table} enregistrées par shap_analysis.py, ou None."""
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        return {int(cid): t for cid, t in pickle.load(f).items()}
+
+
+def table_valide(table, bundle, features):
+    """La table correspond-elle au modèle servi (mêmes features, même entraînement) ?"""
+    return (table is not None and table['features'] == list(features)
+            and table.get('trained_at') == bundle.get('trained_at'))
+
+
+def contributions_lot(table, A):
+    """Contributions approchées (n, F) d'une matrice de features (n, F)."""
+    idx = (table['edges'][None, :, :] <= A[:, :, None]).sum(axis=2)
+    return table['contrib'][np.arange(A.shape[1])[None, :], idx]
+
+
+def contributions(table, x):
+    """Contributions approchées (F,) d'un client (vecteur de features)."""
+    x   = np.asarray(x, dtype=np.float64)
+    idx = (table['edges'] <= x[:, None]).sum(axis=1)
+    return table['contrib'][np.arange(len(x)), idx]
+
+
+def top_contributions(valeurs, x, features, k=TOP_K):
+    """Les k contributions de plus grande amplitude, format du dashboard."""
+    top = np.argsort(-np.abs(valeurs), kind='stable')[:k]
+    return [{'feature':    features[j],
+             'value':      round(float(valeurs[j]), 4),
+             'direction':  'defaut' if valeurs[j] > 0 else 'safe',
+             'client_val': float(x[j])}
+            for j in top]
+
+
+def raisons(table, x, k=TOP_K):
+    """Top-k contributions approchées d'un client."""
+    return top_contributions(contributions(table, x), x, table['features'], k)
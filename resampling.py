@@ -0,0 +1,82 @@
+"""
+Rééquilibrage des classes pour l'entraînement par cluster.
+
+  - smote        : SMOTE(random_state=42), résultat mis en cache sur disque, indexé
+                   par un hash du split d'entraînement et des paramètres SMOTE ; un
+                   ré-entraînement sur un split inchangé ne relance pas la recherche kNN.
+  - class_weight : pas de rééchantillonnage, poids par classe (type 'balanced')
+                   passés en sample_weight à GB et NB.
+"""
+import hashlib
+import json
+import os
+import pickle
+
+import numpy as np
+
+BASE_DIR         = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SMOTE_CACHE_PATH = os.path.join(BASE_DIR, 'results', 'smote_cache')
+
+MODES = ['smote', 'class_weight']
+
+PARAMS_SMOTE = {'random_state': 42, 'k_neighbors': 5}
+
+# ============================================
+# 1. CACHE SMOTE
+# ============================================
+def cle_split(X_train, y_train, params):
+    """Empreinte du split (valeurs, colonnes, types, ordre des lignes) et des paramètres."""
+    h = hashlib.sha256()
+    h.update(json.dumps({'columns': list(X_train.columns),
+                         'dtypes':  [str(t) for t in X_train.dtypes],
+                         'params':  params}, sort_keys=True).encode())
+    h.update(np.ascontiguousarray(X_train.to_numpy()).tobytes())
+    h.update(np.ascontiguousarray(np.asarray(y_train)).tobytes())
+    return h.hexdigest()
+
+
+def smote_avec_cache(X_train, y_train, params=None, cache_dir=None):
+    """SMOTE.fit_resample, ou relecture du résultat si ce split a déjà été rééchantillonné."""
+    params    = {**PARAMS_SMOTE, **(params or {})}
+    cache_dir = cache_dir or SMOTE_CACHE_PATH
+    cle    = cle_split(X_train, y_train, params)
+    path   = os.path.join(cache_dir, f'{cle}.pkl')
+    if os.path.exists(path):
+        with open(path, 'rb') as f:
+            X_res, y_res = pickle.load(f)
+        return X_res, y_res, True
+
+    from imblearn.over_sampling import SMOTE
+    X_res, y_res = SMOTE(**params).fit_resample(X_train, y_train)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'wb') as f:
+        pickle.dump((X_res, y_res), f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)   # écriture atomique (workers parallèles)
+    return X_res, y_res, False
+
+# ============================================
+# 2. POIDS DE CLASSES
+# ============================================
+def poids_classes(y):
+    """sample_weight 'balanced' : n / (n_classes × effectif de la classe)."""
+    y = np.asarray(y)
+    classes, effectifs = np.unique(y, return_counts=True)
+    poids = len(y) / (len(classes) * effectifs)
+    return poids[np.searchsorted(classes, y)]
+
+# ============================================
+# 3. POINT D'ENTRÉE
+# ============================================
+def reequilibrer(X_train, y_train, mode='smote'):
+    """
+    Retourne (X_fit, y_fit, sample_weight, info) selon le mode.
+    sample_weight vaut None pour SMOTE (données déjà équilibrées).
+    """
+    if mode == 'smote':
+        X_res, y_res, hit = smote_avec_cache(X_train, y_train)
+        return X_res, y_res, None, {'mode': mode, 'cache_hit': hit}
+    if mode == 'class_weight':
+        return X_train, y_train, poids_classes(y_train), {'mode': mode}
+    raise ValueError(f"Mode de rééquilibrage inconnu : {mode} (attendu : {MODES})")
@@ -0,0 +1,101 @@
+"""
+Schéma de types compact du dataset crédit (UCI_Credit_Card.csv et dérivés).
+
+Par défaut pandas charge tout en int64/float64. Les codes (SEX, EDUCATION,
+MARRIAGE, PAY_*, Cluster, DEFAULT) et l'âge tiennent en int8, les montants en
+float32 : la mémoire par ligne est plus que divisée par deux. Chaque
+conversion est vérifiée : une valeur hors bornes, non entière ou manquante
+pour une colonne entière lève une ValueError au lieu d'être tronquée.
+"""
+import numpy as np
+import pandas as pd
+
+from features import PAY_COLS, BILL_COLS, PAY_AMT_COLS, DERIVED_FEATURES
+
+# ============================================
+# SCHÉMA
+# ============================================
+INT8_COLS    = ['SEX', 'EDUCATION', 'MARRIAGE', 'AGE'] + PAY_COLS + ['Cluster', 'DEFAULT',
+                                                                      'default.payment.next.month']
+MONEY_COLS   = ['LIMIT_BAL'] + BILL_COLS + PAY_AMT_COLS
+FLOAT32_COLS = MONEY_COLS + DERIVED_FEATURES
+
+SCHEMA = {
+    'ID': np.int32,
+    **{c: np.int8 for c in INT8_COLS},
+    **{c: np.float32 for c in FLOAT32_COLS},
+}
+
+# Au-delà de 2**24, float32 ne représente plus tous les entiers : un montant
+# plus grand perdrait des unités en silence.
+MAX_EXACT_FLOAT32 = 2 ** 24
+
+# ============================================
+# CONVERSION VÉRIFIÉE
+# ============================================
+def _verifier_entier(serie, dtype):
+    info = np.iinfo(dtype)
+    if serie.isna().any():
+        raise ValueError(f"{serie.name} : {int(serie.isna().sum())} valeur(s) manquante(s), "
+                         f"conversion en {np.dtype(dtype).name} impossible")
+    valeurs = serie.to_numpy()
+    if valeurs.dtype.kind == 'f' and not np.array_equal(valeurs, np.round(valeurs)):
+        raise ValueError(f"{serie.name} : valeurs non entières, conversion en "
+                         f"{np.dtype(dtype).name} impossible")
+    vmin, vmax = valeurs.min(), valeurs.max()
+    if vmin < info.min or vmax > info.max:
+        raise ValueError(f"{serie.name} : plage [{vmin}, {vmax}] hors de "
+                         f"{np.dtype(dtype).name} [{info.min}, {info.max}]")
+
+
+def _verifier_flottant(serie, dtype):
+    valeurs = serie.to_numpy(dtype=np.float64)
+    if np.isinf(valeurs).any():
+        raise ValueError(f"{serie.name} : {int(np.isinf(valeurs).sum())} valeur(s) infinie(s)")
+    finies  = valeurs[np.isfinite(valeurs)]
+    if finies.size == 0:
+        return
+    vmax = np.abs(finies).max()
+    if vmax > np.finfo(dtype).max:
+        raise ValueError(f"{serie.name} : |valeur| max {vmax} hors de {np.dtype(dtype).name}")
+    if serie.name in MONEY_COLS and vmax > MAX_EXACT_FLOAT32:
+        raise ValueError(f"{serie.name} : montant {vmax} > 2**24, perte de précision en float32")
+
+
+def appliquer_schema(df, schema=None):
+    """Convertit (en place) les colonnes présentes de df vers le schéma compact, avec contrôles."""
+    schema = SCHEMA if schema is None else schema
+    for col, dtype in schema.items():
+        if col not in df.columns or df[col].dtype == dtype:
+            continue
+        if np.issubdtype(dtype, np.integer):
+            _verifier_entier(df[col], dtype)
+        else:
+            _verifier_flottant(df[col], dtype)
+        df[col] = df[col].astype(dtype)
+    return df
+
+
+def lire_csv(path, fillna_median=False, **kwargs):
+    """
+    read_csv au schéma compact. Les colonnes sont lues avec les types par défaut
+    (float64 pour les montants) puis vérifiées et converties par appliquer_schema,
+    après le remplissage des NaN par la médiane si fillna_median : un montant lu
+    directement en float32 serait arrondi ou deviendrait inf sans contrôle.
+    """
+    df = pd.read_csv(path, **kwargs)
+    if fillna_median:
+        df = df.fillna(medianes(df))
+    return appliquer_schema(df)
+
+
+def medianes(df):
+    """Médianes numériques, arrondies pour les colonnes entières du schéma."""
+    med = df.median(numeric_only=True)
+    entieres = [c for c, t in SCHEMA.items() if c in med.index and np.issubdtype(t, np.integer)]
+    med[entieres] = med[entieres].round()
+    return med
+
+
+def octets_par_ligne(df):
+    return df.memory_usage(index=False, deep=True).sum() / max(len(df), 1)
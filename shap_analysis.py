@@ -2,9 +2,15 @@ import pandas as pd
 import numpy as np
 import pickle
 import os
+import json
 import matplotlib.pyplot as plt
 import shap
 
+from cluster_index import trier_par_cluster, tranche_cluster
+from schema import lire_csv
+from reason_codes import (REASON_CODES_PATH, FIDELITY_PATH, construire_table, fidelite,
+                          sauvegarder_tables)
+
 # ============================================
 # 1. CHARGEMENT DES MODÈLES ET DONNÉES
 # ============================================
@@ -18,13 +24,11 @@ os.makedirs(SHAP_PATH, exist_ok=True)
 with open(MODELS_PATH, 'rb') as f:
     models = pickle.load(f)
 
-# Charger les données
-df = pd.read_csv(DATA_PATH)
-
-# Nettoyer les NaN
-df = df.fillna(df.median(numeric_only=True))
+# Charger les données (schéma compact) et nettoyer les NaN
+df = lire_csv(DATA_PATH, fillna_median=True)
 
 CLUSTER_COL  = 'Cluster'
+df, offsets  = trier_par_cluster(df, CLUSTER_COL)
 TARGET       = 'DEFAULT'
 EXCLUDE_COLS = [CLUSTER_COL, TARGET]
 features     = df.drop(columns=EXCLUDE_COLS).columns.tolist()
@@ -41,7 +45,7 @@ def analyser_shap(df, cluster_id):
     print(f"{'='*55}")
 
     # Filtrer le cluster
-    df_c     = df[df[CLUSTER_COL] == cluster_id].copy()
+    df_c     = tranche_cluster(df, cluster_id, CLUSTER_COL)
     X        = df_c[features]
     gb_model = models[cluster_id]['gradient_boosting']
 
@@ -94,7 +98,7 @@ def analyser_shap(df, cluster_id):
 
 # Lancer pour chaque cluster
 shap_results = {}
-for cluster_id in sorted(df[CLUSTER_COL].unique()):
+for cluster_id in offsets:
     explainer, shap_values, X_sample = analyser_shap(df, cluster_id)
     shap_results[cluster_id] = {
         'explainer':   explainer,
@@ -102,6 +106,45 @@ for cluster_id in sorted(df[CLUSTER_COL].unique()):
         'X_sample':    X_sample
     }
 
+# ============================================
+# 2 bis. TABLES DE CODES RAISONS (EXPLICATION RAPIDE DE /predict)
+# ============================================
+# SHAP moyen par intervalle de chaque feature, calculé sur un échantillon distinct
+# de X_sample ; la fidélité est mesurée sur X_sample (SHAP exacts de l'analyse).
+N_LIGNES_TABLE = 2000
+
+print(f"\n{'='*55}")
+print("  TABLES DE CODES RAISONS")
+print(f"{'='*55}")
+
+tables, rapport_fidelite = {}, {}
+for cluster_id, res in shap_results.items():
+    X_c      = tranche_cluster(df, cluster_id, CLUSTER_COL)[features]
+    restant  = X_c.drop(index=res['X_sample'].index)
+    # Petit cluster : pas assez de lignes hors échantillon, on réutilise X_sample
+    hors_ech = len(restant) >= len(res['X_sample'])
+    X_table  = restant if hors_ech else X_c
+    X_table  = X_table.sample(min(N_LIGNES_TABLE, len(X_table)), random_state=42)
+    shap_tab = res['explainer'].shap_values(X_table)
+
+    tables[cluster_id] = construire_table(shap_tab, X_table, res['explainer'].expected_value,
+                                          trained_at=models[cluster_id].get('trained_at'))
+    rapport_fidelite[str(cluster_id)] = {
+        **fidelite(tables[cluster_id], res['explainer'], res['X_sample']),
+        'table_rows':     len(X_table),
+        'out_of_sample':  hors_ech,
+    }
+    r = rapport_fidelite[str(cluster_id)]
+    print(f"  Cluster {cluster_id} : top-{r['top_k']} commun {r['top_k_overlap']:.1%} | "
+          f"signe {r['sign_agreement']:.1%} | MAE {r['mae']:.4f} | "
+          f"{r['approx_us_per_row']:.1f} µs/ligne contre {r['exact_ms_per_row']:.2f} ms exact")
+
+sauvegarder_tables(tables)
+with open(FIDELITY_PATH, 'w') as f:
+    json.dump(rapport_fidelite, f, indent=2)
+print(f"  💾 Tables → {REASON_CODES_PATH}")
+print(f"  💾 Fidélité → {FIDELITY_PATH}")
+
 # ============================================
 # 3. EXPLICATION D'UN CLIENT SPÉCIFIQUE
 # ============================================
@@ -0,0 +1,198 @@
+"""
+Stabilité des segments HDBSCAN par rééchantillonnage.
+
+    python stability.py --runs 50 --fraction 0.8 --workers 8
+
+Les données de cleaned_data_with_clusters.csv sont projetées une seule fois
+avec le scaler et la PCA enregistrés par hdbscan.py. Chaque run tire un
+sous-échantillon sans remise (les doublons d'un vrai bootstrap faussent les
+densités de HDBSCAN), le clusterise avec PARAMS_HDBSCAN et réassigne les
+outliers comme hdbscan.py. Les runs sont répartis sur un pool de processus.
+
+Chaque run est apparié aux segments de référence (colonne Cluster) par
+affectation hongroise sur la matrice de Jaccard. On en tire :
+  - par cluster : Jaccard moyen / min / écart-type, part des runs > 0.75
+    (stable) et < 0.5 (dissous)
+  - par client  : confiance = part des runs où il était tiré et où son
+    cluster apparié est son cluster de référence
+
+Un run où HDBSCAN ne trouve aucun cluster (que des outliers) n'est pas
+apparié : il compte Jaccard 0 pour chaque cluster de référence, aucun
+client n'y est en accord, et il est listé dans le rapport.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from scipy.optimize import linear_sum_assignment
+
+from clustering import (FEATURES_CLUSTERING, charger_transformation, clusteriser,
+                        projeter_pca, reassigner_outliers)
+from schema import lire_csv
+
+BASE_DIR        = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_PATH       = os.path.join(BASE_DIR, 'data', 'cleaned_data_with_clusters.csv')
+REPORT_PATH     = os.path.join(BASE_DIR, 'results', 'cluster_stability.json')
+CONFIDENCE_PATH = os.path.join(BASE_DIR, 'results', 'cluster_confidence.csv')
+CLUSTER_COL     = 'Cluster'
+
+PARAMS_STABILITE = {'runs': 30, 'fraction': 0.8, 'seed': 42}
+SEUIL_STABLE     = 0.75
+SEUIL_DISSOUS    = 0.5
+
+# ============================================
+# 1. RUNS (WORKERS)
+# ============================================
+# Projection PCA, copiée une fois par worker (initializer du pool)
+_donnees = {}
+
+
+def _init_worker(X_pca):
+    _donnees['X_pca'] = X_pca
+
+
+def _run(args):
+    """
+    Un run : sous-échantillon, HDBSCAN, réassignation des outliers.
+    Retourne (idx, labels, nombre de clusters HDBSCAN avant réassignation).
+    """
+    seed, fraction = args
+    X_pca = _donnees['X_pca']
+    rng   = np.random.default_rng(seed)
+    idx   = np.sort(rng.choice(len(X_pca), int(fraction * len(X_pca)), replace=False))
+    bruts = clusteriser(X_pca[idx])
+    return idx, reassigner_outliers(X_pca[idx], bruts), len(set(bruts.tolist()) - {-1})
+
+# ============================================
+# 2. APPARIEMENT ET AGRÉGATION
+# ============================================
+def jaccard(ref, run, k):
+    """Matrice de Jaccard (k clusters de référence × clusters du run) à partir de codes 0..k-1."""
+    l = run.max() + 1
+    inter = np.bincount(ref * l + run, minlength=k * l).reshape(k, l).astype(np.float64)
+    union = inter.sum(axis=1)[:, None] + inter.sum(axis=0)[None, :] - inter
+    return inter / union
+
+
+def apparier(ref_codes, labels, k):
+    """
+    Apparie les clusters d'un run aux clusters de référence (Jaccard maximal).
+    Retourne (jaccard par cluster de référence, code de référence de chaque ligne ou -1).
+    """
+    ids_run, run_codes = np.unique(labels, return_inverse=True)
+    J = jaccard(ref_codes, run_codes, k)
+    lignes, colonnes = linear_sum_assignment(-J)
+    par_cluster = np.zeros(k)
+    par_cluster[lignes] = J[lignes, colonnes]
+    correspondance = np.full(len(ids_run), -1)
+    correspondance[colonnes] = lignes
+    return par_cluster, correspondance[run_codes]
+
+
+def analyser(X_pca, reference, runs=None, fraction=None, seed=None, workers=None):
+    cfg = {**PARAMS_STABILITE, **{k: v for k, v in
+                                  {'runs': runs, 'fraction': fraction, 'seed': seed}.items()
+                                  if v is not None}}
+    ids_ref, ref_codes = np.unique(reference, return_inverse=True)
+    graines = np.random.SeedSequence(cfg['seed']).generate_state(cfg['runs'])
+
+    jaccards = np.zeros((cfg['runs'], len(ids_ref)))
+    accords  = np.zeros(len(reference))
+    tirages  = np.zeros(len(reference))
+    n_clusters_runs = []
+    t0 = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), initializer=_init_worker,
+                             initargs=(X_pca,)) as pool:
+        taches = [(int(g), cfg['fraction']) for g in graines]
+        for r, (idx, labels, n_clusters) in enumerate(pool.map(_run, taches)):
+            n_clusters_runs.append(n_clusters)
+            tirages[idx] += 1
+            if n_clusters == 0:
+                # Que des outliers : pas de cluster à apparier, Jaccard 0 partout
+                print(f"   run {r + 1:>3}/{cfg['runs']} : ⚠️  aucun cluster (que des outliers)",
+                      flush=True)
+                continue
+            jaccards[r], apparies = apparier(ref_codes[idx], labels, len(ids_ref))
+            accords[idx] += apparies == ref_codes[idx]
+            print(f"   run {r + 1:>3}/{cfg['runs']} : Jaccard "
+                  + " | ".join(f"C{c} {j:.2f}" for c, j in zip(ids_ref, jaccards[r])), flush=True)
+
+    confiance = np.divide(accords, tirages, out=np.full(len(reference), np.nan), where=tirages > 0)
+    clusters = {}
+    for k, cid in enumerate(ids_ref):
+        j = jaccards[:, k]
+        membres = ref_codes == k
+        clusters[str(int(cid))] = {
+            'size':            int(membres.sum()),
+            'jaccard_mean':    round(float(j.mean()), 4),
+            'jaccard_min':     round(float(j.min()), 4),
+            'jaccard_std':     round(float(j.std()), 4),
+            'share_stable':    round(float(np.mean(j > SEUIL_STABLE)), 4),
+            'share_dissolved': round(float(np.mean(j < SEUIL_DISSOUS)), 4),
+            'row_confidence_mean': round(float(np.nanmean(confiance[membres])), 4),
+            'rows_low_confidence': int(np.sum(confiance[membres] < SEUIL_DISSOUS)),
+        }
+    rapport = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'config':     {**cfg, 'n_rows': len(reference)},
+        'duration_s': round(time.perf_counter() - t0, 3),
+        'runs_without_clusters': [r for r, n in enumerate(n_clusters_runs) if n == 0],
+        'n_clusters_per_run':    n_clusters_runs,
+        'clusters':   clusters,
+    }
+    return rapport, confiance, tirages
+
+# ============================================
+# 3. MAIN
+# ============================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stabilité des clusters HDBSCAN par rééchantillonnage")
+    parser.add_argument('--runs', type=int, default=PARAMS_STABILITE['runs'])
+    parser.add_argument('--fraction', type=float, default=PARAMS_STABILITE['fraction'],
+                        help="part des lignes tirées par run (sans remise)")
+    parser.add_argument('--seed', type=int, default=PARAMS_STABILITE['seed'])
+    parser.add_argument('--workers', type=int, help="processus (défaut : nombre de cœurs)")
+    args = parser.parse_args(argv)
+
+    df = lire_csv(DATA_PATH)
+    X  = df[FEATURES_CLUSTERING].astype(np.float64)
+    transformation = charger_transformation()
+    if transformation is None:
+        print("⚠️  Scaler/PCA absents (relancer hdbscan.py) — réajustés sur les données")
+        _, _, X_pca = projeter_pca(X)
+    else:
+        scaler, pca = transformation
+        X_pca = pca.transform(scaler.transform(X))
+    print(f"🚀 {args.runs} runs sur {args.fraction:.0%} de {len(df)} clients")
+
+    rapport, confiance, tirages = analyser(X_pca, df[CLUSTER_COL].to_numpy(), args.runs,
+                                           args.fraction, args.seed, args.workers)
+
+    if rapport['runs_without_clusters']:
+        print(f"\n⚠️  {len(rapport['runs_without_clusters'])} run(s) sans cluster, "
+              f"comptés Jaccard 0 : {rapport['runs_without_clusters']}")
+    print(f"\n  {'Cluster':<9} {'Taille':<8} {'Jaccard':<9} {'Min':<7} {'Stable':<8} "
+          f"{'Dissous':<9} {'Confiance'}")
+    for cid, c in rapport['clusters'].items():
+        print(f"  {cid:<9} {c['size']:<8} {c['jaccard_mean']:<9.3f} {c['jaccard_min']:<7.3f} "
+              f"{c['share_stable']:<8.0%} {c['share_dissolved']:<9.0%} {c['row_confidence_mean']:.3f}")
+
+    os.makedirs(os.path.dirname(REPORT_PATH), exist_ok=True)
+    with open(REPORT_PATH, 'w') as f:
+        json.dump(rapport, f, indent=2)
+    pd.DataFrame({'row': np.arange(len(df)), CLUSTER_COL: df[CLUSTER_COL].to_numpy(),
+                  'confidence': confiance.round(4), 'runs_sampled': tirages.astype(int)}
+                 ).to_csv(CONFIDENCE_PATH, index=False)
+    print(f"\n✅ Rapport → {REPORT_PATH}")
+    print(f"✅ Confiance par client → {CONFIDENCE_PATH}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
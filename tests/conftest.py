@@ -0,0 +1,32 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from features import RAW_FEATURES, deriver_features
+
+
+def donnees_synthetiques(n=400, seed=0):
+    """Clients synthétiques (colonnes brutes + dérivées), deux groupes de LIMIT_BAL, et DEFAULT."""
+    rng = np.random.default_rng(seed)
+    groupe = rng.integers(0, 2, n)
+    df = pd.DataFrame({
+        'LIMIT_BAL': np.where(groupe == 0, 50000, 400000) + rng.normal(0, 10000, n).round(),
+        'SEX':       rng.integers(1, 3, n),
+        'EDUCATION': rng.integers(1, 5, n),
+        'MARRIAGE':  rng.integers(1, 4, n),
+        'AGE':       rng.integers(21, 70, n),
+    })
+    for c in ['PAY_0', 'PAY_2', 'PAY_3', 'PAY_4', 'PAY_5', 'PAY_6']:
+        df[c] = rng.integers(-1, 3, n)
+    for i in range(1, 7):
+        df[f'BILL_AMT{i}'] = rng.normal(40000, 15000, n).round()
+        df[f'PAY_AMT{i}']  = rng.exponential(3000, n).round()
+    df = deriver_features(df[RAW_FEATURES].copy())
+    df['DEFAULT'] = (df['PAY_0'] + rng.normal(0, 1, n) > 1).astype(int)
+    df['Cluster'] = groupe
+    return df
@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import GradientBoostingClassifier
+from sklearn.naive_bayes import GaussianNB
+
+import app
+import traffic
+from clustering import FEATURES_CLUSTERING, modele_appartenance, projeter_pca
+from features import RAW_FEATURES
+from reason_codes import construire_table
+from thresholds import BANDES_DEFAUT
+
+from conftest import donnees_synthetiques
+
+
+@pytest.fixture
+def artefacts(tmp_path, monkeypatch):
+    """Artefacts en mémoire (deux clusters, modèle d'appartenance, tables de codes raisons)."""
+    df = donnees_synthetiques()
+    features = [c for c in df.columns if c not in app.EXCLUDE_COLS]
+    scaler, pca, X_pca = projeter_pca(df[FEATURES_CLUSTERING].to_numpy(dtype=np.float64))
+    labels = df['Cluster'].to_numpy()
+
+    models, tables = {}, {}
+    for cid in (0, 1):
+        part = df[labels == cid]
+        gb = GradientBoostingClassifier(n_estimators=10, random_state=0).fit(
+            part[features], part['DEFAULT'])
+        nb = GaussianNB().fit(part[features], part['DEFAULT'])
+        models[cid] = {'gradient_boosting': gb, 'naive_bayes': nb, 'calibrator': None}
+        tables[cid] = construire_table(np.zeros((len(part), len(features))), part[features], 0.0)
+    groupes = df.groupby('Cluster')
+
+    monkeypatch.setattr(app, 'models', models)
+    monkeypatch.setattr(app, 'df', df)
+    monkeypatch.setattr(app, 'features', features)
+    monkeypatch.setattr(app, 'centroids', dict(zip((0, 1), groupes[features].mean().to_numpy())))
+    monkeypatch.setattr(app, 'cluster_stats', {cid: {'size': int(n)} for cid, n in groupes.size().items()})
+    monkeypatch.setattr(app, 'decisions', {cid: (0.3, BANDES_DEFAUT) for cid in models})
+    monkeypatch.setattr(app, 'appartenance', modele_appartenance(X_pca, labels, scaler, pca))
+    monkeypatch.setattr(app, 'tables_raisons', tables)
+    monkeypatch.setattr(app, 'moniteur', None)
+    monkeypatch.setattr(app, 'backend_onnx', None)
+    monkeypatch.setattr(app, 'HISTORY_PATH', str(tmp_path / 'history.json'))
+    monkeypatch.setattr(traffic, 'enregistrer', lambda *args: None)
+    return df
+
+
+def payload(ligne):
+    return {c.lower(): float(ligne[c]) for c in RAW_FEATURES}
+
+
+def test_predict_avec_appartenance(artefacts):
+    with app.app.test_client() as client:
+        for _, ligne in artefacts.head(20).iterrows():
+            corps = client.post('/predict', json=payload(ligne)).get_json()
+            assert corps['success'], corps.get('error')
+            assert isinstance(corps['decision'], bool)
+            assert corps['membership'] is not None
+            assert corps['cluster'] in (0, 1)
+
+
+def test_warmup_chauffe_les_clusters_non_routes(artefacts, monkeypatch):
+    # Tout centroïde est routé vers le cluster 0 : le cluster 1 doit être chauffé directement
+    monkeypatch.setattr(app, 'appartenance_client', lambda client_dict: {0: 1.0})
+    monkeypatch.setattr(app, '_dashboard', app.http_cache.precompresser(b'<html/>', 'text/html', 0))
+    monkeypatch.setattr(app, 'WARMUP', {'status': 'pending', 'attempts': 0, 'clusters': {}})
+    appels = []
+    probas_cluster = app.probas_cluster
+    monkeypatch.setattr(app, 'probas_cluster',
+                        lambda cid, *args: appels.append(int(cid)) or probas_cluster(cid, *args))
+    try:
+        assert app.warmup()
+    finally:
+        app._warmup_termine.clear()
+    assert 1 in appels
+    assert app.WARMUP['clusters']['1'] == {**app.WARMUP['clusters']['1'],
+                                           'cluster': 0, 'direct': True}
+
+
+def test_admin_profil_tri_invalide(tmp_path, monkeypatch):
+    import cProfile
+    import profiling
+    monkeypatch.setattr(profiling, 'ADMIN_TOKEN', 'jeton')
+    monkeypatch.setattr(profiling, 'PROFILES_PATH', str(tmp_path))
+    profiler = cProfile.Profile()
+    profiler.runcall(sum, range(10))
+    profiler.dump_stats(str(tmp_path / 'essai.prof'))
+
+    with app.app.test_client() as client:
+        url = '/admin/profiles/essai.prof?format=txt&sort='
+        entetes = {profiling.ADMIN_HEADER: 'jeton'}
+        reponse = client.get(url + 'inconnu', headers=entetes)
+        assert reponse.status_code == 400
+        assert 'cumulative' in reponse.get_json()['valid_sorts']
+        assert client.get(url + 'tottime', headers=entetes).status_code == 200
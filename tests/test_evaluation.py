@@ -0,0 +1,26 @@
+import numpy as np
+
+from calibrators import calibrer_hors_pli
+from evaluation import rapport_evaluation, resume_holdout
+from thresholds import optimiser_decision
+
+
+def test_rapport_contient_les_metriques_brutes_et_calibrees():
+    rng = np.random.default_rng(0)
+    models = {}
+    for cid in (0, 1):
+        y = rng.integers(0, 2, 2000)
+        brut = np.clip(0.3 + 0.3 * y + rng.normal(0, 0.2, len(y)), 0, 1)
+        calibrateur, calibre = calibrer_hors_pli(y, brut)
+        models[cid] = {'holdout': {'y': y, 'proba_gb': calibre, 'proba_gb_raw': brut,
+                                   'proba_nb': brut},
+                       'decision': optimiser_decision(y, calibre), 'calibrator': calibrateur}
+    rapport = rapport_evaluation(models)
+
+    for r in [*rapport['clusters'].values(), rapport['aggregate']['pooled']]:
+        gb = r['gradient_boosting']
+        assert {'auc_roc_raw', 'auc_pr_raw', 'brier_raw'} <= set(gb)
+        assert abs(gb['auc_roc'] - gb['auc_roc_raw']) < 0.02
+    assert 'auc_roc_raw' in rapport['aggregate']['weighted']['gradient_boosting']
+    resume = resume_holdout(rapport['clusters']['0'])
+    assert resume['auc_roc_raw'] == rapport['clusters']['0']['gradient_boosting']['auc_roc_raw']
@@ -0,0 +1,61 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+pytest.importorskip('skl2onnx')
+pytest.importorskip('onnxruntime')
+
+from sklearn.ensemble import GradientBoostingClassifier
+from sklearn.naive_bayes import GaussianNB
+
+import onnx_scoring
+from features import RAW_FEATURES
+from onnx_scoring import BackendONNX, exporter_onnx
+
+from conftest import donnees_synthetiques
+
+
+@pytest.fixture(scope='module')
+def modeles():
+    df = donnees_synthetiques()
+    features = [c for c in df.columns if c not in ('Cluster', 'DEFAULT')]
+    return df, {0: {'gradient_boosting': GradientBoostingClassifier(n_estimators=5).fit(
+                        df[features], df['DEFAULT']),
+                    'naive_bayes': GaussianNB().fit(df[features], df['DEFAULT']),
+                    'feature_names': features}}
+
+
+def test_publication_versionnee(tmp_path, modeles):
+    df, models = modeles
+    for _ in range(3):
+        index = exporter_onnx(models, str(tmp_path), verifier=False)
+    with open(tmp_path / 'index.json') as f:
+        assert json.load(f)['version'] == index['version']
+    assert sorted(n for n in os.listdir(tmp_path) if n.startswith('v'))[-1] == index['version']
+    assert len([n for n in os.listdir(tmp_path) if n.startswith('v')]) == onnx_scoring.GARDER_VERSIONS
+
+    proba_gb, _ = BackendONNX(str(tmp_path)).predire(0, df[RAW_FEATURES].to_numpy(np.float32))
+    attendu = models[0]['gradient_boosting'].predict_proba(df[models[0]['feature_names']])[:, 1]
+    assert np.abs(proba_gb - attendu).max() < 1e-4
+
+
+def test_export_interrompu_laisse_la_version_servie(tmp_path, modeles, monkeypatch):
+    _, models = modeles
+    servi = exporter_onnx(models, str(tmp_path), verifier=False)
+    convertir = onnx_scoring.convertir
+    appels = []
+
+    def convertir_puis_echouer(*args):
+        appels.append(1)
+        if len(appels) > 1:
+            raise RuntimeError('interruption')
+        return convertir(*args)
+    monkeypatch.setattr(onnx_scoring, 'convertir', convertir_puis_echouer)
+    with pytest.raises(RuntimeError):
+        exporter_onnx(models, str(tmp_path), verifier=False)
+
+    with open(tmp_path / 'index.json') as f:
+        assert json.load(f)['version'] == servi['version']
+    BackendONNX(str(tmp_path))
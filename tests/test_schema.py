@@ -0,0 +1,26 @@
+import numpy as np
+import pytest
+
+from schema import lire_csv
+
+
+def ecrire(tmp_path, limit_bal):
+    path = tmp_path / 'credit.csv'
+    path.write_text('ID,LIMIT_BAL,AGE\n' + ''.join(f'{i},{v},30\n' for i, v in enumerate(limit_bal)))
+    return path
+
+
+def test_lire_csv_convertit_en_float32(tmp_path):
+    df = lire_csv(ecrire(tmp_path, ['20000', '150000.5']))
+    assert df['LIMIT_BAL'].dtype == np.float32
+    assert df['AGE'].dtype == np.int8
+
+
+@pytest.mark.parametrize('valeur, message', [
+    ('16777217', '2\\*\\*24'),   # arrondi à 16777216 en float32
+    ('1e39', 'hors de float32'),  # inf en float32
+    ('inf', 'infinie'),
+])
+def test_lire_csv_verifie_les_montants(tmp_path, valeur, message):
+    with pytest.raises(ValueError, match=message):
+        lire_csv(ecrire(tmp_path, ['20000', valeur]))
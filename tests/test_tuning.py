@@ -0,0 +1,20 @@
+import numpy as np
+
+from tuning import rechercher_hyperparametres
+
+from conftest import donnees_synthetiques
+
+CONFIG = {'n_candidates': 3, 'min_resource': 5, 'max_resource': 15}
+
+
+def test_recherche_avec_poids_d_appartenance():
+    df = donnees_synthetiques()
+    X, y = df.drop(columns=['Cluster', 'DEFAULT']), df['DEFAULT']
+    poids = np.where(df['Cluster'] == 0, 1.0, 0.05)
+
+    uniformes, _ = rechercher_hyperparametres(X, y, 'class_weight', workers=1, config=CONFIG)
+    params, journal = rechercher_hyperparametres(X, y, 'class_weight', workers=1, config=CONFIG,
+                                                 poids=poids)
+    assert journal['membership_weights']
+    assert set(params) == set(uniformes)
+    assert 0.0 <= journal['best_auc'] <= 1.0
@@ -0,0 +1,117 @@
+"""
+Seuils de décision et bandes de risque par cluster.
+
+À l'entraînement, les courbes ROC et précision-rappel d'un cluster sont
+calculées en une passe (tri des probabilités held-out + sommes cumulées),
+puis on retient :
+  - le seuil de décision qui minimise le coût attendu sous la matrice COUTS
+    (un défaut manqué coûte COUTS['fn'], une fausse alerte COUTS['fp']) ;
+  - des bandes de risque propres au cluster : ÉLEVÉ dès que la précision
+    atteint BANDES['precision_eleve'], MODÉRÉ au seuil optimal, FAIBLE tant
+    que le rappel cumulé n'a pas atteint BANDES['recall_faible'].
+
+Le résultat est stocké dans le bundle (clé 'decision') ; au scoring, seuil
+et bandes se lisent en O(1) par cluster.
+"""
+import numpy as np
+
+# Bandes globales historiques (/predict, afficher_resultat), utilisées à défaut
+BANDES_DEFAUT = [(0.7, 'ÉLEVÉ'), (0.35, 'MODÉRÉ'), (0.2, 'FAIBLE')]
+NIVEAU_BAS    = 'TRÈS FAIBLE'
+SEUIL_DEFAUT  = 0.3
+
+COUTS  = {'fn': 5.0, 'fp': 1.0}
+BANDES = {'precision_eleve': 0.7, 'recall_faible': 0.9}
+
+# ============================================
+# 1. COURBES EN UNE PASSE
+# ============================================
+def courbes(y_true, proba):
+    """
+    Pour chaque seuil distinct (décroissant), effectifs et taux de la règle
+    « défaut si proba >= seuil ». Le premier point (seuil au-dessus du max)
+    correspond à « aucun défaut prédit ».
+    """
+    y_true = np.asarray(y_true).astype(np.int64)
+    proba  = np.asarray(proba, dtype=np.float64)
+    ordre  = np.argsort(-proba, kind='mergesort')
+    p, yy  = proba[ordre], y_true[ordre]
+
+    # Dernière position de chaque valeur distincte de proba
+    fin = np.r_[np.flatnonzero(np.diff(p)), len(p) - 1]
+    tp  = np.r_[0, np.cumsum(yy)[fin]]
+    fp  = np.r_[0, (fin + 1) - tp[1:]]
+    seuils = np.r_[np.nextafter(p[0], np.inf), p[fin]]
+
+    P, N = int(yy.sum()), int(len(yy) - yy.sum())
+    with np.errstate(divide='ignore', invalid='ignore'):
+        precision = np.where(tp + fp > 0, tp / (tp + fp), 1.0)
+        recall    = tp / P if P else np.zeros_like(tp, dtype=float)
+        fpr       = fp / N if N else np.zeros_like(fp, dtype=float)
+    return {'thresholds': seuils, 'tp': tp, 'fp': fp, 'fn': P - tp, 'tn': N - fp,
+            'precision': precision, 'recall': recall, 'tpr': recall, 'fpr': fpr,
+            'positives': P, 'negatives': N}
+
+
+def auc_roc(c):
+    return float(np.sum(np.diff(c['fpr']) * (c['tpr'][1:] + c['tpr'][:-1]) / 2))
+
+
+def auc_pr(c):
+    """Average precision : Σ (R_i − R_{i−1}) · P_i."""
+    return float(np.sum(np.diff(c['recall']) * c['precision'][1:]))
+
+# ============================================
+# 2. SEUIL OPTIMAL ET BANDES
+# ============================================
+def optimiser_decision(y_true, proba, couts=None, bandes=None):
+    couts  = {**COUTS, **(couts or {})}
+    bandes = {**BANDES, **(bandes or {})}
+    c = courbes(y_true, proba)
+
+    cout = couts['fn'] * c['fn'] + couts['fp'] * c['fp']
+    i    = int(np.argmin(cout))
+    seuil = float(min(c['thresholds'][i], 1.0))
+
+    # ÉLEVÉ : plus petit seuil dont la précision atteint la cible (sinon bande historique)
+    ok = np.flatnonzero(c['precision'][1:] >= bandes['precision_eleve'])
+    s_eleve = float(c['thresholds'][1:][ok[-1]]) if ok.size else BANDES_DEFAUT[0][0]
+    # FAIBLE : seuil où le rappel atteint la cible
+    ok = np.flatnonzero(c['recall'] >= bandes['recall_faible'])
+    s_faible = float(c['thresholds'][ok[0]]) if ok.size else BANDES_DEFAUT[2][0]
+
+    s_eleve  = max(s_eleve, seuil)
+    s_faible = min(s_faible, seuil)
+    return {
+        'threshold':     round(seuil, 6),
+        'bands':         [[round(s_eleve, 6), 'ÉLEVÉ'], [round(seuil, 6), 'MODÉRÉ'],
+                          [round(s_faible, 6), 'FAIBLE']],
+        'costs':         couts,
+        'band_targets':  bandes,
+        'expected_cost': round(float(cout[i]) / max(c['positives'] + c['negatives'], 1), 6),
+        'recall':        round(float(c['recall'][i]), 4),
+        'precision':     round(float(c['precision'][i]), 4),
+    }
+
+# ============================================
+# 3. SCORING : LECTURE O(1)
+# ============================================
+def decision_cluster(bundle):
+    """(seuil, bandes) d'un cluster, ou les valeurs historiques si le bundle n'en a pas."""
+    d = bundle.get('decision') if bundle else None
+    if not d:
+        return SEUIL_DEFAUT, BANDES_DEFAUT
+    return d['threshold'], [tuple(b) for b in d['bands']]
+
+
+def niveau_risque(proba, bandes=BANDES_DEFAUT):
+    for seuil, niveau in bandes:
+        if proba >= seuil:
+            return niveau
+    return NIVEAU_BAS
+
+
+def niveaux_risque(proba, bandes=BANDES_DEFAUT):
+    """Version vectorisée de niveau_risque."""
+    proba = np.asarray(proba)
+    return np.select([proba >= s for s, _ in bandes], [n for _, n in bandes], default=NIVEAU_BAS)
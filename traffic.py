@@ -0,0 +1,196 @@
+"""
+Compteurs de trafic /predict : clusters assignés, niveaux de risque et
+déciles de proba_gb.
+
+Chemin critique quasi sans contention : N_SLOTS lignes de compteurs fixes,
+chaque thread écrit dans la ligne get_ident() % N_SLOTS sous le verrou de
+cette ligne ; la mémoire et le coût d'une lecture ne dépendent pas du nombre
+de threads (le serveur de dev en crée un par requête). Chaque worker écrit
+périodiquement (FLUSH_S) son total dans TRAFFIC_PATH (un fichier .npy par
+worker, remplacé atomiquement) ; agreger() additionne l'état courant du
+processus et les fichiers des autres workers. Les fichiers de workers
+terminés (PID absent, même machine) sont versés dans archive.npy puis
+supprimés. L'historique des prédictions n'est jamais relu. Supprimer
+TRAFFIC_PATH remet les compteurs à zéro au prochain démarrage.
+"""
+import atexit
+import os
+import re
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:   # Windows : pas de versement des workers terminés
+    fcntl = None
+
+BASE_DIR     = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TRAFFIC_PATH = os.environ.get('TRAFFIC_PATH', os.path.join(BASE_DIR, 'results', 'traffic'))
+FLUSH_S      = float(os.environ.get('TRAFFIC_FLUSH_S', '5'))
+
+# Disposition fixe du vecteur de compteurs (identique pour tous les workers)
+MAX_CLUSTERS = 64                     # clusters 0..63, au-delà : case « autre »
+NIVEAUX      = ['ÉLEVÉ', 'MODÉRÉ', 'FAIBLE', 'TRÈS FAIBLE']
+N_DECILES    = 10
+
+DEBUT_NIVEAUX = MAX_CLUSTERS + 1
+DEBUT_DECILES = DEBUT_NIVEAUX + len(NIVEAUX)
+TAILLE        = DEBUT_DECILES + N_DECILES
+POSITION_NIVEAU = {n: DEBUT_NIVEAUX + i for i, n in enumerate(NIVEAUX)}
+
+N_SLOTS    = 31                       # premier : get_ident() (adresses alignées) bien réparti
+_compteurs = np.zeros((N_SLOTS, TAILLE), dtype=np.int64)
+_verrous   = [threading.Lock() for _ in range(N_SLOTS)]
+_compte    = False                    # au moins une prédiction comptée dans ce processus
+_verrou    = threading.Lock()         # flush uniquement
+_fichier   = None
+_pid       = None
+_dernier_flush = time.monotonic()
+
+ARCHIVE      = 'archive.npy'          # cumul des workers terminés
+NOM_WORKER   = re.compile(r'^worker_(\d+)_\d+\.npy$')
+
+
+def _chemin():
+    """Fichier du worker courant (recalculé après un fork, ex. gunicorn --preload)."""
+    global _fichier, _pid
+    if _pid != os.getpid():
+        _pid     = os.getpid()
+        _fichier = os.path.join(TRAFFIC_PATH, f"worker_{_pid}_{int(time.time())}.npy")
+    return _fichier
+
+# ============================================
+# 1. COMPTAGE (SLOTS FIXES)
+# ============================================
+def enregistrer(cluster_id, risk_level, proba):
+    """Compte une prédiction ; flush du worker au plus toutes les FLUSH_S secondes."""
+    global _compte
+    slot = threading.get_ident() % N_SLOTS
+    cid  = int(cluster_id)
+    with _verrous[slot]:
+        v = _compteurs[slot]
+        v[cid if 0 <= cid < MAX_CLUSTERS else MAX_CLUSTERS] += 1
+        v[POSITION_NIVEAU[risk_level]] += 1
+        v[DEBUT_DECILES + min(int(proba * N_DECILES), N_DECILES - 1)] += 1
+    _compte = True
+    if time.monotonic() - _dernier_flush >= FLUSH_S:
+        flush()
+
+
+def total_processus():
+    # Lecture sans verrou : un incrément concurrent peut manquer, il sera vu au prochain appel
+    return _compteurs.sum(axis=0)
+
+# ============================================
+# 2. PARTAGE ENTRE WORKERS
+# ============================================
+def flush():
+    """Écrit le total du processus dans son fichier (remplacement atomique)."""
+    global _dernier_flush
+    if not _compte or not _verrou.acquire(blocking=False):
+        return
+    try:
+        _dernier_flush = time.monotonic()
+        os.makedirs(TRAFFIC_PATH, exist_ok=True)
+        path = _chemin()
+        tmp  = path + '.tmp'
+        with open(tmp, 'wb') as f:
+            np.save(f, total_processus())
+        os.replace(tmp, path)
+    finally:
+        _verrou.release()
+
+
+atexit.register(flush)
+
+
+def _vivant(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:   # processus d'un autre utilisateur : vivant
+        return True
+    return True
+
+
+def _charger(path):
+    try:
+        v = np.load(path)
+    except (OSError, ValueError):
+        return None
+    return v if v.shape == (TAILLE,) else None
+
+
+def archiver_workers_termines():
+    """Verse les fichiers des workers terminés dans archive.npy puis les supprime."""
+    if fcntl is None or not os.path.isdir(TRAFFIC_PATH):
+        return
+    morts = [nom for nom in os.listdir(TRAFFIC_PATH)
+             if (m := NOM_WORKER.match(nom)) and int(m.group(1)) != os.getpid()
+             and not _vivant(int(m.group(1)))]
+    if not morts:
+        return
+    # Verrou fichier : deux workers ne versent pas le même fichier deux fois
+    with open(os.path.join(TRAFFIC_PATH, '.archive.lock'), 'w') as verrou:
+        fcntl.flock(verrou, fcntl.LOCK_EX)
+        chemin_archive = os.path.join(TRAFFIC_PATH, ARCHIVE)
+        archive = _charger(chemin_archive)
+        archive = np.zeros(TAILLE, dtype=np.int64) if archive is None else archive
+        verses  = []
+        for nom in morts:
+            path = os.path.join(TRAFFIC_PATH, nom)
+            v = _charger(path) if os.path.exists(path) else None
+            if v is not None:
+                archive += v
+                verses.append(path)
+        tmp = chemin_archive + '.tmp'
+        with open(tmp, 'wb') as f:
+            np.save(f, archive)
+        os.replace(tmp, chemin_archive)
+        for path in verses:
+            os.remove(path)
+
+
+def agreger():
+    """Somme des compteurs : processus courant (à jour) + derniers flush des autres workers."""
+    archiver_workers_termines()
+    total, workers = total_processus().copy(), 1
+    propre = _chemin()
+    if os.path.isdir(TRAFFIC_PATH):
+        for nom in os.listdir(TRAFFIC_PATH):
+            path = os.path.join(TRAFFIC_PATH, nom)
+            if not nom.endswith('.npy') or path == propre:
+                continue
+            v = _charger(path)
+            if v is not None:
+                total += v
+                workers += nom != ARCHIVE
+    return total, workers
+
+
+def rapport():
+    total, workers = agreger()
+    n = int(total[:DEBUT_NIVEAUX].sum())
+
+    def part(c):
+        return round(100 * int(c) / n, 1) if n else 0.0
+
+    clusters = {str(cid): {'count': int(c), 'share': part(c)}
+                for cid, c in enumerate(total[:MAX_CLUSTERS]) if c}
+    if total[MAX_CLUSTERS]:
+        clusters['other'] = {'count': int(total[MAX_CLUSTERS]), 'share': part(total[MAX_CLUSTERS])}
+    deciles = total[DEBUT_DECILES:]
+    return {
+        'total':         n,
+        'workers':       workers,
+        'clusters':      clusters,
+        'risk_levels':   {niv: {'count': int(total[POSITION_NIVEAU[niv]]),
+                                'share': part(total[POSITION_NIVEAU[niv]])} for niv in NIVEAUX},
+        'proba_deciles': [{'lower': i / N_DECILES, 'upper': (i + 1) / N_DECILES,
+                           'count': int(c), 'share': part(c)} for i, c in enumerate(deciles)],
+        'generated_at':  datetime.now().isoformat(timespec='seconds'),
+    }
@@ -4,11 +4,27 @@ from sklearn.ensemble import GradientBoostingClassifier
 from sklearn.naive_bayes import GaussianNB
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import classification_report, confusion_matrix, roc_auc_score
-from imblearn.over_sampling import SMOTE
 import matplotlib.pyplot as plt
 import seaborn as sns
 import pickle
 import os
+import time
+import json
+import hashlib
+import argparse
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+from feature_store import FeatureStore
+from cluster_index import trier_par_cluster, tranche_cluster, offsets_clusters
+from clustering import MEMBERSHIP_PATH
+from schema import appliquer_schema, medianes
+from resampling import MODES, PARAMS_SMOTE, reequilibrer
+from tuning import ESPACE_GB, PARAMS_RECHERCHE, rechercher_hyperparametres
+from thresholds import COUTS, optimiser_decision
+from calibrators import METHODES as METHODES_CALIBRATION, calibrer_hors_pli, resume
+from evaluation import rapport_evaluation, resume_holdout
+from drift import BASELINE_PATH, construire_references, sauvegarder_references
 
 # ============================================
 # 1. CHARGEMENT DES DONNÉES
@@ -16,23 +32,54 @@ import os
 BASE_DIR     = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATA_PATH    = os.path.join(BASE_DIR, 'data', 'cleaned_data_with_clusters.csv')
 RESULTS_PATH = os.path.join(BASE_DIR, 'results')
+MODELS_PATH  = os.path.join(RESULTS_PATH, 'models.pkl')
+MANIFEST_PATH = os.path.join(RESULTS_PATH, 'models_manifest.json')
+EVAL_PATH    = os.path.join(RESULTS_PATH, 'evaluation_report.json')
 os.makedirs(RESULTS_PATH, exist_ok=True)
 
-df = pd.read_csv(DATA_PATH)
-print(f"✅ Données chargées : {df.shape}")
-
-# ============================================
-# 2. NETTOYAGE DES NaN
-# ============================================
-nan_count = df.isnull().sum().sum()
-print(f"⚠️  Valeurs NaN détectées : {nan_count}")
-
-if nan_count > 0:
-    df = df.fillna(df.median(numeric_only=True))
-    print(f"✅ NaN remplacés par la médiane")
-
-print(f"✅ Clusters présents : {sorted(df['Cluster'].unique())}")
-print(f"✅ Taille finale     : {df.shape}\n")
+def charger_donnees(path=DATA_PATH):
+    df = pd.read_csv(path)
+    print(f"✅ Données chargées : {df.shape}")
+
+    # ============================================
+    # 2. NETTOYAGE DES NaN
+    # ============================================
+    nan_count = df.isnull().sum().sum()
+    print(f"⚠️  Valeurs NaN détectées : {nan_count}")
+
+    if nan_count > 0:
+        df = df.fillna(medianes(df))
+        print(f"✅ NaN remplacés par la médiane")
+
+    # Schéma compact (int8 / float32), vérifié colonne par colonne
+    appliquer_schema(df)
+
+    # Tri par cluster : chaque cluster devient une tranche contiguë
+    df, offsets = trier_par_cluster(df, 'Cluster')
+    print(f"✅ Clusters présents : {list(offsets)}")
+    print(f"✅ Taille finale     : {df.shape}\n")
+    return df
+
+
+POIDS_MIN = 0.05   # plancher des poids d'appartenance (outliers réassignés, frontaliers)
+
+def charger_appartenances(df, path=MEMBERSHIP_PATH):
+    """
+    Poids d'appartenance souple de chaque client à son propre cluster, lus dans
+    data/cluster_membership.csv (mêmes lignes, même ordre que le dataset clusterisé).
+    Retourne {cluster_id: poids} aligné sur tranche_cluster(df, cluster_id).
+    """
+    m = pd.read_csv(path)
+    if len(m) != len(df) or not np.array_equal(m['Cluster'].to_numpy(), df[CLUSTER_COL].to_numpy()):
+        raise ValueError(f"{path} n'est pas aligné sur le dataset : relancer hdbscan.py")
+    colonnes = [c for c in m.columns if c.startswith('P_')]
+    ids      = np.array([int(c[2:]) for c in colonnes])
+    propre   = m[colonnes].to_numpy()[np.arange(len(m)),
+                                      np.searchsorted(ids, m['Cluster'].to_numpy())]
+    poids    = np.clip(propre, POIDS_MIN, 1.0)
+    print(f"✅ Poids d'appartenance : moyenne {poids.mean():.3f}, "
+          f"{(propre < 0.8).mean():.1%} de clients frontaliers")
+    return {cid: poids[d:f] for cid, (d, f) in offsets_clusters(df, CLUSTER_COL).items()}
 
 # ============================================
 # 2. CONFIGURATION
@@ -41,65 +88,119 @@ TARGET       = 'DEFAULT'
 CLUSTER_COL  = 'Cluster'
 EXCLUDE_COLS = [CLUSTER_COL, TARGET]
 
+PARAMS_SPLIT = {'test_size': 0.2, 'random_state': 42}
+PARAMS_GB    = {'n_estimators': 100, 'learning_rate': 0.1, 'max_depth': 3, 'random_state': 42}
+
 # ============================================
 # 3. FONCTION D'ENTRAÎNEMENT PAR CLUSTER
 # ============================================
-def train_cluster(df, cluster_id):
+def train_cluster(df, cluster_id, plots=True, mode='smote', tuning=None, couts=None, poids=None,
+                  calibration='auto'):
     print(f"\n{'='*55}")
     print(f"  CLUSTER {cluster_id}")
     print(f"{'='*55}")
 
     # --- Filtrage ---
-    df_c = df[df[CLUSTER_COL] == cluster_id].copy()
-    X = df_c.drop(columns=EXCLUDE_COLS)
-    y = df_c[TARGET]
-
-    print(f"  Taille         : {len(df_c)} clients")
+    X, y = donnees_cluster(df, cluster_id)
+    return entrainer_cluster(X, y, cluster_id, plots, mode, tuning, couts, poids, calibration)
+
+
+def donnees_cluster(df, cluster_id):
+    df_c = tranche_cluster(df, cluster_id, CLUSTER_COL)
+    return df_c.drop(columns=EXCLUDE_COLS), df_c[TARGET]
+
+
+def entrainer_cluster(X, y, cluster_id, plots=True, mode='smote', tuning=None, couts=None,
+                      poids=None, calibration='auto'):
+    """
+    Split, rééquilibrage (SMOTE en cache ou poids de classes), GB + NB sur (X, y) d'un cluster.
+    tuning = {'budget_s': ..., 'workers': ...} active la recherche d'hyperparamètres GB.
+    couts  = {'fn': ..., 'fp': ...} : matrice de coûts du seuil de décision (défaut COUTS).
+    poids  = appartenance souple de chaque ligne à ce cluster (charger_appartenances) :
+             multiplie les sample_weight ; les lignes synthétiques SMOTE pèsent 1.
+    calibration = méthode du calibrateur ajusté sur le held-out (calibrators.METHODES) ;
+             seuil, bandes et held-out conservé portent sur les probabilités calibrées
+             hors pli (jamais vues par le calibrateur qui les produit).
+    """
+    print(f"  Taille         : {len(X)} clients")
     print(f"  Taux de défaut : {y.mean():.2%}")
 
-    # --- Train / Test split ---
-    X_train, X_test, y_train, y_test = train_test_split(
-        X, y,
-        test_size=0.2,
-        random_state=42,
+    # --- Train / Test split --- (positions suivies pour les poids, split inchangé)
+    X_train, X_test, y_train, y_test, pos_train, _ = train_test_split(
+        X, y, np.arange(len(X)),
+        **PARAMS_SPLIT,
         stratify=y
     )
 
-    # --- SMOTE (rééquilibrage des classes) ---
-    smote = SMOTE(random_state=42)
-    X_train_res, y_train_res = smote.fit_resample(X_train, y_train)
-    print(f"  Après SMOTE    : {sum(y_train_res==1)} défauts | {sum(y_train_res==0)} non-défauts")
+    # --- Rééquilibrage des classes (SMOTE par défaut, résultat en cache) ---
+    t0 = time.perf_counter()
+    X_train_res, y_train_res, sample_weight, info = reequilibrer(X_train, y_train, mode)
+    timings = {'resample_s': round(time.perf_counter() - t0, 3)}
+    if mode == 'smote':
+        source = "cache" if info['cache_hit'] else "calculé"
+        print(f"  Après SMOTE    : {sum(y_train_res==1)} défauts | {sum(y_train_res==0)} non-défauts ({source})")
+    else:
+        print(f"  Poids de classes : défaut ×{sample_weight[np.asarray(y_train) == 1][0]:.2f}")
+
+    if poids is not None:
+        # SMOTE ajoute les lignes synthétiques après les lignes d'origine
+        w = np.ones(len(y_train_res))
+        w[:len(pos_train)] = np.asarray(poids)[pos_train]
+        sample_weight = w if sample_weight is None else sample_weight * w
+        print(f"  Poids d'appartenance : moyenne {w[:len(pos_train)].mean():.3f}")
 
     # ==========================================
     # GRADIENT BOOSTING
     # ==========================================
-    gb = GradientBoostingClassifier(
-        n_estimators=100,
-        learning_rate=0.1,
-        max_depth=3,
-        random_state=42
-    )
-    gb.fit(X_train_res, y_train_res)
+    params_gb, journal_tuning = dict(PARAMS_GB), None
+    if tuning:
+        print(f"  Recherche d'hyperparamètres (budget {tuning['budget_s']} s)...")
+        t0 = time.perf_counter()
+        meilleurs, journal_tuning = rechercher_hyperparametres(
+            X_train, y_train, mode, tuning['budget_s'], tuning.get('workers'),
+            poids=None if poids is None else np.asarray(poids)[pos_train])
+        timings['tune_s'] = round(time.perf_counter() - t0, 3)
+        params_gb.update(meilleurs)
+        print(f"  Retenus : {meilleurs} (AUC validation {journal_tuning['best_auc']:.4f})")
+
+    gb = GradientBoostingClassifier(**params_gb)
+    t0 = time.perf_counter()
+    gb.fit(X_train_res, y_train_res, sample_weight=sample_weight)
+    timings['fit_gb_s'] = round(time.perf_counter() - t0, 3)
 
     y_pred_gb  = gb.predict(X_test)
-    y_proba_gb = gb.predict_proba(X_test)[:, 1]
+    y_proba_gb_brut = gb.predict_proba(X_test)[:, 1]
 
     print(f"\n  --- Gradient Boosting ---")
     print(classification_report(y_test, y_pred_gb,
           target_names=['Non-défaut', 'Défaut']))
-    print(f"  AUC-ROC : {roc_auc_score(y_test, y_proba_gb):.4f}")
-
-    # Seuil ajusté à 0.3 pour améliorer le recall sur défaut
-    y_pred_gb_adj = (y_proba_gb >= 0.3).astype(int)
-    print(f"\n  --- Gradient Boosting (seuil=0.3) ---")
+    print(f"  AUC-ROC (brut, avant calibration) : {roc_auc_score(y_test, y_proba_gb_brut):.4f}")
+
+    # Calibration sur le held-out (les probabilités apprises sur données rééquilibrées
+    # surestiment le défaut) : table de points de rupture appliquée au scoring
+    calibrateur, y_proba_gb = calibrer_hors_pli(y_test, y_proba_gb_brut, calibration)
+    if calibrateur is not None:
+        print(f"  Calibration {calibrateur['method']} ({len(calibrateur['x'])} points) : "
+              f"proba moyenne {y_proba_gb_brut.mean():.3f} → {y_proba_gb.mean():.3f} "
+              f"(taux observé {np.mean(y_test):.3f}) ; "
+              f"AUC-ROC calibrée {roc_auc_score(y_test, y_proba_gb):.4f}")
+
+    # Seuil et bandes de risque minimisant le coût attendu sur le held-out
+    decision      = optimiser_decision(y_test, y_proba_gb, couts)
+    seuil         = decision['threshold']
+    y_pred_gb_adj = (y_proba_gb >= seuil).astype(int)
+    print(f"\n  --- Gradient Boosting (seuil optimal={seuil:.3f}) ---")
     print(classification_report(y_test, y_pred_gb_adj,
           target_names=['Non-défaut', 'Défaut']))
+    print(f"  Bandes : " + " | ".join(f"{n} ≥ {s:.3f}" for s, n in decision['bands']))
 
     # ==========================================
     # NAIVE BAYES (baseline)
     # ==========================================
     nb = GaussianNB()
-    nb.fit(X_train_res, y_train_res)
+    t0 = time.perf_counter()
+    nb.fit(X_train_res, y_train_res, sample_weight=sample_weight)
+    timings['fit_nb_s'] = round(time.perf_counter() - t0, 3)
 
     y_pred_nb  = nb.predict(X_test)
     y_proba_nb = nb.predict_proba(X_test)[:, 1]
@@ -109,6 +210,28 @@ def train_cluster(df, cluster_id):
           target_names=['Non-défaut', 'Défaut']))
     print(f"  AUC-ROC : {roc_auc_score(y_test, y_proba_nb):.4f}")
 
+    feature_names = list(X.columns)
+    result = {
+        'gradient_boosting': gb,
+        'naive_bayes': nb,
+        'feature_names': feature_names,
+        # Probabilités held-out, calculées une seule fois : récapitulatif et rapport d'évaluation
+        # proba_gb : probabilités calibrées hors pli ; proba_gb_raw : sorties brutes du GB
+        'holdout': {'y':            np.asarray(y_test, dtype=np.int8),
+                    'proba_gb':     y_proba_gb,
+                    'proba_gb_raw': y_proba_gb_brut,
+                    'proba_nb':     y_proba_nb},
+        'calibrator': calibrateur,
+        'decision': decision,
+        'imbalance': info,
+        'timings': timings,
+        'params_gb': params_gb,
+        'tuning': journal_tuning,
+        'trained_at': datetime.now().isoformat(timespec='seconds'),
+    }
+    if not plots:
+        return result
+
     # ==========================================
     # MATRICES DE CONFUSION
     # ==========================================
@@ -117,7 +240,7 @@ def train_cluster(df, cluster_id):
 
     configs = [
         (y_pred_gb,     "Gradient Boosting (seuil=0.5)"),
-        (y_pred_gb_adj, "Gradient Boosting (seuil=0.3)"),
+        (y_pred_gb_adj, f"Gradient Boosting (seuil={seuil:.3f})"),
         (y_pred_nb,     "Naive Bayes"),
     ]
 
@@ -139,7 +262,6 @@ def train_cluster(df, cluster_id):
     # ==========================================
     # IMPORTANCE DES FEATURES (GB)
     # ==========================================
-    feature_names = list(X.columns)
     importances   = gb.feature_importances_
     indices       = np.argsort(importances)[::-1][:10]  # top 10
 
@@ -158,62 +280,255 @@ def train_cluster(df, cluster_id):
     plt.show()
     print(f"  💾 Feature importance sauvegardée → {feat_path}")
 
-    return {
-        'gradient_boosting': gb,
-        'naive_bayes': nb,
-        'feature_names': feature_names,
-        'X_test': X_test,
-        'y_test': y_test
-    }
+    return result
 
 # ============================================
-# 4. ENTRAÎNER POUR CHAQUE CLUSTER
+# 3 bis. ENTRAÎNEMENT PARALLÈLE (MÉMOIRE PARTAGÉE)
 # ============================================
-models = {}
-
-for cluster_id in sorted(df[CLUSTER_COL].unique()):
-    models[cluster_id] = train_cluster(df, cluster_id)
+def _entrainer_depuis_store(args):
+    """
+    Worker : s'attache au FeatureStore et entraîne un cluster sur sa tranche. X et y
+    reprennent les dtypes du schéma (int8...) : SMOTE, son cache et l'empreinte sont
+    identiques au chemin séquentiel quel que soit --workers.
+    """
+    descripteur, cluster_id, mode, tuning, couts, poids, calibration = args
+    store = FeatureStore.attacher(descripteur)
+    try:
+        X = store.X_df(cluster_id)
+        y = store.y_serie(cluster_id)
+        print(f"\n  [worker] CLUSTER {cluster_id}")
+        return cluster_id, entrainer_cluster(X, y, cluster_id, plots=False, mode=mode,
+                                             tuning=tuning, couts=couts, poids=poids,
+                                             calibration=calibration)
+    finally:
+        store.fermer()
+
+
+def entrainer_parallele(df, workers, mode='smote', clusters=None, tuning=None, couts=None,
+                        poids=None, calibration='auto'):
+    """Charge df une fois en mémoire partagée et répartit les clusters sur un pool."""
+    features = df.drop(columns=EXCLUDE_COLS).columns.tolist()
+    poids = poids or {}
+    with FeatureStore.creer(df, features, TARGET, CLUSTER_COL) as store:
+        clusters = store.clusters if clusters is None else [int(c) for c in clusters]
+        taches = [(store.descripteur, cid, mode, tuning, couts, poids.get(cid), calibration)
+                  for cid in clusters]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            return dict(pool.map(_entrainer_depuis_store, taches))
 
 # ============================================
-# 5. TABLEAU RÉCAPITULATIF
+# 3 ter. RÉ-ENTRAÎNEMENT INCRÉMENTAL
 # ============================================
-print(f"\n{'='*55}")
-print("  RÉCAPITULATIF — AUC-ROC par cluster")
-print(f"{'='*55}")
-print(f"  {'Cluster':<12} {'GB (0.5)':<15} {'GB (0.3)':<15} {'Naive Bayes'}")
-print(f"  {'-'*50}")
-
-for cluster_id, result in models.items():
-    gb_model  = result['gradient_boosting']
-    nb_model  = result['naive_bayes']
-    X_test    = result['X_test']
-    y_test    = result['y_test']
-
-    proba_gb  = gb_model.predict_proba(X_test)[:, 1]
-    proba_nb  = nb_model.predict_proba(X_test)[:, 1]
-
-    auc_gb    = roc_auc_score(y_test, proba_gb)
-    auc_nb    = roc_auc_score(y_test, proba_nb)
-
-    print(f"  {cluster_id:<12} {auc_gb:<15.4f} {auc_gb:<15.4f} {auc_nb:.4f}")
-
-# ============================================
-# 6. SAUVEGARDER LES MODÈLES
-# ============================================
-models_path = os.path.join(RESULTS_PATH, 'models.pkl')
-
-# Ne pas sauvegarder X_test/y_test dans le pkl final
-models_to_save = {
-    cid: {
-        'gradient_boosting': v['gradient_boosting'],
-        'naive_bayes':       v['naive_bayes'],
-        'feature_names':     v['feature_names']
+def empreinte_cluster(X, y, mode, tuning=None, poids=None):
+    """Empreinte des données d'un cluster et de tout ce qui influe sur son entraînement."""
+    h = hashlib.sha256()
+    h.update(json.dumps({
+        'columns': list(X.columns),
+        'dtypes':  [str(t) for t in X.dtypes],
+        'split':   PARAMS_SPLIT,
+        'gb':      PARAMS_GB,
+        'mode':    mode,
+        'smote':   PARAMS_SMOTE if mode == 'smote' else None,
+        # Le budget et le nombre de workers n'entrent pas dans l'empreinte : seul l'espace compte
+        'tuning':  {'space': ESPACE_GB, **PARAMS_RECHERCHE} if tuning else None,
+        'membership_weights': poids is not None,
+    }, sort_keys=True).encode())
+    h.update(np.ascontiguousarray(X.to_numpy()).tobytes())
+    h.update(np.ascontiguousarray(y.to_numpy()).tobytes())
+    if poids is not None:
+        h.update(np.ascontiguousarray(poids, dtype=np.float64).tobytes())
+    return h.hexdigest()
+
+
+def charger_bundle(path=MODELS_PATH):
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'rb') as f:
+        return {int(cid): v for cid, v in pickle.load(f).items()}
+
+
+def reutiliser_cluster(df, cluster_id, bundle, couts=None, calibration='auto'):
+    """
+    Entrée réutilisée du bundle. Calibrateur et seuil ne dépendent que des probabilités
+    held-out : ils sont recalculés (méthode et matrice de coûts courantes) sans ré-entraîner.
+    Les bundles antérieurs au stockage du held-out sont re-scorés une fois sur leur split
+    de test (déterministe).
+    """
+    holdout = bundle.get('holdout')
+    if holdout is None:
+        X, y = donnees_cluster(df, cluster_id)
+        _, X_test, _, y_test = train_test_split(X, y, **PARAMS_SPLIT, stratify=y)
+        holdout = {'y':        np.asarray(y_test, dtype=np.int8),
+                   'proba_gb': bundle['gradient_boosting'].predict_proba(X_test)[:, 1],
+                   'proba_nb': bundle['naive_bayes'].predict_proba(X_test)[:, 1]}
+    # Bundles antérieurs à la calibration : proba_gb contient les sorties brutes
+    brut        = holdout.get('proba_gb_raw', holdout['proba_gb'])
+    calibrateur, calibre = calibrer_hors_pli(holdout['y'], brut, calibration)
+    holdout     = {**holdout, 'proba_gb_raw': brut, 'proba_gb': calibre}
+    return {**bundle, 'holdout': holdout, 'calibrator': calibrateur,
+            'decision': optimiser_decision(holdout['y'], holdout['proba_gb'], couts)}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Entraînement GB + NB par cluster")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="processus (>1 : mémoire partagée, sans figures)")
+    parser.add_argument('--imbalance', choices=MODES, default='smote',
+                        help="rééquilibrage : SMOTE (en cache) ou poids de classes")
+    parser.add_argument('--incremental', action='store_true',
+                        help="ne ré-entraîner que les clusters dont l'empreinte a changé")
+    parser.add_argument('--tune', action='store_true',
+                        help="recherche d'hyperparamètres GB par successive halving")
+    parser.add_argument('--budget', type=float, default=600,
+                        help="budget de la recherche par cluster (secondes)")
+    parser.add_argument('--tune-workers', type=int, help="processus de la recherche")
+    parser.add_argument('--cost-fn', type=float, default=COUTS['fn'],
+                        help="coût d'un défaut non détecté (seuil de décision)")
+    parser.add_argument('--cost-fp', type=float, default=COUTS['fp'],
+                        help="coût d'une fausse alerte (seuil de décision)")
+    parser.add_argument('--onnx', action='store_true',
+                        help="exporter aussi les modèles au format ONNX (skl2onnx)")
+    parser.add_argument('--calibration', choices=METHODES_CALIBRATION, default='auto',
+                        help="calibrateur des probabilités GB, ajusté sur le held-out")
+    parser.add_argument('--membership-weights', action='store_true',
+                        help="pondérer chaque client par son appartenance souple à son cluster")
+    args = parser.parse_args()
+    tuning = {'budget_s': args.budget, 'workers': args.tune_workers} if args.tune else None
+    couts  = {'fn': args.cost_fn, 'fp': args.cost_fp}
+
+    df = charger_donnees()
+    poids = charger_appartenances(df) if args.membership_weights else {}
+
+    # ============================================
+    # 4. ENTRAÎNER POUR CHAQUE CLUSTER
+    # ============================================
+    models   = {}
+    clusters = [int(c) for c in sorted(df[CLUSTER_COL].unique())]
+    ancien   = charger_bundle() if args.incremental else {}
+
+    empreintes = {cid: empreinte_cluster(*donnees_cluster(df, cid), args.imbalance, tuning,
+                                         poids.get(cid))
+                  for cid in clusters}
+    reutilises = [cid for cid in clusters
+                  if ancien.get(cid, {}).get('fingerprint') == empreintes[cid]]
+    a_entrainer = [cid for cid in clusters if cid not in reutilises]
+
+    for cluster_id in reutilises:
+        print(f"♻️  Cluster {cluster_id} inchangé — modèles réutilisés")
+        models[cluster_id] = reutiliser_cluster(df, cluster_id, ancien[cluster_id], couts,
+                                                args.calibration)
+
+    if args.workers > 1 and a_entrainer:
+        models.update(entrainer_parallele(df, args.workers, args.imbalance, a_entrainer, tuning,
+                                          couts, poids, args.calibration))
+    else:
+        for cluster_id in a_entrainer:
+            models[cluster_id] = train_cluster(df, cluster_id, mode=args.imbalance, tuning=tuning,
+                                               couts=couts, poids=poids.get(cluster_id),
+                                               calibration=args.calibration)
+    models = dict(sorted(models.items()))
+
+    # ============================================
+    # 5. TABLEAU RÉCAPITULATIF ET RAPPORT D'ÉVALUATION
+    # ============================================
+    # Construit sur les probabilités held-out conservées : aucun re-scoring
+    rapport = rapport_evaluation(models)
+    rapport['created_at'] = datetime.now().isoformat(timespec='seconds')
+
+    print(f"\n{'='*72}")
+    print("  RÉCAPITULATIF — jeu de test par cluster")
+    print(f"{'='*72}")
+    # GB : métriques brutes (avant calibration) et calibrées côte à côte ; l'AUC doit
+    # rester quasi inchangée, la calibration ne corrigeant que Brier et ECE
+    print(f"  {'Cluster':<9} {'AUC brut':<10} {'AUC calib':<11} {'PR-AUC calib':<14} "
+          f"{'Seuil':<8} {'Rappel':<8} {'Précision':<11} {'Brier brut':<12} "
+          f"{'Brier calib':<13} {'ECE brut':<10} {'ECE calib':<11} {'AUC NB'}")
+    print(f"  {'-'*136}")
+
+    lignes = [(cid, r) for cid, r in rapport['clusters'].items()]
+    lignes.append(('Poolé', {**rapport['aggregate']['pooled'],
+                             'decision': {'threshold': float('nan')}}))
+    for cluster_id, r in lignes:
+        gb, nb = r['gradient_boosting'], r['naive_bayes']
+        au_seuil = gb['at_threshold']
+        print(f"  {cluster_id:<9} {gb.get('auc_roc_raw', gb['auc_roc']):<10.4f} "
+              f"{gb['auc_roc']:<11.4f} {gb['auc_pr']:<14.4f} "
+              f"{r['decision']['threshold']:<8.3f} {au_seuil['recall'] or 0:<8.4f} "
+              f"{au_seuil['precision'] or 0:<11.4f} "
+              f"{gb.get('brier_raw', gb['brier']):<12.4f} {gb['brier']:<13.4f} "
+              f"{gb.get('calibration_raw', gb['calibration'])['ece']:<10.4f} "
+              f"{gb['calibration']['ece']:<11.4f} {nb['auc_roc']:.4f}")
+
+    with open(EVAL_PATH, 'w') as f:
+        json.dump(rapport, f, indent=2)
+
+    # ============================================
+    # 6. SAUVEGARDER LES MODÈLES
+    # ============================================
+    models_path = MODELS_PATH
+
+    # Le held-out (y et probabilités) est conservé pour réutiliser sans re-scorer
+    models_to_save = {
+        cid: {
+            'gradient_boosting': v['gradient_boosting'],
+            'naive_bayes':       v['naive_bayes'],
+            'feature_names':     v['feature_names'],
+            'fingerprint':       empreintes[cid],
+            'trained_at':        v.get('trained_at'),
+            'params_gb':         v.get('params_gb', PARAMS_GB),
+            'tuning':            v.get('tuning'),
+            'decision':          v['decision'],
+            'calibrator':        v.get('calibrator'),
+            'holdout':           v['holdout'],
+            'timings':           v.get('timings', {}),
+        }
+        for cid, v in models.items()
     }
-    for cid, v in models.items()
-}
-
-with open(models_path, 'wb') as f:
-    pickle.dump(models_to_save, f)
 
-print(f"\n✅ Tous les modèles sauvegardés → {models_path}")
-print("✅ Entraînement terminé !")
\ No newline at end of file
+    with open(models_path, 'wb') as f:
+        pickle.dump(models_to_save, f)
+
+    # Manifeste : quels clusters ont été réutilisés ou ré-entraînés
+    manifest = {
+        'created_at':  datetime.now().isoformat(timespec='seconds'),
+        'incremental': args.incremental,
+        'imbalance':   args.imbalance,
+        'membership_weights': args.membership_weights,
+        'calibration': args.calibration,
+        'costs':       couts,
+        'clusters': {
+            str(cid): {
+                'status':      'reused' if cid in reutilises else 'retrained',
+                'fingerprint': empreintes[cid],
+                'trained_at':  models_to_save[cid]['trained_at'],
+                'threshold':   models_to_save[cid]['decision']['threshold'],
+                'bands':       models_to_save[cid]['decision']['bands'],
+                'calibrator':  resume(models_to_save[cid]['calibrator']),
+                'holdout_gb':  resume_holdout(rapport['clusters'][str(cid)]),
+            }
+            for cid in models_to_save
+        },
+        'removed': [str(cid) for cid in ancien if cid not in models_to_save],
+    }
+    with open(MANIFEST_PATH, 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    print(f"\n✅ Tous les modèles sauvegardés → {models_path}")
+    print(f"✅ Rapport d'évaluation → {EVAL_PATH}")
+
+    # Références de dérive (histogrammes par cluster et par feature) pour /monitoring/drift
+    features = next(iter(models_to_save.values()))['feature_names']
+    sauvegarder_references(construire_references(df, features, CLUSTER_COL))
+    print(f"✅ Références de dérive → {BASELINE_PATH}")
+
+    if args.onnx:
+        # Import différé : onnx/skl2onnx ne sont requis que pour l'export
+        from onnx_scoring import ONNX_PATH, ErreurParite, exporter_onnx
+        try:
+            exporter_onnx(models_to_save)
+        except ErreurParite as e:
+            # Les modèles sklearn sont enregistrés ; l'export ONNX précédent reste servi
+            raise SystemExit(f"❌ Export ONNX refusé : {e} — index.json non publié")
+        print(f"✅ Export ONNX vérifié (parité sklearn) → {ONNX_PATH}")
+    print(f"✅ Manifeste → {MANIFEST_PATH} "
+          f"({len(reutilises)} réutilisé(s), {len(a_entrainer)} ré-entraîné(s))")
+    print("✅ Entraînement terminé !")
\ No newline at end of file
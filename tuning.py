@@ -0,0 +1,159 @@
+"""
+Recherche d'hyperparamètres GB par cluster, par successive halving.
+
+Les candidats sont tirés dans ESPACE_GB. À chaque tour, tous les survivants
+sont entraînés avec `n_estimators` = ressource du tour sur un pool de
+processus, évalués en AUC sur un split de validation interne au train, et
+seul le meilleur tiers (ETA = 3) passe au tour suivant avec 3× plus
+d'arbres. La recherche s'arrête au dernier tour ou quand le budget de temps
+du cluster est épuisé. L'échéance est vérifiée à chaque candidat terminé :
+au-delà, les évaluations non démarrées du tour sont annulées (celles en cours,
+au plus une par worker, se terminent) et le meilleur candidat vu est retenu :
+celui du dernier tour complet, ou du tour interrompu s'il fait mieux.
+
+Le rééquilibrage du split interne passe par resampling.reequilibrer : en
+mode SMOTE, le résultat est relu du cache d'une nuit à l'autre. Avec les poids
+d'appartenance souple (--membership-weights), la recherche les applique comme
+l'entraînement final : sample_weight des lignes d'ajustement et AUC de
+validation pondérée, pour choisir les hyperparamètres sur la distribution servie.
+"""
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+from sklearn.ensemble import GradientBoostingClassifier
+from sklearn.metrics import roc_auc_score
+from sklearn.model_selection import ParameterSampler, train_test_split
+
+from resampling import reequilibrer
+
+ESPACE_GB = {
+    'learning_rate':    [0.03, 0.05, 0.1, 0.2],
+    'max_depth':        [2, 3, 4, 5],
+    'subsample':        [0.7, 0.85, 1.0],
+    'min_samples_leaf': [1, 20, 50],
+}
+
+PARAMS_RECHERCHE = {
+    'n_candidates':  27,
+    'min_resource':  25,     # n_estimators au premier tour
+    'max_resource':  300,
+    'eta':           3,
+    'val_size':      0.25,
+    'random_state':  42,
+}
+
+# ============================================
+# 1. ÉVALUATION D'UN CANDIDAT (WORKER)
+# ============================================
+# Données du cluster en cours, copiées une fois par worker (initializer du pool)
+_donnees = {}
+
+
+def _init_worker(X_fit, y_fit, sample_weight, X_val, y_val, poids_val=None):
+    _donnees.update(X_fit=X_fit, y_fit=y_fit, sample_weight=sample_weight,
+                    X_val=X_val, y_val=y_val, poids_val=poids_val)
+
+
+def _evaluer(args):
+    params, n_estimators = args
+    t0 = time.perf_counter()
+    gb = GradientBoostingClassifier(n_estimators=n_estimators, random_state=42, **params)
+    gb.fit(_donnees['X_fit'], _donnees['y_fit'], sample_weight=_donnees['sample_weight'])
+    auc = roc_auc_score(_donnees['y_val'], gb.predict_proba(_donnees['X_val'])[:, 1],
+                        sample_weight=_donnees['poids_val'])
+    return float(auc), time.perf_counter() - t0
+
+
+def _tour(pool, candidats, ressource, echeance):
+    """
+    Évalue les candidats d'un tour. Passé l'échéance, les évaluations non démarrées
+    sont annulées et seuls les résultats reçus sont rendus (au moins un).
+    Retourne [(indice du candidat, auc, durée)].
+    """
+    futures    = {pool.submit(_evaluer, (p, ressource)): i for i, p in enumerate(candidats)}
+    en_attente = set(futures)
+    resultats  = []
+    while en_attente:
+        reste = echeance - time.perf_counter()
+        if reste <= 0 and resultats:
+            break
+        faits, en_attente = wait(en_attente, timeout=max(reste, 0) if resultats else None,
+                                 return_when=FIRST_COMPLETED)
+        resultats.extend((futures[f], *f.result()) for f in faits)
+    for f in en_attente:
+        f.cancel()
+    return resultats
+
+# ============================================
+# 2. SUCCESSIVE HALVING
+# ============================================
+def rechercher_hyperparametres(X_train, y_train, mode='smote', budget_s=600, workers=None,
+                               config=None, poids=None):
+    """
+    Retourne (meilleurs_params, journal). meilleurs_params contient n_estimators
+    et peut être passé tel quel à GradientBoostingClassifier. poids : appartenance
+    souple de chaque ligne de X_train au cluster (None : poids uniformes).
+    """
+    config = {**PARAMS_RECHERCHE, **(config or {})}
+    X_in, X_val, y_in, y_val, pos_in, pos_val = train_test_split(
+        X_train, y_train, np.arange(len(X_train)), test_size=config['val_size'],
+        random_state=config['random_state'], stratify=y_train)
+    X_fit, y_fit, sample_weight, _ = reequilibrer(X_in, y_in, mode)
+    poids_val = None
+    if poids is not None:
+        # Comme entrainer_cluster : SMOTE ajoute les lignes synthétiques (poids 1) à la fin
+        poids = np.asarray(poids, dtype=np.float64)
+        w = np.ones(len(y_fit))
+        w[:len(pos_in)] = poids[pos_in]
+        sample_weight = w if sample_weight is None else sample_weight * w
+        poids_val = poids[pos_val]
+
+    candidats = list(ParameterSampler(ESPACE_GB, n_iter=config['n_candidates'],
+                                      random_state=config['random_state']))
+    ressource = config['min_resource']
+    journal   = {'rounds': [], 'budget_s': budget_s, 'stopped_early': False,
+                 'membership_weights': poids is not None}
+    meilleur, auc_meilleur = None, None
+    n_workers = workers or os.cpu_count()
+    t0 = time.perf_counter()
+    echeance = t0 + budget_s
+
+    with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker,
+                             initargs=(X_fit, y_fit, sample_weight, X_val, y_val,
+                                       poids_val)) as pool:
+        while candidats:
+            resultats = _tour(pool, candidats, ressource, echeance)
+            complet   = len(resultats) == len(candidats)
+            # Tri par AUC décroissante, égalités dans l'ordre des candidats
+            resultats.sort(key=lambda r: (-r[1], r[0]))
+            i, auc, _ = resultats[0]
+            if complet or meilleur is None or auc > auc_meilleur:
+                meilleur, auc_meilleur = {**candidats[i], 'n_estimators': ressource}, auc
+            journal['rounds'].append({
+                'n_estimators': ressource,
+                'candidates':   len(candidats),
+                'completed':    len(resultats),
+                'best_auc':     round(auc, 4),
+                'elapsed_s':    round(time.perf_counter() - t0, 2),
+            })
+            if not complet:
+                journal['stopped_early'] = True
+                break
+
+            n_suivants = len(candidats) // config['eta']
+            ressource  = ressource * config['eta']
+            if n_suivants == 0 or ressource > config['max_resource']:
+                break
+            # Coût du tour suivant estimé à partir du tour courant (même nombre d'arbres total)
+            duree_tour = sum(r[2] for r in resultats) / n_workers
+            if time.perf_counter() - t0 + duree_tour > budget_s:
+                journal['stopped_early'] = True
+                break
+            candidats = [candidats[i] for i, _, _ in resultats[:n_suivants]]
+
+    journal['best_params'] = meilleur
+    journal['best_auc']    = round(auc_meilleur, 4)
+    journal['elapsed_s']   = round(time.perf_counter() - t0, 2)
+    return meilleur, journal